@@ -0,0 +1,82 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Storage settings
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+CHROMA_DIR = os.getenv("CHROMA_DIR", "chroma_db")
+
+# Ingestion settings
+# Number of documents processed concurrently in the background
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "1"))
+# Maximum number of files waiting or running before uploads are rejected with 429
+INGESTION_MAX_QUEUE_DEPTH = int(os.getenv("INGESTION_MAX_QUEUE_DEPTH", "50"))
+# Number of chunks embedded between checks for in-flight queries
+INGESTION_EMBED_BATCH_SIZE = int(os.getenv("INGESTION_EMBED_BATCH_SIZE", "64"))
+# Longest time (seconds) an ingestion worker pauses in favour of running queries
+INGESTION_QUERY_YIELD_TIMEOUT = float(os.getenv("INGESTION_QUERY_YIELD_TIMEOUT", "2.0"))
+# Number of finished jobs kept for GET /jobs/{id}
+INGESTION_JOB_HISTORY = int(os.getenv("INGESTION_JOB_HISTORY", "500"))
+
+# Upload settings
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(50 * 1024 * 1024)))  # 50MB per file
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # 1MB
+
+# Chunking settings
+# Token budget per chunk (defaults to the embedding model's window minus special tokens)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "0")) or None
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+# Retrieval settings
+# "dense" for embedding search only, "hybrid" to fuse it with BM25 keyword search,
+# "hierarchical" to search only the chunks of the documents closest to the query
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Candidates fetched from each ranking per requested result in hybrid mode
+HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv("HYBRID_CANDIDATE_MULTIPLIER", "4"))
+# Reciprocal rank fusion constant
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+# Documents selected by their centroid embedding before searching chunks in hierarchical mode
+HIERARCHICAL_TOP_DOCUMENTS = int(os.getenv("HIERARCHICAL_TOP_DOCUMENTS", "10"))
+
+# Embedding settings
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# "torch" runs the SentenceTransformer model, "onnx" serves an ONNX export through onnxruntime
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", "onnx_models")
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "true").lower() in ("1", "true", "yes")
+ONNX_NUM_THREADS = int(os.getenv("ONNX_NUM_THREADS", "0")) or None
+# Minimum cosine similarity to the PyTorch vectors for the ONNX model to be used
+ONNX_MIN_COSINE = float(os.getenv("ONNX_MIN_COSINE", "0.99"))
+
+# Re-index settings
+# Chunks re-embedded per batch when migrating to a new embedding model
+REINDEX_BATCH_SIZE = int(os.getenv("REINDEX_BATCH_SIZE", "256"))
+# Pause (seconds) between re-index batches
+REINDEX_BATCH_PAUSE = float(os.getenv("REINDEX_BATCH_PAUSE", "0.05"))
+# Time (seconds) in-flight queries get to finish before the old collection is dropped
+REINDEX_DRAIN_SECONDS = float(os.getenv("REINDEX_DRAIN_SECONDS", "5"))
+
+# Query admission settings
+# Queries (each with one LLM call) processed concurrently
+QUERY_MAX_CONCURRENCY = int(os.getenv("QUERY_MAX_CONCURRENCY", "8"))
+# Queries allowed to wait for a slot before new ones are shed with 503
+QUERY_MAX_QUEUE = int(os.getenv("QUERY_MAX_QUEUE", "64"))
+# Default time budget (seconds) for a query, including its queue wait
+QUERY_DEADLINE_SECONDS = float(os.getenv("QUERY_DEADLINE_SECONDS", "30"))
+# Per-user queries per second (0 disables per-user rate limiting) and burst size
+QUERY_USER_RATE = float(os.getenv("QUERY_USER_RATE", "0")) or None
+QUERY_USER_BURST = float(os.getenv("QUERY_USER_BURST", "5"))
+
+# Precomputed answer settings
+PRECOMPUTED_ANSWERS_ENABLED = os.getenv("PRECOMPUTED_ANSWERS_ENABLED", "true").lower() in ("1", "true", "yes")
+PRECOMPUTED_ANSWERS_PATH = os.getenv("PRECOMPUTED_ANSWERS_PATH", "precomputed_answers.json")
+# Queries are appended here for offline clustering (see precompute_answers.py)
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", "query_log.jsonl")
+# Minimum cosine similarity between a query and a precomputed question to serve its answer
+PRECOMPUTED_SIMILARITY_THRESHOLD = float(os.getenv("PRECOMPUTED_SIMILARITY_THRESHOLD", "0.9"))
+# Minimum cosine similarity for logged queries to join the same cluster
+PRECOMPUTED_CLUSTER_THRESHOLD = float(os.getenv("PRECOMPUTED_CLUSTER_THRESHOLD", "0.85"))
+# Number of largest query clusters to precompute answers for
+PRECOMPUTED_TOP_CLUSTERS = int(os.getenv("PRECOMPUTED_TOP_CLUSTERS", "50"))
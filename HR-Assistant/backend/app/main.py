@@ -1,14 +1,47 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 import os
-import shutil
+import time
+import asyncio
+import functools
 from pydantic import BaseModel
 import uuid
 
+from app.config import (
+    UPLOAD_DIR,
+    CHROMA_DIR,
+    INGESTION_WORKERS,
+    INGESTION_MAX_QUEUE_DEPTH,
+    INGESTION_QUERY_YIELD_TIMEOUT,
+    INGESTION_JOB_HISTORY,
+    MAX_UPLOAD_SIZE,
+    UPLOAD_CHUNK_SIZE,
+    EMBEDDING_BACKEND,
+    REINDEX_BATCH_SIZE,
+    REINDEX_BATCH_PAUSE,
+    REINDEX_DRAIN_SECONDS,
+    QUERY_MAX_CONCURRENCY,
+    QUERY_MAX_QUEUE,
+    QUERY_DEADLINE_SECONDS,
+    QUERY_USER_RATE,
+    QUERY_USER_BURST,
+    PRECOMPUTED_ANSWERS_ENABLED,
+    PRECOMPUTED_ANSWERS_PATH,
+    PRECOMPUTED_SIMILARITY_THRESHOLD,
+    PRECOMPUTED_CLUSTER_THRESHOLD,
+    PRECOMPUTED_TOP_CLUSTERS,
+    QUERY_LOG_PATH
+)
+from app.services.admission import AdmissionController, AdmissionRejected
 from app.services.document_processor import DocumentProcessor
+from app.services.file_storage import save_upload_stream, UploadTooLargeError
+from app.services.ingestion_queue import IngestionQueue, QueueFullError
+from app.services.precomputed_answers import PrecomputedAnswerStore, PrecomputedAnswers, QueryLog, BuildInProgressError
 from app.services.query_engine import QueryEngine
+from app.services.reindexer import Reindexer, ReindexInProgressError
 from app.services.vector_store import VectorStore
 
 app = FastAPI(title="HR Onboarding Knowledge Assistant")
@@ -23,62 +56,169 @@ app.add_middleware(
 )
 
 # Initialize services
-vector_store = VectorStore()
+vector_store = VectorStore(persist_directory=CHROMA_DIR)
 document_processor = DocumentProcessor(vector_store)
-query_engine = QueryEngine(vector_store)
+answer_store = (
+    PrecomputedAnswerStore(PRECOMPUTED_ANSWERS_PATH, similarity_threshold=PRECOMPUTED_SIMILARITY_THRESHOLD)
+    if PRECOMPUTED_ANSWERS_ENABLED else None
+)
+query_engine = QueryEngine(vector_store, answer_store=answer_store, query_log=QueryLog(QUERY_LOG_PATH))
+precomputed_answers = None
+if answer_store is not None:
+    # Regenerate precomputed answers in the background when the documents they cite change
+    precomputed_answers = PrecomputedAnswers(answer_store, query_engine, vector_store)
+    vector_store.add_change_listener(precomputed_answers.on_documents_changed)
+ingestion_queue = IngestionQueue(
+    document_processor,
+    max_workers=INGESTION_WORKERS,
+    max_queue_depth=INGESTION_MAX_QUEUE_DEPTH,
+    query_yield_timeout=INGESTION_QUERY_YIELD_TIMEOUT,
+    job_history=INGESTION_JOB_HISTORY
+)
+admission_controller = AdmissionController(
+    max_concurrency=QUERY_MAX_CONCURRENCY,
+    max_queue=QUERY_MAX_QUEUE,
+    default_deadline=QUERY_DEADLINE_SECONDS,
+    per_user_rate=QUERY_USER_RATE,
+    per_user_burst=QUERY_USER_BURST
+)
+reindexer = Reindexer(
+    vector_store,
+    batch_size=REINDEX_BATCH_SIZE,
+    batch_pause=REINDEX_BATCH_PAUSE,
+    drain_seconds=REINDEX_DRAIN_SECONDS,
+    throttle=ingestion_queue.wait_for_queries
+)
 
 # Create upload directory if it doesn't exist
-os.makedirs("uploads", exist_ok=True)
+os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 class QueryRequest(BaseModel):
     query: str
     categories: Optional[List[str]] = None
 
+class ReindexRequest(BaseModel):
+    embedding_model: str
+    embedding_backend: str = EMBEDDING_BACKEND
+
+class PrecomputeRequest(BaseModel):
+    top: int = PRECOMPUTED_TOP_CLUSTERS
+    days: Optional[float] = None
+    cluster_threshold: float = PRECOMPUTED_CLUSTER_THRESHOLD
+
 class QueryResponse(BaseModel):
     answer: str
     sources: List[str]
     category: str
+    precomputed: bool = False
+
+def _queue_full_response(error: QueueFullError) -> JSONResponse:
+    """Build the 429 response returned when the ingestion queue is saturated"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(error)},
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+@app.on_event("shutdown")
+def shutdown_background_workers():
+    """Let running ingestion jobs finish before the process exits"""
+    ingestion_queue.shutdown(wait=True)
+    if precomputed_answers is not None:
+        precomputed_answers.shutdown(wait=False)
+    query_engine.query_log.close()
 
 @app.post("/upload")
 async def upload_document(
-    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     document_type: str = Form(...),
     category: str = Form(...)
 ):
     """Upload HR documents for processing"""
     
+    if len(files) > ingestion_queue.max_queue_depth:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files in one upload (maximum is {ingestion_queue.max_queue_depth})"
+        )
+    
+    # Reject early, before writing anything to disk, if the queue is saturated
+    if not ingestion_queue.has_capacity(len(files)):
+        return _queue_full_response(
+            QueueFullError(ingestion_queue.pending_files, ingestion_queue.max_queue_depth, ingestion_queue.retry_after())
+        )
+    
     saved_files = []
+    duplicates = []
     
     try:
         for file in files:
             # Generate a unique filename
             file_extension = os.path.splitext(file.filename)[1]
             unique_filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = os.path.join("uploads", unique_filename)
+            file_path = os.path.join(UPLOAD_DIR, unique_filename)
+            
+            # Stream the file to disk, hashing it on the way
+            saved = await save_upload_stream(file, file_path, MAX_UPLOAD_SIZE, UPLOAD_CHUNK_SIZE)
+            content_hash = saved["content_hash"]
             
-            # Save the file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            # Skip content that is already indexed, queued, or repeated in this batch
+            existing_id = (
+                vector_store.find_document_by_hash(content_hash)
+                or ingestion_queue.find_pending_hash(content_hash)
+                or next((f["original_name"] for f in saved_files if f["content_hash"] == content_hash), None)
+            )
+            if existing_id:
+                os.remove(file_path)
+                duplicates.append({"original_name": file.filename, "duplicate_of": existing_id})
+                continue
             
             saved_files.append({
                 "original_name": file.filename,
                 "saved_path": file_path,
                 "category": category,
-                "document_type": document_type
+                "document_type": document_type,
+                "content_hash": content_hash,
+                "file_size": saved["size"]
             })
         
-        # Process documents in the background
-        background_tasks.add_task(
-            document_processor.process_documents, 
-            saved_files
-        )
+        if not saved_files:
+            return JSONResponse(
+                status_code=200,
+                content={
+                    "message": "All uploaded files were already processed.",
+                    "job_id": None,
+                    "duplicates": duplicates
+                }
+            )
+        
+        # Queue the documents for background processing
+        job = ingestion_queue.submit(saved_files)
         
         return JSONResponse(
-            status_code=200,
-            content={"message": f"Successfully uploaded {len(files)} files. Processing started."}
+            status_code=202,
+            content={
+                "message": f"Successfully uploaded {len(saved_files)} files. Processing started.",
+                "job_id": job.id,
+                "status_url": f"/jobs/{job.id}",
+                "duplicates": duplicates
+            }
         )
     
+    except QueueFullError as e:
+        for file_info in saved_files:
+            if os.path.exists(file_info["saved_path"]):
+                os.remove(file_info["saved_path"])
+        
+        return _queue_full_response(e)
+    
+    except UploadTooLargeError as e:
+        for file_info in saved_files:
+            if os.path.exists(file_info["saved_path"]):
+                os.remove(file_info["saved_path"])
+        
+        raise HTTPException(status_code=413, detail=str(e))
+    
     except Exception as e:
         # Clean up any saved files in case of error
         for file_info in saved_files:
@@ -87,17 +227,159 @@ async def upload_document(
         
         raise HTTPException(status_code=500, detail=str(e))
 
+def _query_user_key(http_request: Request) -> Optional[str]:
+    """Identify the caller for per-user rate limiting"""
+    user_id = http_request.headers.get("X-User-Id")
+    if user_id:
+        return user_id
+    return http_request.client.host if http_request.client else None
+
+def _query_deadline(http_request: Request) -> Optional[float]:
+    """Optional per-request time budget in seconds, capped at the server default"""
+    timeout = http_request.headers.get("X-Request-Timeout")
+    try:
+        return min(float(timeout), QUERY_DEADLINE_SECONDS) if timeout else None
+    except ValueError:
+        return None
+
 @app.post("/query", response_model=QueryResponse)
-async def query_hr_assistant(request: QueryRequest):
+async def query_hr_assistant(request: QueryRequest, http_request: Request):
     """Query the HR assistant with a question"""
+    # Precomputed answers are cheap, so they are served before admission instead of
+    # queueing behind full LLM calls
     try:
-        result = query_engine.generate_response(
-            request.query, 
+        precomputed, query_embedding, index = await run_in_threadpool(
+            query_engine.lookup_precomputed,
+            request.query,
             categories=request.categories
         )
-        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if precomputed is not None:
+        return precomputed
+    
+    try:
+        async with admission_controller.admit(_query_user_key(http_request), _query_deadline(http_request)) as expires:
+            try:
+                # Ingestion workers pause between embedding batches while this query runs
+                with ingestion_queue.query_guard():
+                    # An executor future can be abandoned once the deadline passes; the LLM
+                    # request gets the same budget, so the worker thread stops soon after
+                    # the client has been answered with 504
+                    remaining = admission_controller.remaining(expires)
+                    result = await asyncio.wait_for(
+                        asyncio.get_running_loop().run_in_executor(
+                            None,
+                            functools.partial(
+                                query_engine.generate_response,
+                                request.query,
+                                categories=request.categories,
+                                use_precomputed=False,
+                                timeout=remaining,
+                                query_embedding=query_embedding,
+                                index=index
+                            )
+                        ),
+                        timeout=remaining
+                    )
+                return result
+            except asyncio.TimeoutError:
+                admission_controller.record_deadline_exceeded()
+                raise HTTPException(status_code=504, detail="Query deadline expired while generating the answer")
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+    except AdmissionRejected as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"detail": e.reason},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+@app.get("/metrics/admission")
+async def get_admission_metrics():
+    """Queue wait time, service time and shedding counters for /query"""
+    return admission_controller.metrics()
+
+@app.get("/admin/precomputed-answers")
+async def get_precomputed_answers():
+    """List the precomputed answers and whether they are being regenerated"""
+    if answer_store is None:
+        return {"enabled": False, "answers": []}
+    answers = [
+        {key: value for key, value in entry.items() if key != "embedding"}
+        for entry in answer_store.entries()
+    ]
+    answers.sort(key=lambda entry: -entry["cluster_size"])
+    return {"enabled": True, "build": precomputed_answers.build_status(), "answers": answers}
+
+@app.post("/admin/precomputed-answers/build")
+async def build_precomputed_answers(request: PrecomputeRequest):
+    """Answer the most frequent logged questions in the background against the served index"""
+    if precomputed_answers is None:
+        raise HTTPException(status_code=404, detail="Precomputed answers are disabled")
+    
+    since = time.time() - request.days * 86400 if request.days else None
+    logged_queries = await run_in_threadpool(lambda: list(query_engine.query_log.read(since=since)))
+    if not logged_queries:
+        raise HTTPException(status_code=400, detail="No queries have been logged")
+    
+    try:
+        status = precomputed_answers.start_build(
+            logged_queries,
+            top_clusters=request.top,
+            cluster_threshold=request.cluster_threshold
+        )
+    except BuildInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": f"Building precomputed answers from {status['logged_queries']} logged queries.",
+            "status_url": "/admin/precomputed-answers"
+        }
+    )
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status of an ingestion job"""
+    status = ingestion_queue.get_job_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return status
+
+@app.post("/admin/reindex")
+async def start_reindex(request: ReindexRequest):
+    """Re-embed all chunks with another model while queries keep using the current index"""
+    try:
+        job = reindexer.start(request.embedding_backend, request.embedding_model)
+    except ReindexInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": f"Re-index with {request.embedding_model} started.",
+            "job_id": job.id,
+            "status_url": f"/admin/reindex/{job.id}"
+        }
+    )
+
+@app.get("/admin/reindex")
+async def get_current_reindex():
+    """Get the status of the most recent re-index"""
+    job = reindexer.get_job()
+    if job is None:
+        raise HTTPException(status_code=404, detail="No re-index has been started")
+    return job.to_dict()
+
+@app.get("/admin/reindex/{job_id}")
+async def get_reindex(job_id: str):
+    """Get the status of a re-index"""
+    job = reindexer.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Re-index {job_id} not found")
+    return job.to_dict()
 
 @app.get("/categories")
 async def get_categories():
@@ -117,6 +399,63 @@ async def get_documents():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.put("/documents/{document_id}")
+async def update_document(
+    document_id: str,
+    file: UploadFile = File(...),
+    document_type: Optional[str] = Form(None),
+    category: Optional[str] = Form(None)
+):
+    """Upload a new version of a document; only changed chunks are re-embedded"""
+    existing = vector_store.get_document_metadata(document_id)
+    if existing is None:
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    
+    if not ingestion_queue.has_capacity(1):
+        return _queue_full_response(
+            QueueFullError(ingestion_queue.pending_files, ingestion_queue.max_queue_depth, ingestion_queue.retry_after())
+        )
+    
+    file_extension = os.path.splitext(file.filename)[1]
+    file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}{file_extension}")
+    
+    try:
+        saved = await save_upload_stream(file, file_path, MAX_UPLOAD_SIZE, UPLOAD_CHUNK_SIZE)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    if saved["content_hash"] == existing.get("content_hash"):
+        os.remove(file_path)
+        return JSONResponse(
+            status_code=200,
+            content={"message": f"Document {document_id} is unchanged", "job_id": None}
+        )
+    
+    file_info = {
+        "document_id": document_id,
+        "original_name": file.filename,
+        "saved_path": file_path,
+        "category": category or existing["category"],
+        "document_type": document_type or existing["document_type"],
+        "content_hash": saved["content_hash"],
+        "file_size": saved["size"]
+    }
+    
+    try:
+        job = ingestion_queue.submit([file_info])
+    except QueueFullError as e:
+        os.remove(file_path)
+        return _queue_full_response(e)
+    
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": f"Update of document {document_id} started.",
+            "job_id": job.id,
+            "status_url": f"/jobs/{job.id}"
+        }
+    )
+
 @app.delete("/documents/{document_id}")
 async def delete_document(document_id: str):
     """Delete a document from the system"""
@@ -0,0 +1,235 @@
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed or rate limited instead of admitted"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        """Allow ``rate`` requests per second with bursts of up to ``capacity``"""
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def try_acquire(self) -> bool:
+        """Take one token if available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def seconds_until_token(self) -> float:
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class LatencySummary:
+    def __init__(self, window: int = 1000):
+        """Keep the most recent ``window`` samples (in seconds) for percentile reporting"""
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+
+        def percentile(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return 1000 * ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+        return {
+            "count": self.count,
+            "mean_ms": 1000 * self.total / self.count if self.count else None,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99)
+        }
+
+
+class AdmissionController:
+    def __init__(self,
+                 max_concurrency: int = 8,
+                 max_queue: int = 64,
+                 default_deadline: float = 30.0,
+                 per_user_rate: Optional[float] = None,
+                 per_user_burst: float = 5.0,
+                 max_tracked_users: int = 10000):
+        """
+        Admission control for query handling on the event loop.
+
+        At most ``max_concurrency`` requests run at once (each makes one LLM call);
+        up to ``max_queue`` more wait in FIFO order. A request is shed with 503 when
+        the queue is full, when its estimated wait already exceeds its deadline, or
+        when the deadline passes while it waits. With ``per_user_rate`` set, each user
+        also gets a token bucket and excess requests are rejected with 429.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.default_deadline = default_deadline
+        self.per_user_rate = per_user_rate
+        self.per_user_burst = per_user_burst
+        self.max_tracked_users = max_tracked_users
+
+        self._in_flight = 0
+        self._waiters = deque()
+        self._buckets = {}
+
+        self.queue_wait = LatencySummary()
+        self.service_time = LatencySummary()
+        self.counters = {
+            "admitted": 0,
+            "rejected_rate_limited": 0,
+            "shed_queue_full": 0,
+            "shed_deadline_estimate": 0,
+            "shed_deadline_expired": 0,
+            "deadline_exceeded_serving": 0
+        }
+
+    @asynccontextmanager
+    async def admit(self, user_key: Optional[str] = None, deadline: Optional[float] = None):
+        """
+        Wait for a slot and hold it for the duration of the ``async with`` block.
+
+        The deadline covers queueing and serving: the queue wait is enforced
+        here, and the block receives the time at which the deadline expires so it
+        can bound its own work (see ``remaining``).
+
+        Args:
+            user_key: Identity used for per-user rate limiting
+            deadline: Seconds the caller is willing to wait plus be served
+
+        Yields:
+            ``time.monotonic()`` value at which the deadline expires
+        """
+        arrived = time.monotonic()
+        expires = arrived + (deadline or self.default_deadline)
+
+        self._check_rate_limit(user_key)
+        await self._acquire(arrived, expires)
+
+        self.counters["admitted"] += 1
+        started = time.monotonic()
+        self.queue_wait.add(started - arrived)
+        try:
+            yield expires
+        finally:
+            self.service_time.add(time.monotonic() - started)
+            self._release()
+
+    @staticmethod
+    def remaining(expires: float) -> float:
+        """Seconds left until a deadline returned by ``admit``"""
+        return max(0.0, expires - time.monotonic())
+
+    def record_deadline_exceeded(self):
+        """Count an admitted request that ran out of time while being served"""
+        self.counters["deadline_exceeded_serving"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue wait and service time reported separately, plus shedding counters"""
+        return {
+            "in_flight": self._in_flight,
+            "queued": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_wait": self.queue_wait.to_dict(),
+            "service_time": self.service_time.to_dict(),
+            "counters": dict(self.counters)
+        }
+
+    def _check_rate_limit(self, user_key: Optional[str]):
+        """Apply the per-user token bucket, if enabled"""
+        if not self.per_user_rate or not user_key:
+            return
+
+        bucket = self._buckets.get(user_key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_tracked_users:
+                # Forget the least recently seen user
+                oldest = min(self._buckets, key=lambda key: self._buckets[key].updated)
+                del self._buckets[oldest]
+            bucket = TokenBucket(self.per_user_rate, self.per_user_burst)
+            self._buckets[user_key] = bucket
+
+        if not bucket.try_acquire():
+            self.counters["rejected_rate_limited"] += 1
+            raise AdmissionRejected(429, "Rate limit exceeded", max(1, int(bucket.seconds_until_token() + 0.999)))
+
+    def _estimated_wait(self, position: int) -> float:
+        """Expected queue wait for the request at ``position`` given recent service times"""
+        mean_service = self.service_time.total / self.service_time.count if self.service_time.count else 0.0
+        return position * mean_service / self.max_concurrency
+
+    async def _acquire(self, arrived: float, expires: float):
+        """Take a slot immediately or wait for one in FIFO order"""
+        if self._in_flight < self.max_concurrency and not self._waiters:
+            self._in_flight += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.counters["shed_queue_full"] += 1
+            raise AdmissionRejected(503, "Server is busy, query queue is full", self._retry_after())
+
+        if arrived + self._estimated_wait(len(self._waiters) + 1) > expires:
+            self.counters["shed_deadline_estimate"] += 1
+            raise AdmissionRejected(503, "Server is busy, query would miss its deadline", self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=max(0.0, expires - time.monotonic()))
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the deadline passed; give it back
+                self._release()
+            else:
+                self._abandon(waiter)
+            self.counters["shed_deadline_expired"] += 1
+            raise AdmissionRejected(503, "Query deadline expired while waiting", self._retry_after())
+        except asyncio.CancelledError:
+            # Client went away; pass the slot on if it was already granted
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: asyncio.Future):
+        """Drop a waiter that gave up before being granted a slot"""
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _release(self):
+        """Hand the slot to the next live waiter, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    def _retry_after(self) -> int:
+        return max(1, int(self._estimated_wait(len(self._waiters) + 1) + 0.999))
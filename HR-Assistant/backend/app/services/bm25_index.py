@@ -0,0 +1,225 @@
+import os
+import re
+import json
+import math
+import heapq
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
+
+# Keep compound policy terms such as "401k", "w-4" or "hr-12" intact
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "if", "in", "is", "it", "my", "of", "on", "or", "our", "the", "to", "we", "what",
+    "when", "where", "which", "who", "will", "with", "you", "your"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split text into index terms, adding the parts of compound terms"""
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in re.split(r"[-_./]", token) if part and part not in STOPWORDS)
+    return terms
+
+
+class BM25Index:
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75, compact_every: int = 500):
+        """
+        Persistent BM25 inverted index over document chunks.
+
+        The index lives in memory and is persisted as a JSON snapshot plus an append-only
+        log of add/remove operations, so each update only writes the affected chunks. The
+        log is folded into a new snapshot every ``compact_every`` operations.
+
+        Args:
+            path: File prefix for the snapshot and log (if None, the index is not persisted)
+            k1: BM25 term-frequency saturation
+            b: BM25 length normalization
+            compact_every: Number of logged operations between snapshots
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.compact_every = compact_every
+
+        self._lock = threading.RLock()
+        # term -> {chunk_id: term frequency}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        # chunk_id -> {"length": int, "category": str, "terms": [unique terms]}
+        self._chunks: Dict[str, Dict[str, Any]] = {}
+        self._total_length = 0
+        self._logged_ops = 0
+
+        if self.path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._chunks
+
+    def add(self, ids: List[str], texts: List[str], metadata_list: List[Dict[str, Any]]):
+        """Index new chunks"""
+        entries = [
+            {"id": chunk_id, "text": text, "category": (metadata or {}).get("category")}
+            for chunk_id, text, metadata in zip(ids, texts, metadata_list)
+        ]
+        with self._lock:
+            for entry in entries:
+                self._add_entry(entry["id"], entry["text"], entry["category"])
+            self._log({"op": "add", "chunks": entries})
+
+    def remove(self, ids: List[str]):
+        """Remove chunks from the index"""
+        with self._lock:
+            for chunk_id in ids:
+                self._remove_entry(chunk_id)
+            self._log({"op": "remove", "ids": list(ids)})
+
+    def rebuild(self, ids: List[str], texts: List[str], metadata_list: List[Dict[str, Any]]):
+        """Replace the whole index, e.g. when it is out of sync with the vector store"""
+        with self._lock:
+            self._postings = {}
+            self._chunks = {}
+            self._total_length = 0
+            for chunk_id, text, metadata in zip(ids, texts, metadata_list):
+                self._add_entry(chunk_id, text, (metadata or {}).get("category"))
+            self.save()
+
+    def search(self, query: str, k: int = 5, categories: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Score chunks against a query with BM25.
+
+        Args:
+            query: Query text
+            k: Number of results to return
+            categories: Only return chunks in these categories (if provided)
+
+        Returns:
+            List of (chunk_id, score) tuples, best first
+        """
+        terms = tokenize(query)
+        allowed = set(categories) if categories else None
+
+        with self._lock:
+            n_chunks = len(self._chunks)
+            if not terms or n_chunks == 0:
+                return []
+
+            avg_length = self._total_length / n_chunks
+            scores: Dict[str, float] = {}
+            for term, query_tf in Counter(terms).items():
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+
+                df = len(postings)
+                idf = math.log(1 + (n_chunks - df + 0.5) / (df + 0.5))
+                for chunk_id, tf in postings.items():
+                    chunk = self._chunks[chunk_id]
+                    if allowed is not None and chunk["category"] not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * chunk["length"] / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + query_tf * idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self):
+        """Write a full snapshot and truncate the operation log"""
+        if not self.path:
+            return
+
+        with self._lock:
+            snapshot = {
+                "chunks": {
+                    chunk_id: {
+                        "category": chunk["category"],
+                        "length": chunk["length"],
+                        "tf": {term: self._postings[term][chunk_id] for term in chunk["terms"]}
+                    }
+                    for chunk_id, chunk in self._chunks.items()
+                }
+            }
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.json.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, f"{self.path}.json")
+
+            open(f"{self.path}.log", "w").close()
+            self._logged_ops = 0
+
+    def _add_entry(self, chunk_id: str, text: str, category: Optional[str]):
+        """Add one chunk to the in-memory structures"""
+        if chunk_id in self._chunks:
+            self._remove_entry(chunk_id)
+        self._add_counts(chunk_id, Counter(tokenize(text)), category)
+
+    def _add_counts(self, chunk_id: str, counts: Dict[str, int], category: Optional[str]):
+        """Add one chunk from its term frequencies"""
+        length = sum(counts.values())
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[chunk_id] = tf
+        self._chunks[chunk_id] = {"length": length, "category": category, "terms": list(counts)}
+        self._total_length += length
+
+    def _remove_entry(self, chunk_id: str):
+        """Remove one chunk from the in-memory structures"""
+        chunk = self._chunks.pop(chunk_id, None)
+        if chunk is None:
+            return
+        for term in chunk["terms"]:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(chunk_id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= chunk["length"]
+
+    def _log(self, operation: Dict[str, Any]):
+        """Append an operation to the log, compacting when it grows too long"""
+        if not self.path:
+            return
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.log", "a", encoding="utf-8") as f:
+            f.write(json.dumps(operation) + "\n")
+
+        self._logged_ops += 1
+        if self._logged_ops >= self.compact_every:
+            self.save()
+
+    def _load(self):
+        """Load the snapshot and replay the operation log"""
+        snapshot_path = f"{self.path}.json"
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            for chunk_id, chunk in snapshot.get("chunks", {}).items():
+                self._add_counts(chunk_id, chunk["tf"], chunk["category"])
+
+        log_path = f"{self.path}.log"
+        if os.path.exists(log_path):
+            with open(log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        operation = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-write; everything before it is valid
+                        break
+                    if operation["op"] == "add":
+                        for entry in operation["chunks"]:
+                            self._add_entry(entry["id"], entry["text"], entry["category"])
+                    elif operation["op"] == "remove":
+                        for chunk_id in operation["ids"]:
+                            self._remove_entry(chunk_id)
+                    self._logged_ops += 1
@@ -0,0 +1,155 @@
+import re
+from typing import List, Tuple, Optional
+
+# Sentence and paragraph boundaries: a blank line ends a paragraph; sentence
+# punctuation followed by whitespace or a single line break ends a sentence.
+_BOUNDARY_RE = re.compile(r"\n[ \t]*\n\s*|[.!?]+[\"')\]]*(?=\s)|\n")
+
+# Rough word-piece approximation used when no tokenizer is available
+_APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class TokenChunker:
+    def __init__(self, tokenizer=None, max_tokens: int = 254, overlap_tokens: int = 32, paragraph_fill: float = 0.75):
+        """
+        Split text into chunks that fit the embedding model's token window.
+
+        Text is segmented into sentences in a single regex pass, every sentence is
+        tokenized once in a batch, and sentences are packed greedily into chunks of at
+        most ``max_tokens`` tokens. Consecutive chunks share up to ``overlap_tokens``
+        tokens of whole trailing sentences. A chunk is closed early at a paragraph
+        break once it is ``paragraph_fill`` full, and sentences longer than the budget
+        are split on token boundaries.
+
+        Args:
+            tokenizer: HuggingFace fast tokenizer of the embedding model (if None, tokens are approximated)
+            max_tokens: Token budget per chunk, excluding special tokens
+            overlap_tokens: Token overlap between consecutive chunks
+            paragraph_fill: Fraction of the budget after which a paragraph break ends a chunk
+        """
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.paragraph_fill = paragraph_fill
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Count tokens (without special tokens) for a batch of texts"""
+        if not texts:
+            return []
+        if self.tokenizer is None:
+            return [len(_APPROX_TOKEN_RE.findall(text)) for text in texts]
+
+        encoded = self.tokenizer(texts, add_special_tokens=False, return_attention_mask=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def split_text(self, text: str) -> List[str]:
+        """Split text into token-bounded chunks"""
+        segments = self._segment(text)
+        if not segments:
+            return []
+
+        token_counts = self.count_tokens([text[start:end] for start, end, _ in segments])
+
+        chunks = []
+        # Segments (start, end, tokens) of the chunk being built
+        current = []
+        current_tokens = 0
+
+        for (start, end, starts_paragraph), tokens in zip(segments, token_counts):
+            if tokens > self.max_tokens:
+                if current:
+                    chunks.append(self._join(text, current))
+                current, current_tokens = [], 0
+                chunks.extend(self._split_long_segment(text, start, end))
+                continue
+
+            paragraph_break = starts_paragraph and current_tokens >= self.paragraph_fill * self.max_tokens
+            if current and (current_tokens + tokens > self.max_tokens or paragraph_break):
+                chunks.append(self._join(text, current))
+                current = self._overlap_tail(current, self.max_tokens - tokens)
+                current_tokens = sum(segment[2] for segment in current)
+
+            current.append((start, end, tokens))
+            current_tokens += tokens
+
+        if current:
+            chunks.append(self._join(text, current))
+
+        return [chunk for chunk in chunks if chunk]
+
+    def _segment(self, text: str) -> List[Tuple[int, int, bool]]:
+        """Return (start, end, starts_paragraph) spans of the sentences in ``text``"""
+        segments = []
+        position = 0
+        starts_paragraph = True
+
+        for match in _BOUNDARY_RE.finditer(text):
+            is_paragraph_break = match.group().startswith("\n") and match.group().count("\n") > 1
+            # Sentence punctuation stays with its sentence; line breaks do not
+            end = match.start() if match.group().startswith("\n") else match.end()
+            self._append_segment(text, segments, position, end, starts_paragraph)
+            if end > position and text[position:end].strip():
+                starts_paragraph = False
+            if is_paragraph_break:
+                starts_paragraph = True
+            position = match.end()
+
+        self._append_segment(text, segments, position, len(text), starts_paragraph)
+        return segments
+
+    @staticmethod
+    def _append_segment(text: str, segments: List[Tuple[int, int, bool]], start: int, end: int, starts_paragraph: bool):
+        """Append a span trimmed of surrounding whitespace, skipping empty spans"""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            segments.append((start, end, starts_paragraph))
+
+    def _overlap_tail(self, segments: List[Tuple[int, int, int]], room: int) -> List[Tuple[int, int, int]]:
+        """Trailing whole segments worth at most ``overlap_tokens`` tokens that still leave ``room``"""
+        limit = min(self.overlap_tokens, room)
+        tail = []
+        total = 0
+        for segment in reversed(segments):
+            if total + segment[2] > limit:
+                break
+            tail.insert(0, segment)
+            total += segment[2]
+        return tail
+
+    def _split_long_segment(self, text: str, start: int, end: int) -> List[str]:
+        """Split a single over-long sentence into overlapping token windows"""
+        segment = text[start:end]
+        step = self.max_tokens - self.overlap_tokens
+
+        if self.tokenizer is None:
+            offsets = [match.span() for match in _APPROX_TOKEN_RE.finditer(segment)]
+        else:
+            encoded = self.tokenizer(segment, add_special_tokens=False, return_offsets_mapping=True)
+            offsets = encoded["offset_mapping"]
+
+        windows = []
+        for i in range(0, len(offsets), step):
+            window = offsets[i:i + self.max_tokens]
+            windows.append(segment[window[0][0]:window[-1][1]].strip())
+            if i + self.max_tokens >= len(offsets):
+                break
+        return windows
+
+    @staticmethod
+    def _join(text: str, segments: List[Tuple[int, int, int]]) -> str:
+        """Slice the chunk straight out of the source text"""
+        return text[segments[0][0]:segments[-1][1]].strip()
+
+
+def get_model_token_budget(model, default: int = 254) -> int:
+    """Token budget per chunk for a SentenceTransformer-style model, excluding [CLS]/[SEP]"""
+    max_seq_length: Optional[int] = getattr(model, "max_seq_length", None)
+    if not max_seq_length:
+        return default
+    return max_seq_length - 2
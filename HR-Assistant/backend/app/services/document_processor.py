@@ -1,12 +1,15 @@
 import os
-from typing import List, Dict, Any
+import time
+import hashlib
+import threading
+from typing import List, Dict, Any, Callable, Optional
 import uuid
 import pdfplumber
 from docx import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
 import logging
 
+from app.config import INGESTION_EMBED_BATCH_SIZE, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+from app.services.chunker import TokenChunker, get_model_token_budget
 from app.services.vector_store import VectorStore
 
 # Configure logging
@@ -17,12 +20,28 @@ class DocumentProcessor:
     def __init__(self, vector_store: VectorStore):
         """Initialize the document processor with a vector store"""
         self.vector_store = vector_store
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=50,
-            separators=["\n\n", "\n", ".", " "]
-        )
+        self._text_splitter = None
+        self._text_splitter_model = None
+        # Serializes incremental updates so two versions of a document never interleave
+        self._update_lock = threading.Lock()
+    
+    @property
+    def model(self):
+        """Embedding model of the active index"""
+        return self.vector_store.active_index.model
+    
+    @property
+    def text_splitter(self) -> TokenChunker:
+        """Chunker sized to the active embedding model's tokenizer and window"""
+        model = self.model
+        if self._text_splitter_model is not model:
+            self._text_splitter = TokenChunker(
+                tokenizer=model.tokenizer,
+                max_tokens=CHUNK_MAX_TOKENS or get_model_token_budget(model),
+                overlap_tokens=CHUNK_OVERLAP_TOKENS
+            )
+            self._text_splitter_model = model
+        return self._text_splitter
     
     def process_documents(self, file_infos: List[Dict[str, Any]]):
         """Process a list of documents"""
@@ -32,86 +51,284 @@ class DocumentProcessor:
             except Exception as e:
                 logger.error(f"Error processing document {file_info['original_name']}: {e}")
     
-    def _process_single_document(self, file_info: Dict[str, Any]):
+    def process_document(self,
+                         file_info: Dict[str, Any],
+                         throttle: Optional[Callable[[], None]] = None,
+                         chunks: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Process a single document and return its document ID, chunk count and stage timings.
+
+        ``throttle`` is called between embedding batches so callers can pause ingestion
+        while higher-priority work (user queries) is running. When ``file_info`` carries a
+        ``document_id`` the existing document is updated incrementally instead. ``chunks``
+        skips extraction and chunking when the caller has already split the file.
+        """
+        if file_info.get("document_id"):
+            with self._update_lock:
+                return self._update_single_document(file_info, throttle=throttle, chunks=chunks)
+        return self._process_single_document(file_info, throttle=throttle, chunks=chunks)
+    
+    def _split_file(self, file_info: Dict[str, Any], timings: Dict[str, float]) -> List[str]:
+        """Extract and chunk the text of a saved file, recording both stage timings"""
+        stage_start = time.perf_counter()
+        text = self._extract_text(file_info["saved_path"])
+        timings["extract"] = time.perf_counter() - stage_start
+        
+        stage_start = time.perf_counter()
+        chunks = self.text_splitter.split_text(text)
+        timings["chunk"] = time.perf_counter() - stage_start
+        return chunks
+    
+    def _process_single_document(self,
+                                 file_info: Dict[str, Any],
+                                 throttle: Optional[Callable[[], None]] = None,
+                                 chunks: Optional[List[str]] = None) -> Dict[str, Any]:
         """Process a single document"""
-        file_path = file_info["saved_path"]
-        category = file_info["category"]
-        document_type = file_info["document_type"]
+        timings = {}
+        started = time.perf_counter()
         original_name = file_info["original_name"]
         
         logger.info(f"Processing document: {original_name}")
         
-        # Extract text based on file type
-        text = self._extract_text(file_path)
+        # Extract and chunk the text based on file type
+        if chunks is None:
+            chunks = self._split_file(file_info, timings)
         
-        # Generate document ID
-        document_id = f"doc_{uuid.uuid4()}"
+        # Generate embeddings
+        stage_start = time.perf_counter()
+        index = self.vector_store.active_index
+        embeddings = self._embed_chunks(chunks, index.model, throttle=throttle)
+        timings["embed"] = time.perf_counter() - stage_start
         
-        # Chunk the text
-        chunks = self.text_splitter.split_text(text)
+        # Add chunks and document metadata to the vector store
+        stage_start = time.perf_counter()
+        document_id = self.index_document(file_info, chunks, embeddings, index_version=index.version)
+        timings["store"] = time.perf_counter() - stage_start
+        timings["total"] = time.perf_counter() - started
         
-        # Generate embeddings
-        embeddings = self.model.encode(chunks, show_progress_bar=False)
+        logger.info(f"Successfully processed document: {original_name}")
+        
+        return {
+            "document_id": document_id,
+            "chunk_count": len(chunks),
+            "timings": timings
+        }
+    
+    def index_document(self,
+                       file_info: Dict[str, Any],
+                       chunks: List[str],
+                       embeddings: List[List[float]],
+                       index_version: Optional[int] = None) -> str:
+        """Store already chunked and embedded text as a new document and return its ID"""
+        # Generate document ID
+        document_id = f"doc_{uuid.uuid4()}"
         
         # Prepare metadata for each chunk
-        metadata_list = []
-        for i, _ in enumerate(chunks):
-            metadata_list.append({
-                "document_id": document_id,
-                "chunk_index": i,
-                "category": category,
-                "document_type": document_type,
-                "original_name": original_name,
-                "source": f"{original_name} (Chunk {i+1}/{len(chunks)})"
-            })
+        metadata_list = [
+            self._chunk_metadata(document_id, file_info, i, len(chunks))
+            for i in range(len(chunks))
+        ]
         
         # Add chunks to vector store
         chunk_ids = self.vector_store.add_document_chunks(
             chunks=chunks,
-            embeddings=[emb.tolist() for emb in embeddings],
-            metadata_list=metadata_list
+            embeddings=embeddings,
+            metadata_list=metadata_list,
+            index_version=index_version
         )
         
         # Store document metadata
         document_metadata = {
-            "original_name": original_name,
-            "file_path": file_path,
-            "category": category,
-            "document_type": document_type,
+            "original_name": file_info["original_name"],
+            "file_path": file_info["saved_path"],
+            "category": file_info["category"],
+            "document_type": file_info["document_type"],
             "chunk_count": len(chunks),
-            "chunk_ids": chunk_ids
+            "chunk_ids": chunk_ids,
+            "chunk_hashes": [self._chunk_hash(chunk) for chunk in chunks],
+            "version": 1
         }
+        if file_info.get("content_hash"):
+            document_metadata["content_hash"] = file_info["content_hash"]
+            document_metadata["file_size"] = file_info.get("file_size")
         
         self.vector_store.add_document_metadata(document_id, document_metadata)
         
-        logger.info(f"Successfully processed document: {original_name}")
-        
         return document_id
     
-    def _extract_text(self, file_path: str) -> str:
+    def _update_single_document(self,
+                                file_info: Dict[str, Any],
+                                throttle: Optional[Callable[[], None]] = None,
+                                chunks: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Update an existing document, re-embedding only the chunks that changed"""
+        timings = {}
+        started = time.perf_counter()
+        document_id = file_info["document_id"]
+        original_name = file_info["original_name"]
+        
+        existing = self.vector_store.get_document_metadata(document_id)
+        if existing is None:
+            raise ValueError(f"Document {document_id} not found")
+        
+        logger.info(f"Updating document: {original_name} ({document_id})")
+        
+        # Extract and chunk the new version
+        if chunks is None:
+            chunks = self._split_file(file_info, timings)
+        chunk_hashes = [self._chunk_hash(chunk) for chunk in chunks]
+        
+        # Hashes of the stored chunks (older documents only have their texts)
+        old_ids = existing.get("chunk_ids", [])
+        old_hashes = existing.get("chunk_hashes")
+        if old_hashes is None or len(old_hashes) != len(old_ids):
+            stored_texts = self.vector_store.get_chunk_texts(old_ids)
+            old_hashes = [self._chunk_hash(stored_texts.get(chunk_id, "")) for chunk_id in old_ids]
+        
+        # Match new chunks to unchanged stored chunks by hash (as a multiset)
+        available = {}
+        for chunk_id, chunk_hash in zip(old_ids, old_hashes):
+            available.setdefault(chunk_hash, []).append(chunk_id)
+        
+        chunk_ids = [None] * len(chunks)
+        new_positions = []
+        for i, chunk_hash in enumerate(chunk_hashes):
+            if available.get(chunk_hash):
+                chunk_ids[i] = available[chunk_hash].pop(0)
+            else:
+                new_positions.append(i)
+        removed_ids = [chunk_id for ids in available.values() for chunk_id in ids]
+        
+        # Embed and add only the new chunks
+        stage_start = time.perf_counter()
+        new_chunks = [chunks[i] for i in new_positions]
+        index = self.vector_store.active_index
+        embeddings = self._embed_chunks(new_chunks, index.model, throttle=throttle)
+        timings["embed"] = time.perf_counter() - stage_start
+        
+        stage_start = time.perf_counter()
+        metadata_list = [
+            self._chunk_metadata(document_id, file_info, i, len(chunks))
+            for i in range(len(chunks))
+        ]
+        if new_chunks:
+            added_ids = self.vector_store.add_document_chunks(
+                chunks=new_chunks,
+                embeddings=embeddings,
+                metadata_list=[metadata_list[i] for i in new_positions],
+                index_version=index.version
+            )
+            for i, chunk_id in zip(new_positions, added_ids):
+                chunk_ids[i] = chunk_id
+        
+        # Kept chunks only need their positions and labels refreshed
+        new_position_set = set(new_positions)
+        kept_positions = [i for i in range(len(chunks)) if i not in new_position_set]
+        category_changed = file_info["category"] != existing.get("category")
+        self.vector_store.update_chunk_metadata(
+            [chunk_ids[i] for i in kept_positions],
+            [metadata_list[i] for i in kept_positions],
+            chunks=[chunks[i] for i in kept_positions] if category_changed else None
+        )
+        self.vector_store.delete_chunks(removed_ids)
+        
+        # Update the document metadata in place
+        old_file_path = existing.get("file_path")
+        document_metadata = dict(existing)
+        document_metadata.update({
+            "original_name": original_name,
+            "file_path": file_info["saved_path"],
+            "category": file_info["category"],
+            "document_type": file_info["document_type"],
+            "chunk_count": len(chunks),
+            "chunk_ids": chunk_ids,
+            "chunk_hashes": chunk_hashes,
+            "version": existing.get("version", 1) + 1,
+            "updated_at": time.time()
+        })
+        if file_info.get("content_hash"):
+            document_metadata["content_hash"] = file_info["content_hash"]
+            document_metadata["file_size"] = file_info.get("file_size")
+        self.vector_store.update_document_metadata(document_id, document_metadata)
+        
+        if old_file_path and old_file_path != file_info["saved_path"] and os.path.exists(old_file_path):
+            os.remove(old_file_path)
+        
+        timings["store"] = time.perf_counter() - stage_start
+        timings["total"] = time.perf_counter() - started
+        
+        logger.info(
+            f"Updated document {original_name}: {len(new_positions)} chunks embedded, "
+            f"{len(kept_positions)} reused, {len(removed_ids)} removed"
+        )
+        
+        return {
+            "document_id": document_id,
+            "chunk_count": len(chunks),
+            "timings": timings,
+            "changes": {
+                "added": len(new_positions),
+                "reused": len(kept_positions),
+                "removed": len(removed_ids),
+                "version": document_metadata["version"]
+            }
+        }
+    
+    @staticmethod
+    def _chunk_metadata(document_id: str, file_info: Dict[str, Any], index: int, total: int) -> Dict[str, Any]:
+        """Build the metadata stored with one chunk"""
+        original_name = file_info["original_name"]
+        return {
+            "document_id": document_id,
+            "chunk_index": index,
+            "category": file_info["category"],
+            "document_type": file_info["document_type"],
+            "original_name": original_name,
+            "source": f"{original_name} (Chunk {index+1}/{total})"
+        }
+    
+    @staticmethod
+    def _chunk_hash(chunk: str) -> str:
+        """Content hash used to recognise unchanged chunks across document versions"""
+        return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+    
+    def _embed_chunks(self, chunks: List[str], model, throttle: Optional[Callable[[], None]] = None) -> List[List[float]]:
+        """Embed chunks in batches with ``model``, calling ``throttle`` before each batch"""
+        embeddings = []
+        for i in range(0, len(chunks), INGESTION_EMBED_BATCH_SIZE):
+            if throttle is not None:
+                throttle()
+            batch = chunks[i:i + INGESTION_EMBED_BATCH_SIZE]
+            batch_embeddings = model.encode(batch, show_progress_bar=False)
+            embeddings.extend(emb.tolist() for emb in batch_embeddings)
+        return embeddings
+    
+    @classmethod
+    def _extract_text(cls, file_path: str) -> str:
         """Extract text from a document based on its file extension"""
         _, file_extension = os.path.splitext(file_path)
         
         if file_extension.lower() == ".pdf":
-            return self._read_pdf(file_path)
+            return cls._read_pdf(file_path)
         elif file_extension.lower() == ".docx":
-            return self._read_docx(file_path)
+            return cls._read_docx(file_path)
         elif file_extension.lower() == ".txt":
-            return self._read_txt(file_path)
+            return cls._read_txt(file_path)
         else:
             raise ValueError(f"Unsupported file type: {file_extension}")
     
-    def _read_pdf(self, file_path: str) -> str:
+    @staticmethod
+    def _read_pdf(file_path: str) -> str:
         """Extract text from a PDF file"""
         with pdfplumber.open(file_path) as pdf:
             return "\n".join([page.extract_text() for page in pdf.pages if page.extract_text()])
     
-    def _read_docx(self, file_path: str) -> str:
+    @staticmethod
+    def _read_docx(file_path: str) -> str:
         """Extract text from a DOCX file"""
         doc = Document(file_path)
         return "\n".join([para.text for para in doc.paragraphs])
     
-    def _read_txt(self, file_path: str) -> str:
+    @staticmethod
+    def _read_txt(file_path: str) -> str:
         """Extract text from a TXT file"""
         with open(file_path, 'r', encoding='utf-8') as f:
             return f.read() 
\ No newline at end of file
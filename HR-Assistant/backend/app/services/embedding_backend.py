@@ -0,0 +1,339 @@
+import os
+import re
+import json
+import logging
+import threading
+from concurrent.futures import Future
+from typing import List, Dict, Any, Optional, Union
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from app.config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL,
+    ONNX_CACHE_DIR,
+    ONNX_QUANTIZE,
+    ONNX_NUM_THREADS,
+    ONNX_MIN_COSINE
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Sentences used to verify an exported model against the PyTorch reference
+DRIFT_CHECK_SENTENCES = [
+    "How many vacation days do I get as a new employee?",
+    "What's the process for requesting parental leave?",
+    "Can I work remotely and what are the guidelines?",
+    "How do I enroll in health insurance?",
+    "The company matches 401k contributions up to 4% of base salary.",
+    "Submit Form I-9 with two forms of identification on your first day.",
+    "Unused PTO up to 40 hours carries over to the next calendar year.",
+    "Harassment of any kind is prohibited and should be reported to HR immediately."
+]
+
+
+class TorchEmbeddingBackend:
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        """Embed text with the PyTorch SentenceTransformer model"""
+        self.name = "torch"
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.tokenizer = self.model.tokenizer
+        self.max_seq_length = self.model.max_seq_length
+
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        """Encode one text (1-D result) or a list of texts (2-D result)"""
+        return self.model.encode(texts, batch_size=batch_size, show_progress_bar=show_progress_bar)
+
+
+class OnnxEmbeddingBackend:
+    def __init__(self,
+                 model_name: str = "all-MiniLM-L6-v2",
+                 cache_dir: str = "onnx_models",
+                 quantize: bool = True,
+                 num_threads: Optional[int] = None):
+        """
+        Embed text with an ONNX export of a SentenceTransformer model served by onnxruntime.
+
+        The model is exported (and optionally int8 dynamically quantized) once into
+        ``cache_dir`` and reused on later starts. Pooling and normalization follow the
+        original SentenceTransformer pipeline.
+
+        Args:
+            model_name: SentenceTransformer model to export
+            cache_dir: Directory holding exported models
+            quantize: Use int8 dynamic quantization of the weights
+            num_threads: Intra-op threads for onnxruntime (if None, one per core)
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.name = "onnx-int8" if quantize else "onnx"
+        self.model_name = model_name
+        self.model_dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        model_path = export_onnx_model(model_name, self.model_dir, quantize=quantize)
+
+        with open(os.path.join(self.model_dir, "pipeline.json"), "r") as f:
+            pipeline = json.load(f)
+        self.pooling = pipeline["pooling"]
+        self.normalize = pipeline["normalize"]
+        self.max_seq_length = pipeline["max_seq_length"]
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or os.cpu_count() or 1
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        """Encode one text (1-D result) or a list of texts (2-D result)"""
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # Batch texts of similar length together to minimise padding
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = [None] * len(texts)
+        for start in range(0, len(texts), batch_size):
+            batch_indices = order[start:start + batch_size]
+            batch_embeddings = self._encode_batch([texts[i] for i in batch_indices])
+            for i, embedding in zip(batch_indices, batch_embeddings):
+                embeddings[i] = embedding
+
+        result = np.vstack(embeddings)
+        return result[0] if single else result
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Run one padded batch through the ONNX session and pool the token embeddings"""
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names if name in encoded}
+        token_embeddings = self.session.run(["last_hidden_state"], feeds)[0]
+
+        if self.pooling == "cls":
+            pooled = token_embeddings[:, 0]
+        else:
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self.normalize:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+
+def export_onnx_model(model_name: str, output_dir: str, quantize: bool = True) -> str:
+    """
+    Export a SentenceTransformer's transformer module to ONNX, reusing an earlier export.
+
+    Args:
+        model_name: SentenceTransformer model to export
+        output_dir: Directory for the ONNX files, tokenizer and pipeline description
+        quantize: Also produce (and return) an int8 dynamically quantized model
+
+    Returns:
+        Path of the ONNX model to serve
+    """
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    int8_path = os.path.join(output_dir, "model.int8.onnx")
+    target_path = int8_path if quantize else fp32_path
+    if os.path.exists(target_path):
+        return target_path
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    if not os.path.exists(fp32_path):
+        import torch
+
+        logger.info(f"Exporting {model_name} to ONNX in {output_dir}")
+        st_model = SentenceTransformer(model_name, device="cpu")
+        transformer = st_model[0].auto_model
+        transformer.config.return_dict = False
+        transformer.eval()
+
+        tokenizer = st_model.tokenizer
+        dummy = tokenizer(["Export sample sentence"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer,
+                tuple(dummy[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+
+        tokenizer.save_pretrained(output_dir)
+        with open(os.path.join(output_dir, "pipeline.json"), "w") as f:
+            json.dump(_describe_pipeline(st_model), f)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        logger.info(f"Quantizing {fp32_path} to int8")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    return target_path
+
+
+def _describe_pipeline(st_model: SentenceTransformer) -> Dict[str, Any]:
+    """Record the pooling and normalization steps of a SentenceTransformer"""
+    pooling = "mean"
+    normalize = False
+    for module in st_model:
+        module_type = type(module).__name__
+        if module_type == "Pooling" and getattr(module, "pooling_mode_cls_token", False):
+            pooling = "cls"
+        elif module_type == "Normalize":
+            normalize = True
+    return {
+        "pooling": pooling,
+        "normalize": normalize,
+        "max_seq_length": st_model.max_seq_length
+    }
+
+
+def check_drift(reference, candidate, texts: Optional[List[str]] = None) -> Dict[str, float]:
+    """
+    Compare the embeddings of two backends on the same texts.
+
+    Returns:
+        Dictionary with the minimum and mean cosine similarity between paired vectors
+    """
+    texts = texts or DRIFT_CHECK_SENTENCES
+    expected = np.asarray(reference.encode(texts), dtype=np.float32)
+    actual = np.asarray(candidate.encode(texts), dtype=np.float32)
+
+    dots = (expected * actual).sum(axis=1)
+    norms = np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    cosines = dots / np.clip(norms, 1e-12, None)
+    return {
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean())
+    }
+
+
+def create_embedding_backend(backend: str = "torch",
+                             model_name: str = "all-MiniLM-L6-v2",
+                             cache_dir: str = "onnx_models",
+                             quantize: bool = True,
+                             num_threads: Optional[int] = None,
+                             min_cosine: float = 0.99):
+    """
+    Create an embedding backend by name ("torch" or "onnx").
+
+    A newly exported ONNX model is checked against the PyTorch model first; if its
+    vectors drift below ``min_cosine`` the PyTorch backend is used instead.
+    """
+    if backend == "torch":
+        return TorchEmbeddingBackend(model_name)
+    if backend != "onnx":
+        raise ValueError(f"Unsupported embedding backend: {backend}")
+
+    model_dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+    verified_path = os.path.join(model_dir, "drift_check.json")
+    onnx_backend = OnnxEmbeddingBackend(model_name, cache_dir=cache_dir, quantize=quantize, num_threads=num_threads)
+
+    drift = None
+    if os.path.exists(verified_path):
+        with open(verified_path, "r") as f:
+            drift = json.load(f).get(onnx_backend.name)
+
+    torch_backend = None
+    if drift is None:
+        torch_backend = TorchEmbeddingBackend(model_name)
+        drift = check_drift(torch_backend, onnx_backend)
+        checks = {}
+        if os.path.exists(verified_path):
+            with open(verified_path, "r") as f:
+                checks = json.load(f)
+        checks[onnx_backend.name] = drift
+        with open(verified_path, "w") as f:
+            json.dump(checks, f)
+        logger.info(f"ONNX drift check for {onnx_backend.name}: {drift}")
+
+    if drift["min_cosine"] < min_cosine:
+        logger.error(
+            f"{onnx_backend.name} embeddings drift from PyTorch (min cosine {drift['min_cosine']:.4f} "
+            f"< {min_cosine}); falling back to the PyTorch backend"
+        )
+        return torch_backend or TorchEmbeddingBackend(model_name)
+
+    return onnx_backend
+
+
+# (backend, model) -> Future of the backend, so a slow load only blocks its own callers
+_embedding_backends: Dict[tuple, Future] = {}
+_active_embedding = (EMBEDDING_BACKEND, EMBEDDING_MODEL)
+_embedding_backend_lock = threading.Lock()
+
+
+def get_embedding_backend(backend: Optional[str] = None, model_name: Optional[str] = None):
+    """
+    Get a shared embedding backend.
+
+    Without arguments this returns the backend of the active index (see
+    ``set_active_embedding``), which starts out as the one configured through the
+    environment. Backends are created once and cached per (backend, model); the
+    lock is held only for the cache lookup, so loading a new backend (download,
+    ONNX export, drift check) does not block callers of an already loaded one.
+    """
+    with _embedding_backend_lock:
+        key = (backend or _active_embedding[0], model_name or _active_embedding[1])
+        future = _embedding_backends.get(key)
+        creating = future is None
+        if creating:
+            future = Future()
+            _embedding_backends[key] = future
+
+    if creating:
+        try:
+            future.set_result(create_embedding_backend(
+                backend=key[0],
+                model_name=key[1],
+                cache_dir=ONNX_CACHE_DIR,
+                quantize=ONNX_QUANTIZE,
+                num_threads=ONNX_NUM_THREADS,
+                min_cosine=ONNX_MIN_COSINE
+            ))
+        except BaseException as e:
+            # Let the next caller retry instead of caching the failure
+            with _embedding_backend_lock:
+                if _embedding_backends.get(key) is future:
+                    del _embedding_backends[key]
+            future.set_exception(e)
+            raise
+
+    return future.result()
+
+
+def set_active_embedding(backend: str, model_name: str):
+    """Make (backend, model) the default returned by ``get_embedding_backend``"""
+    global _active_embedding
+
+    with _embedding_backend_lock:
+        _active_embedding = (backend, model_name)
+
+
+def release_embedding_backend(backend: str, model_name: str):
+    """Drop a cached backend that is no longer used"""
+    with _embedding_backend_lock:
+        if (backend, model_name) != _active_embedding:
+            _embedding_backends.pop((backend, model_name), None)
@@ -0,0 +1,114 @@
+import os
+import hashlib
+from typing import Dict, Any, BinaryIO
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an uploaded file exceeds the configured size limit"""
+
+    def __init__(self, filename: str, max_size: int):
+        super().__init__(f"File {filename} exceeds the maximum upload size of {max_size} bytes")
+        self.filename = filename
+        self.max_size = max_size
+
+
+def _write_chunk(buffer: BinaryIO, hasher, chunk: bytes):
+    """Write a chunk to disk and feed it to the running hash"""
+    hasher.update(chunk)
+    buffer.write(chunk)
+
+
+def _remove_partial(file_path: str):
+    """Remove a partially written file"""
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+
+async def save_upload_stream(upload: UploadFile, file_path: str, max_size: int, chunk_size: int) -> Dict[str, Any]:
+    """
+    Stream an uploaded file to disk in fixed-size chunks without blocking the event loop.
+
+    The SHA-256 of the content is computed while the bytes are written, so callers get a
+    content hash for duplicate detection without reading the file a second time.
+
+    Args:
+        upload: FastAPI upload to read from
+        file_path: Destination path
+        max_size: Maximum number of bytes accepted
+        chunk_size: Number of bytes read and written per step
+
+    Returns:
+        Dictionary with the file size in bytes and its content hash
+    """
+    # Reject early when the client declared the size up front
+    declared_size = getattr(upload, "size", None)
+    if declared_size is not None and declared_size > max_size:
+        raise UploadTooLargeError(upload.filename, max_size)
+
+    hasher = hashlib.sha256()
+    size = 0
+
+    buffer = await run_in_threadpool(open, file_path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+
+            size += len(chunk)
+            if size > max_size:
+                raise UploadTooLargeError(upload.filename, max_size)
+
+            await run_in_threadpool(_write_chunk, buffer, hasher, chunk)
+    except Exception:
+        await run_in_threadpool(buffer.close)
+        await run_in_threadpool(_remove_partial, file_path)
+        raise
+
+    await run_in_threadpool(buffer.close)
+
+    return {
+        "size": size,
+        "content_hash": hasher.hexdigest()
+    }
+
+
+def save_file_stream(source: BinaryIO, file_path: str, max_size: int, chunk_size: int) -> Dict[str, Any]:
+    """
+    Synchronous counterpart of ``save_upload_stream`` for copying local files.
+
+    Args:
+        source: Binary file object to read from
+        file_path: Destination path
+        max_size: Maximum number of bytes accepted
+        chunk_size: Number of bytes read and written per step
+
+    Returns:
+        Dictionary with the file size in bytes and its content hash
+    """
+    hasher = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(file_path, "wb") as buffer:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(getattr(source, "name", file_path), max_size)
+
+                _write_chunk(buffer, hasher, chunk)
+    except Exception:
+        _remove_partial(file_path)
+        raise
+
+    return {
+        "size": size,
+        "content_hash": hasher.hexdigest()
+    }
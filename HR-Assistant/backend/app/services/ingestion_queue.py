@@ -0,0 +1,263 @@
+import os
+import time
+import uuid
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+from app.services.document_processor import DocumentProcessor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Job and file states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+COMPLETED_WITH_ERRORS = "completed_with_errors"
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue cannot accept more files"""
+
+    def __init__(self, pending: int, max_depth: int, retry_after: int):
+        super().__init__(f"Ingestion queue is full ({pending}/{max_depth} files pending)")
+        self.pending = pending
+        self.max_depth = max_depth
+        self.retry_after = retry_after
+
+
+class IngestionJob:
+    def __init__(self, file_infos: List[Dict[str, Any]]):
+        """Track the state of one upload batch (or document update) and each of its files"""
+        self.id = f"job_{uuid.uuid4()}"
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.files = []
+        for file_info in file_infos:
+            self.files.append({
+                "file_info": file_info,
+                "status": QUEUED,
+                "document_id": None,
+                "chunk_count": None,
+                "timings": {},
+                "changes": None,
+                "error": None,
+                "started_at": None,
+                "finished_at": None
+            })
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED, COMPLETED_WITH_ERRORS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the job for the status API"""
+        files = []
+        for entry in self.files:
+            files.append({
+                "original_name": entry["file_info"]["original_name"],
+                "category": entry["file_info"]["category"],
+                "document_type": entry["file_info"]["document_type"],
+                "status": entry["status"],
+                "document_id": entry["document_id"],
+                "chunk_count": entry["chunk_count"],
+                "timings": entry["timings"],
+                "changes": entry["changes"],
+                "error": entry["error"],
+                "started_at": entry["started_at"],
+                "finished_at": entry["finished_at"]
+            })
+
+        done = sum(1 for entry in self.files if entry["status"] in (COMPLETED, FAILED))
+        return {
+            "id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": {"done": done, "total": len(self.files)},
+            "chunk_count": sum(entry["chunk_count"] or 0 for entry in self.files),
+            "files": files
+        }
+
+
+class IngestionQueue:
+    def __init__(self,
+                 document_processor: DocumentProcessor,
+                 max_workers: int = 1,
+                 max_queue_depth: int = 50,
+                 query_yield_timeout: float = 2.0,
+                 job_history: int = 500):
+        """Run document ingestion on a bounded worker pool.
+
+        Files are processed one per worker. Uploads are rejected once more than
+        ``max_queue_depth`` files are waiting or running, and workers pause between
+        embedding batches while queries are in flight (for at most
+        ``query_yield_timeout`` seconds) so that ingestion does not starve /query.
+        """
+        # Leave at least one core to the query path
+        cpu_count = os.cpu_count() or 1
+        self.max_workers = max(1, min(max_workers, cpu_count - 1))
+        self.max_queue_depth = max_queue_depth
+        self.query_yield_timeout = query_yield_timeout
+        self.job_history = job_history
+
+        self.document_processor = document_processor
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ingestion")
+
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._pending_files = 0
+        self._pending_hashes = {}
+        self._avg_file_seconds = None
+
+        self._active_queries = 0
+        self._queries_idle = threading.Condition()
+
+    @property
+    def pending_files(self) -> int:
+        return self._pending_files
+
+    def has_capacity(self, file_count: int) -> bool:
+        """Check whether ``file_count`` more files can be queued"""
+        return self._pending_files + file_count <= self.max_queue_depth
+
+    def retry_after(self) -> int:
+        """Estimate (in seconds) how long until the queue has room again"""
+        per_file = self._avg_file_seconds or 5.0
+        return max(1, int(per_file * self._pending_files / self.max_workers))
+
+    def submit(self, file_infos: List[Dict[str, Any]]) -> IngestionJob:
+        """Queue a batch of saved files for processing"""
+        job = IngestionJob(file_infos)
+
+        with self._lock:
+            if not self.has_capacity(len(file_infos)):
+                raise QueueFullError(self._pending_files, self.max_queue_depth, self.retry_after())
+            self._pending_files += len(file_infos)
+            for file_info in file_infos:
+                if file_info.get("content_hash"):
+                    self._pending_hashes[file_info["content_hash"]] = job.id
+            self._jobs[job.id] = job
+            self._evict_finished_jobs()
+
+        for entry in job.files:
+            self.executor.submit(self._run_file, job, entry)
+
+        return job
+
+    def find_pending_hash(self, content_hash: str) -> Optional[str]:
+        """Return the ID of a queued or running job that already contains this content"""
+        with self._lock:
+            return self._pending_hashes.get(content_hash)
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        """Look up a job by its ID"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Serialize a job by its ID, under the lock so workers cannot change it mid-read"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    @contextmanager
+    def query_guard(self):
+        """Mark a query as in flight so ingestion workers yield CPU to it"""
+        with self._queries_idle:
+            self._active_queries += 1
+        try:
+            yield
+        finally:
+            with self._queries_idle:
+                self._active_queries -= 1
+                if self._active_queries == 0:
+                    self._queries_idle.notify_all()
+
+    def wait_for_queries(self):
+        """Block the calling worker while queries are running, up to the yield timeout"""
+        deadline = time.monotonic() + self.query_yield_timeout
+        with self._queries_idle:
+            while self._active_queries > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._queries_idle.wait(remaining)
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work and optionally wait for running files"""
+        self.executor.shutdown(wait=wait)
+
+    def _run_file(self, job: IngestionJob, entry: Dict[str, Any]):
+        """Process a single file of a job on a worker thread"""
+        with self._lock:
+            if job.status == QUEUED:
+                job.status = RUNNING
+                job.started_at = time.time()
+            entry["status"] = RUNNING
+            entry["started_at"] = time.time()
+
+        try:
+            self.wait_for_queries()
+            result = self.document_processor.process_document(
+                entry["file_info"],
+                throttle=self.wait_for_queries
+            )
+            with self._lock:
+                entry["status"] = COMPLETED
+                entry["document_id"] = result["document_id"]
+                entry["chunk_count"] = result["chunk_count"]
+                entry["timings"] = result["timings"]
+                entry["changes"] = result.get("changes")
+        except Exception as e:
+            logger.error(f"Error processing document {entry['file_info']['original_name']}: {e}")
+            # Nothing refers to the saved upload of a file that failed
+            saved_path = entry["file_info"].get("saved_path")
+            if saved_path and os.path.exists(saved_path):
+                os.remove(saved_path)
+            with self._lock:
+                entry["status"] = FAILED
+                entry["error"] = str(e)
+        finally:
+            with self._lock:
+                entry["finished_at"] = time.time()
+                self._pending_files -= 1
+                self._pending_hashes.pop(entry["file_info"].get("content_hash"), None)
+                self._record_duration(entry["finished_at"] - entry["started_at"])
+                self._update_job_status(job)
+
+    def _record_duration(self, seconds: float):
+        """Keep an exponential moving average of per-file processing time"""
+        if self._avg_file_seconds is None:
+            self._avg_file_seconds = seconds
+        else:
+            self._avg_file_seconds = 0.8 * self._avg_file_seconds + 0.2 * seconds
+
+    def _update_job_status(self, job: IngestionJob):
+        """Roll file states up into the job state once every file has finished"""
+        statuses = [entry["status"] for entry in job.files]
+        if any(status in (QUEUED, RUNNING) for status in statuses):
+            return
+
+        job.finished_at = time.time()
+        if all(status == COMPLETED for status in statuses):
+            job.status = COMPLETED
+        elif all(status == FAILED for status in statuses):
+            job.status = FAILED
+        else:
+            job.status = COMPLETED_WITH_ERRORS
+
+    def _evict_finished_jobs(self):
+        """Drop the oldest finished jobs beyond the history limit"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[:max(0, len(finished) - self.job_history)]:
+            del self._jobs[job_id]
@@ -0,0 +1,445 @@
+import os
+import json
+import time
+import uuid
+import threading
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterator
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _categories_key(categories: Optional[List[str]]) -> List[str]:
+    """Canonical form of a category filter ([] means all categories)"""
+    return sorted(set(categories or []))
+
+
+def _normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class QueryLog:
+    def __init__(self, path: str):
+        """Append-only JSONL log of user queries, used to find frequent questions
+
+        Lines are written on a background thread so request threads never wait on the file.
+        """
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-log")
+
+    def append(self, query: str, categories: Optional[List[str]] = None):
+        """Record one query"""
+        line = json.dumps({"query": query, "categories": _categories_key(categories), "timestamp": time.time()})
+        self._executor.submit(self._write, line)
+
+    def _write(self, line: str):
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.error(f"Error writing query log: {e}")
+
+    def flush(self):
+        """Wait until every query appended so far is on disk"""
+        self._executor.submit(lambda: None).result()
+
+    def read(self, since: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Iterate over logged queries, optionally only those after ``since``"""
+        self.flush()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if since is None or entry["timestamp"] >= since:
+                    yield entry
+
+    def close(self):
+        """Finish pending writes and stop the writer thread"""
+        self._executor.shutdown(wait=True)
+
+
+def cluster_queries(embeddings: np.ndarray, weights: List[int], threshold: float = 0.85) -> List[Dict[str, Any]]:
+    """
+    Group query embeddings with single-pass leader clustering.
+
+    Queries are visited from most to least frequent, so frequent phrasings become
+    cluster leaders; each query joins the most similar cluster centroid at or above
+    ``threshold`` cosine similarity, otherwise it starts a new cluster.
+
+    Args:
+        embeddings: Query vectors, one row per distinct query
+        weights: Number of times each query was asked
+        threshold: Minimum cosine similarity to join a cluster
+
+    Returns:
+        Clusters sorted by total weight, each with member row indices, the
+        normalized centroid and the total weight
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+    sums = []
+    centroids = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+    clusters = []
+    for i in sorted(range(len(vectors)), key=lambda row: -weights[row]):
+        best = -1
+        if len(clusters):
+            similarities = centroids @ vectors[i]
+            best = int(np.argmax(similarities))
+            if similarities[best] < threshold:
+                best = -1
+
+        if best < 0:
+            clusters.append({"members": [i], "weight": weights[i]})
+            sums.append(vectors[i] * weights[i])
+            centroids = np.vstack([centroids, vectors[i]])
+        else:
+            clusters[best]["members"].append(i)
+            clusters[best]["weight"] += weights[i]
+            sums[best] = sums[best] + vectors[i] * weights[i]
+            centroids[best] = _normalize(sums[best])
+
+    for cluster, centroid in zip(clusters, centroids):
+        cluster["centroid"] = centroid
+    return sorted(clusters, key=lambda cluster: -cluster["weight"])
+
+
+class PrecomputedAnswerStore:
+    def __init__(self, path: str, similarity_threshold: float = 0.9, reload_interval: float = 5.0):
+        """
+        Answers generated ahead of time for frequent questions, persisted as JSON.
+
+        Lookups are a single matrix-vector product over the question embeddings.
+        The file is re-read when it is replaced on disk, e.g. restored from a backup.
+        """
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.reload_interval = reload_interval
+
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._loaded_mtime = None
+        self._checked_at = 0.0
+        # Lookup matrix over servable entries, rebuilt lazily after changes
+        self._matrix = None
+        self._matrix_ids = []
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self):
+        """Read the store from disk if the file exists"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        self._entries = {entry["id"]: entry for entry in entries}
+        self._loaded_mtime = os.path.getmtime(self.path)
+        self._matrix = None
+
+    def reload_if_changed(self):
+        """Pick up a store rebuilt by another process"""
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._loaded_mtime:
+            with self._lock:
+                self._load()
+
+    def save(self):
+        """Atomically write the store"""
+        with self._lock:
+            entries = list(self._entries.values())
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+            self._loaded_mtime = os.path.getmtime(self.path)
+
+    def lookup(self, query_embedding: List[float], categories: Optional[List[str]], embedding_model: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a fresh precomputed answer for a query.
+
+        Args:
+            query_embedding: Embedding of the query
+            categories: Category filter of the query; only entries built for the same filter match
+            embedding_model: Model that produced ``query_embedding``
+
+        Returns:
+            The most similar entry at or above the similarity threshold, or None
+        """
+        self.reload_if_changed()
+        with self._lock:
+            if self._matrix is None:
+                servable = [entry for entry in self._entries.values() if not entry.get("stale")]
+                self._matrix_ids = [entry["id"] for entry in servable]
+                self._matrix = (
+                    np.asarray([entry["embedding"] for entry in servable], dtype=np.float32)
+                    if servable else None
+                )
+            if self._matrix is None:
+                return None
+
+            similarities = self._matrix @ _normalize(query_embedding)
+            categories = _categories_key(categories)
+            for row in np.argsort(-similarities):
+                if similarities[row] < self.similarity_threshold:
+                    return None
+                entry = self._entries[self._matrix_ids[row]]
+                if entry["categories"] == categories and entry["embedding_model"] == embedding_model:
+                    return dict(entry, similarity=float(similarities[row]))
+            return None
+
+    def get(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            return dict(entry) if entry else None
+
+    def entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(entry) for entry in self._entries.values()]
+
+    def update(self, entry: Dict[str, Any]) -> bool:
+        """Replace one entry if it is still in the store (a rebuild may have replaced it)"""
+        with self._lock:
+            if entry["id"] not in self._entries:
+                return False
+            self._entries[entry["id"]] = entry
+            self._matrix = None
+            return True
+
+    def replace_all(self, entries: List[Dict[str, Any]]):
+        """Replace the whole store"""
+        with self._lock:
+            self._entries = {entry["id"]: entry for entry in entries}
+            self._matrix = None
+
+    def mark_stale(self, document_ids: Optional[List[str]] = None) -> List[str]:
+        """
+        Stop serving entries that cite any of ``document_ids`` (all entries if None).
+
+        Returns:
+            IDs of the entries marked stale
+        """
+        changed = set(document_ids or [])
+        with self._lock:
+            stale_ids = [
+                entry_id for entry_id, entry in self._entries.items()
+                if document_ids is None or changed.intersection(entry.get("document_ids", []))
+            ]
+            for entry_id in stale_ids:
+                self._entries[entry_id]["stale"] = True
+            if stale_ids:
+                self._matrix = None
+            return stale_ids
+
+
+class BuildInProgressError(Exception):
+    """Raised when a build of the precomputed answers is requested while one is running"""
+
+
+class PrecomputedAnswers:
+    def __init__(self, store: PrecomputedAnswerStore, query_engine, vector_store):
+        """Build precomputed answers and keep them in step with the documents they cite
+
+        Builds and regenerations run on one background thread of the API process,
+        so answers are generated against the index the server is serving.
+        """
+        self.store = store
+        self.query_engine = query_engine
+        self.vector_store = vector_store
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="precomputed-answers")
+        self._build_lock = threading.Lock()
+        # Progress of the most recent build started with start_build
+        self._build_status = None
+        # Document changes seen while build() runs (None entries mean every document);
+        # None when no build is running
+        self._changes_during_build = None
+
+    def start_build(self, logged_queries: List[Dict[str, Any]], top_clusters: int = 50, cluster_threshold: float = 0.85) -> Dict[str, Any]:
+        """
+        Run ``build`` in the background.
+
+        Returns:
+            The status of the new build (see ``build_status``)
+        """
+        with self._build_lock:
+            if self._build_status is not None and self._build_status["status"] == "running":
+                raise BuildInProgressError("Precomputed answers are already being built")
+            self._build_status = {
+                "status": "running",
+                "logged_queries": len(logged_queries),
+                "top_clusters": top_clusters,
+                "started_at": time.time()
+            }
+            status = self._build_status
+        self._executor.submit(self._run_build, status, logged_queries, top_clusters, cluster_threshold)
+        return dict(status)
+
+    def build_status(self) -> Optional[Dict[str, Any]]:
+        """Status of the most recent background build, or None if none was started"""
+        with self._build_lock:
+            return dict(self._build_status) if self._build_status is not None else None
+
+    def _run_build(self, status: Dict[str, Any], logged_queries: List[Dict[str, Any]], top_clusters: int, cluster_threshold: float):
+        started = time.perf_counter()
+        try:
+            entries = self.build(logged_queries, top_clusters=top_clusters, cluster_threshold=cluster_threshold)
+            update = {
+                "status": "completed",
+                "answers": len(entries),
+                "covered_queries": sum(entry["cluster_size"] for entry in entries)
+            }
+        except Exception as e:
+            logger.error(f"Error building precomputed answers: {e}")
+            update = {"status": "failed", "error": str(e)}
+        update["seconds"] = time.perf_counter() - started
+        with self._build_lock:
+            status.update(update)
+
+    def build(self, logged_queries: List[Dict[str, Any]], top_clusters: int = 50, cluster_threshold: float = 0.85) -> List[Dict[str, Any]]:
+        """
+        Cluster logged queries and generate answers for the largest clusters.
+
+        Args:
+            logged_queries: Entries read from the query log
+            top_clusters: Number of clusters to answer
+            cluster_threshold: Minimum cosine similarity for queries to share a cluster
+
+        Returns:
+            The generated entries (the store is replaced and saved)
+        """
+        if not any(entry["query"].strip() for entry in logged_queries):
+            return []
+
+        with self._build_lock:
+            self._changes_during_build = []
+        try:
+            entries = self._build_entries(logged_queries, top_clusters, cluster_threshold)
+            self.store.replace_all(entries)
+        finally:
+            with self._build_lock:
+                changes, self._changes_during_build = self._changes_during_build, None
+
+        # Answers generated before a document they cite changed are stale; the
+        # regenerations queued for the replaced entries find nothing to do
+        stale_ids = []
+        everything = any(document_ids is None for document_ids in changes)
+        if changes:
+            stale_ids = self.store.mark_stale(
+                None if everything else [document_id for document_ids in changes for document_id in document_ids]
+            )
+        self.store.save()
+        if stale_ids:
+            logger.info(f"Regenerating {len(stale_ids)} precomputed answers whose documents changed during the build")
+            self.regenerate(stale_ids, reembed=everything)
+        return entries
+
+    def _build_entries(self, logged_queries: List[Dict[str, Any]], top_clusters: int, cluster_threshold: float) -> List[Dict[str, Any]]:
+        """Generate the entries of a build without touching the store"""
+        # Count exact repeats first so each distinct question is embedded once
+        counts = Counter(
+            (entry["query"].strip(), tuple(_categories_key(entry.get("categories"))))
+            for entry in logged_queries if entry["query"].strip()
+        )
+
+        index = self.vector_store.active_index
+        distinct = list(counts)
+        embeddings = index.model.encode([query for query, _ in distinct], batch_size=64)
+
+        # Cluster separately per category filter, then answer the largest clusters overall
+        candidates = []
+        for categories in set(key for _, key in distinct):
+            rows = [i for i, (_, key) in enumerate(distinct) if key == categories]
+            clusters = cluster_queries(embeddings[rows], [counts[distinct[i]] for i in rows], cluster_threshold)
+            for cluster in clusters:
+                members = [rows[member] for member in cluster["members"]]
+                # The most frequent phrasing represents the cluster
+                question = distinct[max(members, key=lambda i: counts[distinct[i]])][0]
+                candidates.append((cluster["weight"], question, list(categories), cluster["centroid"]))
+
+        candidates.sort(key=lambda candidate: -candidate[0])
+        entries = []
+        for weight, question, categories, centroid in candidates[:top_clusters]:
+            try:
+                entries.append(self._generate_entry(question, categories, cluster_size=weight, embedding=centroid.tolist()))
+            except Exception as e:
+                logger.error(f"Error precomputing answer for '{question}': {e}")
+        return entries
+
+    def on_documents_changed(self, document_ids: Optional[List[str]]):
+        """Vector store change listener: stop serving affected answers and regenerate them"""
+        with self._build_lock:
+            if self._changes_during_build is not None:
+                self._changes_during_build.append(document_ids)
+        stale_ids = self.store.mark_stale(document_ids)
+        if stale_ids:
+            logger.info(f"Regenerating {len(stale_ids)} precomputed answers")
+            self._executor.submit(self.regenerate, stale_ids, document_ids is None)
+
+    def regenerate(self, entry_ids: List[str], reembed: bool = False):
+        """Regenerate entries against the current index
+
+        With ``reembed`` the question is embedded again, e.g. after a model switch.
+        """
+        for entry_id in entry_ids:
+            entry = self.store.get(entry_id)
+            if entry is None:
+                continue
+            try:
+                self.store.update(self._generate_entry(
+                    entry["question"],
+                    entry["categories"],
+                    cluster_size=entry["cluster_size"],
+                    embedding=None if reembed else entry["embedding"],
+                    entry_id=entry_id
+                ))
+            except Exception as e:
+                logger.error(f"Error regenerating precomputed answer {entry_id}: {e}")
+        self.store.save()
+
+    def _generate_entry(self,
+                        question: str,
+                        categories: List[str],
+                        cluster_size: int,
+                        embedding: Optional[List[float]] = None,
+                        entry_id: Optional[str] = None) -> Dict[str, Any]:
+        """Answer ``question`` through the full query pipeline"""
+        index = self.vector_store.active_index
+        if embedding is None:
+            embedding = index.model.encode(question).tolist()
+        result = self.query_engine.generate_response(question, categories=categories or None, use_precomputed=False)
+        return {
+            "id": entry_id or f"answer_{uuid.uuid4()}",
+            "question": question,
+            "categories": categories,
+            "embedding": _normalize(embedding).tolist(),
+            "embedding_model": index.embedding_model,
+            "cluster_size": cluster_size,
+            "answer": result["answer"],
+            "sources": result["sources"],
+            "category": result["category"],
+            "document_ids": result["document_ids"],
+            "generated_at": time.time(),
+            "stale": False
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -1,11 +1,12 @@
 import os
-from typing import List, Dict, Any, Optional
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 import requests
 from dotenv import load_dotenv
 
-from app.services.vector_store import VectorStore
+from app.config import RETRIEVAL_MODE
+from app.services.vector_store import VectorStore, ActiveIndex
+from app.services.precomputed_answers import PrecomputedAnswerStore, QueryLog
 
 # Load environment variables
 load_dotenv()
@@ -15,10 +16,21 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class QueryEngine:
-    def __init__(self, vector_store: VectorStore):
-        """Initialize the query engine with a vector store"""
+    def __init__(self,
+                 vector_store: VectorStore,
+                 answer_store: Optional[PrecomputedAnswerStore] = None,
+                 query_log: Optional[QueryLog] = None):
+        """Initialize the query engine with a vector store
+        
+        Queries similar enough to a question in ``answer_store`` are answered from it
+        without retrieval or an LLM call; every query is recorded in ``query_log``.
+        """
         self.vector_store = vector_store
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+        self.answer_store = answer_store
+        self.query_log = query_log
+        
+        # Load the embedding model at startup rather than on the first query
+        self.vector_store.active_index.model
         
         # Get API keys from environment
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
@@ -27,45 +39,100 @@ class QueryEngine:
         # Default to OpenAI if available, otherwise use Groq
         self.llm_provider = "openai" if self.openai_api_key else "groq"
     
-    def generate_response(self, query: str, categories: Optional[List[str]] = None, k: int = 5):
-        """Generate a response for a user query"""
+    def lookup_precomputed(self,
+                           query: str,
+                           categories: Optional[List[str]] = None) -> Tuple[Optional[Dict[str, Any]], List[float], ActiveIndex]:
+        """Log a query and answer it from the precomputed answers if one matches
+        
+        Returns (response or None, query embedding, index the embedding belongs to); pass
+        the last two to ``generate_response`` so a miss is not embedded twice.
+        """
+        if self.query_log is not None:
+            self.query_log.append(query, categories)
+        
+        # Generate embedding for the query with the active index's model
+        index = self.vector_store.active_index
+        query_embedding = index.model.encode(query).tolist()
+        
+        if self.answer_store is not None:
+            entry = self.answer_store.lookup(query_embedding, categories, index.embedding_model)
+            if entry is not None:
+                return {
+                    "answer": entry["answer"],
+                    "sources": entry["sources"],
+                    "category": entry["category"],
+                    "document_ids": entry["document_ids"],
+                    "precomputed": True
+                }, query_embedding, index
+        return None, query_embedding, index
+    
+    def generate_response(self,
+                          query: str,
+                          categories: Optional[List[str]] = None,
+                          k: int = 5,
+                          mode: str = RETRIEVAL_MODE,
+                          use_precomputed: bool = True,
+                          timeout: Optional[float] = None,
+                          query_embedding: Optional[List[float]] = None,
+                          index: Optional[ActiveIndex] = None):
+        """Generate a response for a user query
+        
+        ``timeout`` bounds the LLM request in seconds (None waits indefinitely).
+        ``query_embedding`` and ``index`` come from ``lookup_precomputed`` when the
+        caller has already checked the precomputed answers.
+        """
         try:
-            # Generate embedding for the query
-            query_embedding = self.model.encode(query).tolist()
+            # Serve a frequent question from the precomputed answers
+            if use_precomputed:
+                response, query_embedding, index = self.lookup_precomputed(query, categories)
+                if response is not None:
+                    return response
+            elif query_embedding is None or index is None:
+                # Generate embedding for the query with the active index's model
+                index = self.vector_store.active_index
+                query_embedding = index.model.encode(query).tolist()
             
             # Retrieve relevant chunks
             results = self.vector_store.query(
                 query_embedding=query_embedding,
                 k=k,
-                categories=categories
+                categories=categories,
+                query_text=query,
+                mode=mode,
+                index=index
             )
             
             # Extract chunks and their sources
             chunks = results["documents"][0]
             sources = [metadata["source"] for metadata in results["metadatas"][0]]
+            document_ids = list(dict.fromkeys(
+                metadata["document_id"] for metadata in results["metadatas"][0] if "document_id" in metadata
+            ))
             
             # Determine query category
             query_category = self._categorize_query(query)
             
             # Generate response using LLM
             if self.llm_provider == "openai" and self.openai_api_key:
-                answer = self._generate_with_openai(query, chunks)
+                answer = self._generate_with_openai(query, chunks, timeout=timeout)
             elif self.llm_provider == "groq" and self.groq_api_key:
-                answer = self._generate_with_groq(query, chunks)
+                answer = self._generate_with_groq(query, chunks, timeout=timeout)
             else:
                 raise ValueError("No valid LLM provider configured")
             
             return {
                 "answer": answer,
                 "sources": sources,
-                "category": query_category
+                "category": query_category,
+                "document_ids": document_ids,
+                "precomputed": False
             }
             
         except Exception as e:
             logger.error(f"Error generating response: {e}")
             raise e
     
-    def _generate_with_openai(self, query: str, context_chunks: List[str]) -> str:
+    def _generate_with_openai(self, query: str, context_chunks: List[str], timeout: Optional[float] = None) -> str:
         """Generate a response using OpenAI API"""
         try:
             import openai
@@ -86,7 +153,8 @@ class QueryEngine:
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {query}"}
                 ],
-                temperature=0.3
+                temperature=0.3,
+                request_timeout=timeout
             )
             
             return response.choices[0].message.content
@@ -95,7 +163,7 @@ class QueryEngine:
             logger.error(f"Error with OpenAI: {e}")
             raise e
     
-    def _generate_with_groq(self, query: str, context_chunks: List[str]) -> str:
+    def _generate_with_groq(self, query: str, context_chunks: List[str], timeout: Optional[float] = None) -> str:
         """Generate a response using Groq API"""
         try:
             # Combine chunks into context
@@ -121,7 +189,8 @@ class QueryEngine:
                     "Authorization": f"Bearer {self.groq_api_key}",
                     "Content-Type": "application/json"
                 },
-                json=payload
+                json=payload,
+                timeout=timeout
             )
             
             return response.json()['choices'][0]['message']['content']
@@ -0,0 +1,223 @@
+import time
+import uuid
+import threading
+import logging
+from typing import List, Dict, Any, Optional, Callable
+
+from app.services.embedding_backend import get_embedding_backend, release_embedding_backend
+from app.services.vector_store import VectorStore, ActiveIndex
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Re-index phases
+PENDING = "pending"
+COPYING = "copying"
+CATCHING_UP = "catching_up"
+SWITCHING = "switching"
+DRAINING = "draining"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class ReindexInProgressError(Exception):
+    """Raised when a re-index is requested while another one is running"""
+
+
+class ReindexJob:
+    def __init__(self, embedding_backend: str, embedding_model: str):
+        """Progress of one online re-embedding of the chunk collection"""
+        self.id = f"reindex_{uuid.uuid4()}"
+        self.embedding_backend = embedding_backend
+        self.embedding_model = embedding_model
+        self.status = PENDING
+        self.source_collection = None
+        self.target_collection = None
+        self.total_chunks = 0
+        self.processed_chunks = 0
+        self.caught_up_chunks = 0
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the job for the status API"""
+        elapsed = None
+        throughput = None
+        eta = None
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+            if elapsed > 0 and self.processed_chunks:
+                throughput = self.processed_chunks / elapsed
+                if self.status == COPYING:
+                    eta = (self.total_chunks - self.processed_chunks) / throughput
+
+        return {
+            "id": self.id,
+            "status": self.status,
+            "embedding_backend": self.embedding_backend,
+            "embedding_model": self.embedding_model,
+            "source_collection": self.source_collection,
+            "target_collection": self.target_collection,
+            "progress": {
+                "processed": self.processed_chunks,
+                "total": self.total_chunks,
+                "caught_up": self.caught_up_chunks
+            },
+            "chunks_per_second": throughput,
+            "elapsed_seconds": elapsed,
+            "eta_seconds": eta,
+            "error": self.error
+        }
+
+
+class Reindexer:
+    def __init__(self,
+                 vector_store: VectorStore,
+                 batch_size: int = 256,
+                 batch_pause: float = 0.0,
+                 drain_seconds: float = 5.0,
+                 throttle: Optional[Callable[[], None]] = None):
+        """
+        Re-embed every stored chunk into a new versioned collection while queries keep
+        being served from the current one.
+
+        Chunks are copied in batches of ``batch_size``; ``throttle`` is called and
+        ``batch_pause`` seconds are slept between batches to protect query latency.
+        Chunk writes made during the copy are replayed under the vector store's write
+        lock, after which the new collection becomes active and the old one is dropped
+        once in-flight queries have had ``drain_seconds`` to finish.
+        """
+        self.vector_store = vector_store
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.drain_seconds = drain_seconds
+        self.throttle = throttle
+
+        self._lock = threading.Lock()
+        self._current_job = None
+        self._jobs = {}
+
+    def start(self, embedding_backend: str, embedding_model: str) -> ReindexJob:
+        """Start a re-index in a background thread"""
+        with self._lock:
+            if self._current_job is not None and not self._current_job.is_finished:
+                raise ReindexInProgressError(f"Re-index {self._current_job.id} is already running")
+            job = ReindexJob(embedding_backend, embedding_model)
+            self._current_job = job
+            self._jobs[job.id] = job
+
+        thread = threading.Thread(target=self._run, args=(job,), name="reindex", daemon=True)
+        thread.start()
+        return job
+
+    def get_job(self, job_id: Optional[str] = None) -> Optional[ReindexJob]:
+        """Look up a job by ID, or the most recent job"""
+        with self._lock:
+            if job_id is None:
+                return self._current_job
+            return self._jobs.get(job_id)
+
+    def _run(self, job: ReindexJob):
+        """Copy, catch up, switch and drop, recording progress on ``job``"""
+        job.started_at = time.time()
+        source = self.vector_store.active_index
+        target_collection = None
+        switched = False
+
+        try:
+            model = get_embedding_backend(job.embedding_backend, job.embedding_model)
+            version = source.version + 1
+            target_collection = self.vector_store.create_index_collection(version)
+            job.source_collection = source.collection.name
+            job.target_collection = target_collection.name
+
+            # Track writes from here on; the ID snapshot below defines the bulk copy
+            self.vector_store.begin_reindex()
+            chunk_ids = source.collection.get(include=[])["ids"]
+            job.total_chunks = len(chunk_ids)
+            job.status = COPYING
+            logger.info(f"Re-indexing {job.total_chunks} chunks into {target_collection.name} with {job.embedding_model}")
+
+            for start in range(0, len(chunk_ids), self.batch_size):
+                if self.throttle is not None:
+                    self.throttle()
+                self._copy_chunks(source.collection, target_collection, model, chunk_ids[start:start + self.batch_size])
+                job.processed_chunks = min(len(chunk_ids), start + self.batch_size)
+                if self.batch_pause:
+                    time.sleep(self.batch_pause)
+
+            # Replay writes made during the copy without blocking writers, then once
+            # more under the write lock so nothing slips in before the switch
+            job.status = CATCHING_UP
+            # Centroids of all documents are rebuilt below; only later changes need replaying
+            self.vector_store.take_dirty_document_ids()
+            dirty = self.vector_store.take_dirty_chunk_ids()
+            job.caught_up_chunks += self._sync_chunks(source.collection, target_collection, model, dirty)
+            self.vector_store.build_document_centroids(target_collection)
+
+            job.status = SWITCHING
+            new_index = ActiveIndex(target_collection, version, job.embedding_backend, job.embedding_model)
+            with self.vector_store.write_lock:
+                dirty = self.vector_store.take_dirty_chunk_ids()
+                job.caught_up_chunks += self._sync_chunks(source.collection, target_collection, model, dirty)
+                self.vector_store.build_document_centroids(target_collection, self.vector_store.take_dirty_document_ids())
+                self.vector_store.switch_index(new_index)
+                self.vector_store.end_reindex()
+            switched = True
+            logger.info(f"Switched to {target_collection.name}")
+
+            # Give queries that already hold the old index time to finish
+            job.status = DRAINING
+            time.sleep(self.drain_seconds)
+            self.vector_store.drop_collection(source.collection.name)
+            if (source.embedding_backend, source.embedding_model) != (job.embedding_backend, job.embedding_model):
+                release_embedding_backend(source.embedding_backend, source.embedding_model)
+
+            job.status = COMPLETED
+        except Exception as e:
+            logger.error(f"Re-index {job.id} failed: {e}")
+            job.status = FAILED
+            job.error = str(e)
+            if not switched:
+                self.vector_store.end_reindex()
+                if target_collection is not None:
+                    try:
+                        self.vector_store.drop_collection(target_collection.name)
+                    except Exception as drop_error:
+                        logger.error(f"Error dropping {target_collection.name}: {drop_error}")
+        finally:
+            job.finished_at = time.time()
+
+    def _copy_chunks(self, source, target, model, chunk_ids: List[str]):
+        """Re-embed a batch of stored chunks into the target collection"""
+        if not chunk_ids:
+            return
+        records = source.get(ids=chunk_ids, include=["documents", "metadatas"])
+        if not records["ids"]:
+            return
+        embeddings = model.encode(records["documents"], batch_size=64).tolist()
+        target.upsert(
+            ids=records["ids"],
+            documents=records["documents"],
+            metadatas=records["metadatas"],
+            embeddings=embeddings
+        )
+
+    def _sync_chunks(self, source, target, model, chunk_ids: List[str]) -> int:
+        """Bring changed chunks in the target in line with the source"""
+        if not chunk_ids:
+            return 0
+        for start in range(0, len(chunk_ids), self.batch_size):
+            batch = chunk_ids[start:start + self.batch_size]
+            present = set(source.get(ids=batch, include=[])["ids"])
+            self._copy_chunks(source, target, model, [chunk_id for chunk_id in batch if chunk_id in present])
+            deleted = [chunk_id for chunk_id in batch if chunk_id not in present]
+            if deleted:
+                target.delete(ids=deleted)
+        return len(chunk_ids)
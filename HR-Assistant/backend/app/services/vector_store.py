@@ -1,56 +1,438 @@
 import os
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 import json
 import uuid
+import logging
+import threading
+
+import numpy as np
+
+from app.config import (
+    HYBRID_CANDIDATE_MULTIPLIER,
+    HYBRID_RRF_K,
+    HIERARCHICAL_TOP_DOCUMENTS,
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL
+)
+from app.services.bm25_index import BM25Index
+from app.services.embedding_backend import get_embedding_backend, set_active_embedding
+
+logger = logging.getLogger(__name__)
+
+class StoreInUseError(Exception):
+    """Raised when another process already has the vector store open"""
+    pass
+
+def _lock_store_directory(persist_directory: str):
+    """Take an exclusive, non-blocking lock on the store directory, held until the file is closed"""
+    lock_file = open(os.path.join(persist_directory, "store.lock"), "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        raise StoreInUseError(
+            f"The vector store in {persist_directory} is open in another process "
+            f"(stop the API server before running command-line tools against it)"
+        )
+    return lock_file
+
+class ActiveIndex:
+    def __init__(self, collection, version: int, embedding_backend: str, embedding_model: str):
+        """A chunk collection together with the embedding model its vectors come from"""
+        self.collection = collection
+        self.version = version
+        self.embedding_backend = embedding_backend
+        self.embedding_model = embedding_model
+    
+    @property
+    def model(self):
+        return get_embedding_backend(self.embedding_backend, self.embedding_model)
 
 class VectorStore:
     def __init__(self, persist_directory: str = "chroma_db"):
         """Initialize the vector store with ChromaDB"""
         os.makedirs(persist_directory, exist_ok=True)
+        self.persist_directory = persist_directory
         
-        self.client = chromadb.Client(Settings(
-            persist_directory=persist_directory,
-            anonymized_telemetry=False
-        ))
+        # One process owns the store: Chroma's vector index and the BM25 index are
+        # cached in memory, so writes from a second process would be missed or clobbered
+        self._lock_file = _lock_store_directory(persist_directory)
+        
+        # PersistentClient writes to disk; chromadb.Client(Settings(persist_directory=...))
+        # is in-memory on chromadb 1.x, so nothing written would survive the process
+        self.client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(anonymized_telemetry=False)
+        )
         
-        # Create collections if they don't exist
-        self.collection = self.client.get_or_create_collection("hr_documents")
+        # Chunks live in a versioned collection; the active version and the embedding
+        # model that produced its vectors are recorded in index_state.json
+        self._state_path = os.path.join(persist_directory, "index_state.json")
+        state = self._load_state()
+        set_active_embedding(state["embedding_backend"], state["embedding_model"])
+        self.active_index = ActiveIndex(
+            self.client.get_or_create_collection(state["collection"]),
+            state["version"],
+            state["embedding_backend"],
+            state["embedding_model"]
+        )
         self.metadata_collection = self.client.get_or_create_collection("document_metadata")
+        
+        # Chunk writes are serialized so a re-index can switch collections between them
+        self._write_lock = threading.RLock()
+        # Chunk and document IDs written while a re-index is copying the collection
+        self._dirty_chunk_ids = None
+        self._dirty_document_ids = None
+        
+        # Each chunk collection has a companion collection with one centroid
+        # embedding per document, used by hierarchical retrieval
+        self._centroid_collections = {}
+        self._sync_document_centroids()
+        
+        # Sparse keyword index kept in step with the chunk collection
+        self.bm25_index = BM25Index(os.path.join(persist_directory, "bm25_index"))
+        self._sync_bm25_index()
+        
+        # Called with the IDs of updated or deleted documents (None after an index switch)
+        self._change_listeners = []
+    
+    @property
+    def collection(self):
+        return self.active_index.collection
+    
+    def close(self):
+        """Release the store so another process can open it"""
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+    
+    def _load_state(self) -> Dict[str, Any]:
+        """Read the active index description, defaulting to the configured model"""
+        if os.path.exists(self._state_path):
+            with open(self._state_path, "r") as f:
+                state = json.load(f)
+            # The stored vectors pin the embedding; the settings only pick it for a new store
+            if (state["embedding_backend"], state["embedding_model"]) != (EMBEDDING_BACKEND, EMBEDDING_MODEL):
+                logger.warning(
+                    f"Ignoring EMBEDDING_BACKEND={EMBEDDING_BACKEND} EMBEDDING_MODEL={EMBEDDING_MODEL}: "
+                    f"the store is indexed with {state['embedding_backend']}/{state['embedding_model']}. "
+                    f"Use POST /admin/reindex to switch."
+                )
+            return state
+        
+        state = {
+            "collection": "hr_documents",
+            "version": 1,
+            "embedding_backend": EMBEDDING_BACKEND,
+            "embedding_model": EMBEDDING_MODEL
+        }
+        self._save_state(state)
+        return state
     
-    def add_document_chunks(self, chunks: List[str], embeddings: List[List[float]], metadata_list: List[Dict[str, Any]]):
-        """Add document chunks with their embeddings and metadata to the vector store"""
+    def _save_state(self, state: Dict[str, Any]):
+        """Atomically write the active index description"""
+        tmp_path = f"{self._state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._state_path)
+    
+    def add_change_listener(self, listener: Callable[[Optional[List[str]]], None]):
+        """Register a callback for document updates, deletions and index switches"""
+        self._change_listeners.append(listener)
+    
+    def _notify_change(self, document_ids: Optional[List[str]]):
+        for listener in self._change_listeners:
+            try:
+                listener(document_ids)
+            except Exception as e:
+                print(f"Error in change listener: {e}")
+    
+    def _mark_dirty(self, chunk_ids: List[str]):
+        """Remember chunks changed during a re-index so they are re-synced before the switch"""
+        if self._dirty_chunk_ids is not None:
+            self._dirty_chunk_ids.update(chunk_ids)
+    
+    def begin_reindex(self):
+        """Start tracking chunk writes for an online re-index"""
+        with self._write_lock:
+            self._dirty_chunk_ids = set()
+            self._dirty_document_ids = set()
+    
+    def end_reindex(self):
+        """Stop tracking chunk writes"""
+        with self._write_lock:
+            self._dirty_chunk_ids = None
+            self._dirty_document_ids = None
+    
+    def take_dirty_chunk_ids(self) -> List[str]:
+        """Return and reset the chunks written since the last call"""
+        with self._write_lock:
+            dirty = list(self._dirty_chunk_ids or [])
+            if self._dirty_chunk_ids is not None:
+                self._dirty_chunk_ids.clear()
+            return dirty
+    
+    def take_dirty_document_ids(self) -> List[str]:
+        """Return and reset the documents whose centroids changed since the last call"""
+        with self._write_lock:
+            dirty = list(self._dirty_document_ids or [])
+            if self._dirty_document_ids is not None:
+                self._dirty_document_ids.clear()
+            return dirty
+    
+    def create_index_collection(self, version: int):
+        """Create an empty chunk collection for a new index version"""
+        name = f"hr_documents_v{version}"
+        for stale_name in (name, f"{name}_centroids"):
+            try:
+                self.client.delete_collection(stale_name)
+            except Exception:
+                pass
+        self._centroid_collections.pop(f"{name}_centroids", None)
+        return self.client.create_collection(name)
+    
+    def switch_index(self, new_index: ActiveIndex):
+        """Make ``new_index`` the active index and persist the switch
+        
+        Must be called with the write lock held (see ``write_lock``).
+        """
+        self._save_state({
+            "collection": new_index.collection.name,
+            "version": new_index.version,
+            "embedding_backend": new_index.embedding_backend,
+            "embedding_model": new_index.embedding_model
+        })
+        set_active_embedding(new_index.embedding_backend, new_index.embedding_model)
+        self.active_index = new_index
+        self._notify_change(None)
+    
+    def drop_collection(self, name: str):
+        """Delete a collection that is no longer active"""
+        if name != self.collection.name:
+            self.client.delete_collection(name)
+            self._centroid_collections.pop(f"{name}_centroids", None)
+            try:
+                self.client.delete_collection(f"{name}_centroids")
+            except Exception:
+                pass
+    
+    @property
+    def write_lock(self):
+        return self._write_lock
+    
+    def _sync_bm25_index(self):
+        """Rebuild the BM25 index from the stored chunks if it has drifted from the collection"""
+        if len(self.bm25_index) == self.collection.count():
+            return
+        
+        results = self.collection.get(include=["documents", "metadatas"])
+        self.bm25_index.rebuild(results["ids"], results["documents"], results["metadatas"])
+    
+    def centroid_collection(self, chunk_collection=None):
+        """Get the document centroid collection that belongs to a chunk collection"""
+        name = f"{(chunk_collection or self.collection).name}_centroids"
+        collection = self._centroid_collections.get(name)
+        if collection is None:
+            collection = self.client.get_or_create_collection(name)
+            self._centroid_collections[name] = collection
+        return collection
+    
+    def _sync_document_centroids(self):
+        """Build the document centroids if they are missing, e.g. for stores created before them"""
+        if self.centroid_collection().count() > 0 or self.collection.count() == 0:
+            return
+        self.build_document_centroids(self.collection)
+    
+    def build_document_centroids(self, chunk_collection, document_ids: Optional[List[str]] = None, batch_size: int = 1000) -> int:
+        """(Re)compute document centroids from the chunk vectors of a collection
+        
+        With ``document_ids`` only those documents are recomputed (and removed if they
+        no longer have chunks); otherwise every document in the collection is.
+        """
+        centroids = self.centroid_collection(chunk_collection)
+        sums = {}
+        categories = {}
+        
+        def accumulate(records):
+            if records["embeddings"] is None:
+                return
+            for chunk_embedding, metadata in zip(records["embeddings"], records["metadatas"]):
+                document_id = metadata.get("document_id")
+                if document_id is None:
+                    continue
+                if document_id in sums:
+                    sums[document_id] += np.asarray(chunk_embedding, dtype=np.float32)
+                else:
+                    sums[document_id] = np.array(chunk_embedding, dtype=np.float32)
+                    categories[document_id] = metadata.get("category", "")
+        
+        if document_ids is None:
+            total = chunk_collection.count()
+            for offset in range(0, total, batch_size):
+                accumulate(chunk_collection.get(limit=batch_size, offset=offset, include=["embeddings", "metadatas"]))
+            stale = set(centroids.get(include=[])["ids"]) - set(sums)
+        else:
+            for document_id in document_ids:
+                accumulate(chunk_collection.get(where={"document_id": document_id}, include=["embeddings", "metadatas"]))
+            stale = set(document_ids) - set(sums)
+        
+        if stale:
+            centroids.delete(ids=list(stale))
+        
+        ids = list(sums)
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            vectors = np.vstack([sums[document_id] for document_id in batch])
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+            centroids.upsert(
+                ids=batch,
+                embeddings=vectors.tolist(),
+                metadatas=[{"document_id": document_id, "category": categories[document_id]} for document_id in batch]
+            )
+        return len(ids)
+    
+    def _update_document_centroid(self, document_id: str):
+        """Recompute one document's centroid in the active index after its chunks changed"""
+        with self._write_lock:
+            self.build_document_centroids(self.collection, [document_id])
+            if self._dirty_document_ids is not None:
+                self._dirty_document_ids.add(document_id)
+    
+    def add_document_chunks(self,
+                            chunks: List[str],
+                            embeddings: List[List[float]],
+                            metadata_list: List[Dict[str, Any]],
+                            index_version: Optional[int] = None):
+        """Add document chunks with their embeddings and metadata to the vector store
+        
+        ``index_version`` is the version of the index whose model produced the embeddings;
+        if the active index has been switched since, the chunks are re-embedded.
+        """
         # Generate IDs for each chunk
         ids = [f"chunk_{uuid.uuid4()}" for _ in range(len(chunks))]
         
-        # Add chunks to the collection
-        self.collection.add(
-            documents=chunks,
-            embeddings=embeddings,
-            metadatas=metadata_list,
-            ids=ids
-        )
+        with self._write_lock:
+            if index_version is not None and index_version != self.active_index.version:
+                embeddings = self.active_index.model.encode(chunks).tolist()
+            
+            # Add chunks to the collection
+            self.collection.add(
+                documents=chunks,
+                embeddings=embeddings,
+                metadatas=metadata_list,
+                ids=ids
+            )
+            self.bm25_index.add(ids, chunks, metadata_list)
+            self._mark_dirty(ids)
         
         return ids
     
+    def update_chunk_metadata(self, chunk_ids: List[str], metadata_list: List[Dict[str, Any]], chunks: Optional[List[str]] = None):
+        """Update the metadata of existing chunks without re-embedding them
+        
+        Pass ``chunks`` when the category changes so the keyword index is updated as well.
+        """
+        if not chunk_ids:
+            return
+        with self._write_lock:
+            self.collection.update(ids=chunk_ids, metadatas=metadata_list)
+            if chunks is not None:
+                self.bm25_index.add(chunk_ids, chunks, metadata_list)
+            self._mark_dirty(chunk_ids)
+    
+    def get_chunk_texts(self, chunk_ids: List[str]) -> Dict[str, str]:
+        """Get the stored text of chunks by ID"""
+        if not chunk_ids:
+            return {}
+        results = self.collection.get(ids=chunk_ids, include=["documents"])
+        return dict(zip(results["ids"], results["documents"]))
+    
+    def delete_chunks(self, chunk_ids: List[str]):
+        """Delete chunks from the collection and the keyword index"""
+        if not chunk_ids:
+            return
+        with self._write_lock:
+            self.collection.delete(ids=chunk_ids)
+            self.bm25_index.remove(chunk_ids)
+            self._mark_dirty(chunk_ids)
+    
+    def _document_record_metadata(self, document_id: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the filterable Chroma metadata stored with a document record"""
+        record_metadata = {"document_id": document_id}
+        if metadata.get("content_hash"):
+            record_metadata["content_hash"] = metadata["content_hash"]
+        return record_metadata
+    
     def add_document_metadata(self, document_id: str, metadata: Dict[str, Any]):
         """Store document metadata separately"""
         self.metadata_collection.add(
             documents=[json.dumps(metadata)],
-            metadatas=[{"document_id": document_id}],
+            metadatas=[self._document_record_metadata(document_id, metadata)],
             ids=[document_id]
         )
+        self._update_document_centroid(document_id)
+    
+    def get_document_metadata(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Get the stored metadata of one document"""
+        result = self.metadata_collection.get(ids=[document_id])
+        if not result["documents"]:
+            return None
+        return json.loads(result["documents"][0])
+    
+    def update_document_metadata(self, document_id: str, metadata: Dict[str, Any]):
+        """Replace the stored metadata of an existing document in place"""
+        self.metadata_collection.update(
+            documents=[json.dumps(metadata)],
+            metadatas=[self._document_record_metadata(document_id, metadata)],
+            ids=[document_id]
+        )
+        self._update_document_centroid(document_id)
+        self._notify_change([document_id])
+    
+    def find_document_by_hash(self, content_hash: str) -> Optional[str]:
+        """Return the ID of an already processed document with the given content hash"""
+        results = self.metadata_collection.get(where={"content_hash": content_hash}, limit=1)
+        if results["ids"]:
+            return results["ids"][0]
+        return None
     
-    def query(self, query_embedding: List[float], k: int = 5, categories: Optional[List[str]] = None) -> Dict[str, Any]:
-        """Query the vector store for similar chunks"""
+    def query(self,
+              query_embedding: List[float],
+              k: int = 5,
+              categories: Optional[List[str]] = None,
+              query_text: Optional[str] = None,
+              mode: str = "dense",
+              index: Optional[ActiveIndex] = None) -> Dict[str, Any]:
+        """Query the vector store for similar chunks.
+        
+        ``mode="hybrid"`` fuses the dense ranking with a BM25 ranking of ``query_text``
+        using reciprocal rank fusion; ``mode="hierarchical"`` first selects the documents
+        whose centroids are closest to the query and then searches only their chunks.
+        The result has the same shape as a Chroma query.
+        Pass the ``index`` whose model embedded the query so a concurrent re-index
+        switch cannot pair it with another model's collection.
+        """
+        collection = (index or self.active_index).collection
+        
         # Prepare filter if categories are provided
         where_filter = None
         if categories and len(categories) > 0:
             where_filter = {"category": {"$in": categories}}
         
+        if mode == "hybrid" and query_text:
+            return self._hybrid_query(collection, query_embedding, query_text, k, categories, where_filter)
+        if mode == "hierarchical":
+            return self._hierarchical_query(collection, query_embedding, k, where_filter)
+        
         # Query the collection
-        results = self.collection.query(
+        results = collection.query(
             query_embeddings=[query_embedding],
             n_results=k,
             where=where_filter
@@ -58,6 +440,78 @@ class VectorStore:
         
         return results
     
+    def _hierarchical_query(self,
+                            collection,
+                            query_embedding: List[float],
+                            k: int,
+                            where_filter: Optional[Dict[str, Any]],
+                            top_documents: int = HIERARCHICAL_TOP_DOCUMENTS) -> Dict[str, Any]:
+        """Search the chunks of the ``top_documents`` documents nearest to the query"""
+        centroids = self.centroid_collection(collection)
+        document_count = centroids.count()
+        if document_count == 0:
+            return collection.query(query_embeddings=[query_embedding], n_results=k, where=where_filter)
+        
+        documents = centroids.query(
+            query_embeddings=[query_embedding],
+            n_results=min(top_documents, document_count),
+            where=where_filter,
+            include=["distances"]
+        )
+        document_ids = documents["ids"][0]
+        if not document_ids:
+            return collection.query(query_embeddings=[query_embedding], n_results=k, where=where_filter)
+        
+        chunk_filter = {"document_id": {"$in": document_ids}}
+        if where_filter:
+            chunk_filter = {"$and": [where_filter, chunk_filter]}
+        return collection.query(query_embeddings=[query_embedding], n_results=k, where=chunk_filter)
+    
+    def _hybrid_query(self,
+                      collection,
+                      query_embedding: List[float],
+                      query_text: str,
+                      k: int,
+                      categories: Optional[List[str]],
+                      where_filter: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Fuse dense and BM25 rankings with reciprocal rank fusion"""
+        candidates = k * HYBRID_CANDIDATE_MULTIPLIER
+        
+        dense = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=candidates,
+            where=where_filter
+        )
+        sparse = self.bm25_index.search(query_text, k=candidates, categories=categories)
+        
+        # Reciprocal rank fusion: score = sum over rankings of 1 / (rrf_k + rank)
+        fused = {}
+        for rank, chunk_id in enumerate(dense["ids"][0]):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (HYBRID_RRF_K + rank + 1)
+        for rank, (chunk_id, _) in enumerate(sparse):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (HYBRID_RRF_K + rank + 1)
+        
+        top_ids = sorted(fused, key=fused.get, reverse=True)[:k]
+        
+        # Reuse documents returned by the dense query; fetch sparse-only hits
+        records = {}
+        for i, chunk_id in enumerate(dense["ids"][0]):
+            records[chunk_id] = (dense["documents"][0][i], dense["metadatas"][0][i], dense["distances"][0][i])
+        missing = [chunk_id for chunk_id in top_ids if chunk_id not in records]
+        if missing:
+            fetched = collection.get(ids=missing, include=["documents", "metadatas"])
+            for i, chunk_id in enumerate(fetched["ids"]):
+                records[chunk_id] = (fetched["documents"][i], fetched["metadatas"][i], None)
+        
+        top_ids = [chunk_id for chunk_id in top_ids if chunk_id in records]
+        return {
+            "ids": [top_ids],
+            "documents": [[records[chunk_id][0] for chunk_id in top_ids]],
+            "metadatas": [[records[chunk_id][1] for chunk_id in top_ids]],
+            "distances": [[records[chunk_id][2] for chunk_id in top_ids]],
+            "scores": [[fused[chunk_id] for chunk_id in top_ids]]
+        }
+    
     def get_categories(self) -> List[str]:
         """Get all unique categories from the documents"""
         try:
@@ -103,20 +557,22 @@ class VectorStore:
                 
                 # Delete all chunks associated with this document
                 if "chunk_ids" in metadata:
-                    for chunk_id in metadata["chunk_ids"]:
-                        try:
-                            self.collection.delete(ids=[chunk_id])
-                        except Exception as e:
-                            print(f"Error deleting chunk {chunk_id}: {e}")
+                    try:
+                        self.delete_chunks(metadata["chunk_ids"])
+                    except Exception as e:
+                        print(f"Error deleting chunks of {document_id}: {e}")
             
-            # Delete the document metadata
+            # Delete the document metadata and centroid
             self.metadata_collection.delete(ids=[document_id])
+            self._update_document_centroid(document_id)
             
             # Delete the actual file if path exists in metadata
             if metadata_result["documents"]:
                 metadata = json.loads(metadata_result["documents"][0])
                 if "file_path" in metadata and os.path.exists(metadata["file_path"]):
                     os.remove(metadata["file_path"])
+            
+            self._notify_change([document_id])
                     
         except Exception as e:
             raise Exception(f"Error deleting document: {e}") 
\ No newline at end of file
@@ -0,0 +1,2 @@
+# HR Onboarding Knowledge Assistant
+# Benchmarks package
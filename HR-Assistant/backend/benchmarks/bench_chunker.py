@@ -0,0 +1,80 @@
+"""
+Compare the token-aware chunker with langchain's RecursiveCharacterTextSplitter.
+
+Reports throughput, chunk count and the share of tokens that fall outside the
+embedding model's window (and are therefore silently truncated at encode time).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_chunker [--pages 200] [--file handbook.pdf]
+"""
+import argparse
+import time
+from typing import List
+
+from sentence_transformers import SentenceTransformer
+
+from app.services.chunker import TokenChunker, get_model_token_budget
+from benchmarks.corpus import generate_handbook
+
+
+def truncation_stats(chunker: TokenChunker, chunks: List[str], window: int):
+    """Return (fraction of chunks truncated, fraction of tokens truncated)"""
+    counts = [count + 2 for count in chunker.count_tokens(chunks)]
+    truncated_chunks = sum(1 for count in counts if count > window)
+    truncated_tokens = sum(max(0, count - window) for count in counts)
+    total_tokens = sum(counts) or 1
+    return truncated_chunks / max(1, len(chunks)), truncated_tokens / total_tokens
+
+
+def run(splitter, text: str, repeats: int):
+    """Time ``splitter.split_text`` and return (best seconds, chunks)"""
+    best = float("inf")
+    chunks = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        chunks = splitter.split_text(text)
+        best = min(best, time.perf_counter() - start)
+    return best, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200, help="Pages of synthetic handbook text")
+    parser.add_argument("--file", help="Benchmark a real PDF, DOCX or TXT file instead")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    window = model.max_seq_length
+
+    if args.file:
+        from app.services.document_processor import DocumentProcessor
+        text = DocumentProcessor._extract_text(args.file)
+    else:
+        text = generate_handbook(args.pages)
+
+    token_chunker = TokenChunker(model.tokenizer, max_tokens=get_model_token_budget(model), overlap_tokens=32)
+    splitters = {"token_chunker": token_chunker}
+
+    try:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        splitters["recursive_character"] = RecursiveCharacterTextSplitter(
+            chunk_size=500,
+            chunk_overlap=50,
+            separators=["\n\n", "\n", ".", " "]
+        )
+    except ImportError:
+        print("langchain is not installed; only the token chunker is measured")
+
+    megabytes = len(text.encode("utf-8")) / 1e6
+    print(f"Input: {megabytes:.2f} MB, model window {window} tokens")
+    print(f"{'splitter':<22}{'seconds':>10}{'MB/s':>10}{'chunks':>10}{'trunc chunks':>15}{'trunc tokens':>15}")
+    for name, splitter in splitters.items():
+        seconds, chunks = run(splitter, text, args.repeats)
+        chunk_rate, token_rate = truncation_stats(token_chunker, chunks, window)
+        print(f"{name:<22}{seconds:>10.3f}{megabytes / seconds:>10.2f}{len(chunks):>10}"
+              f"{chunk_rate:>15.2%}{token_rate:>15.2%}")
+
+
+if __name__ == "__main__":
+    main()
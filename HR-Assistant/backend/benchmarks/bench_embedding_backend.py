@@ -0,0 +1,70 @@
+"""
+Compare the PyTorch, ONNX and int8-quantized ONNX embedding backends.
+
+Reports accuracy drift against the PyTorch vectors (min/mean cosine and top-5
+neighbour agreement), batch ingestion throughput and single-query latency.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_embedding_backend [--chunks 2000] [--queries 200] [--threads 4]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.embedding_backend import TorchEmbeddingBackend, OnnxEmbeddingBackend, check_drift
+from benchmarks.corpus import generate_chunks
+
+
+def neighbour_agreement(reference: np.ndarray, candidate: np.ndarray, queries_ref: np.ndarray, queries_cand: np.ndarray, k: int = 5) -> float:
+    """Average overlap of the top-k neighbours found with each backend's vectors"""
+    top_ref = np.argsort(-queries_ref @ reference.T, axis=1)[:, :k]
+    top_cand = np.argsort(-queries_cand @ candidate.T, axis=1)[:, :k]
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(top_ref, top_cand)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=None, help="onnxruntime intra-op threads")
+    parser.add_argument("--cache-dir", default="onnx_models")
+    args = parser.parse_args()
+
+    chunks = [chunk["text"] for chunk in generate_chunks(args.chunks)]
+    queries = [f"What is the policy on {chunk['term']}?" for chunk in generate_chunks(args.queries, seed=7)]
+
+    reference = TorchEmbeddingBackend()
+    backends = [
+        reference,
+        OnnxEmbeddingBackend(cache_dir=args.cache_dir, quantize=False, num_threads=args.threads),
+        OnnxEmbeddingBackend(cache_dir=args.cache_dir, quantize=True, num_threads=args.threads)
+    ]
+
+    reference_chunks = reference.encode(chunks, batch_size=args.batch_size)
+    reference_queries = reference.encode(queries, batch_size=args.batch_size)
+
+    print(f"{'backend':<12}{'min cos':>10}{'mean cos':>10}{'top5 agree':>12}{'chunks/s':>12}{'p50 ms':>10}{'p95 ms':>10}")
+    for backend in backends:
+        # Warm up before timing
+        backend.encode(chunks[:args.batch_size], batch_size=args.batch_size)
+
+        start = time.perf_counter()
+        chunk_vectors = backend.encode(chunks, batch_size=args.batch_size)
+        throughput = len(chunks) / (time.perf_counter() - start)
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            backend.encode(query)
+            latencies.append(1000 * (time.perf_counter() - start))
+
+        drift = check_drift(reference, backend, queries[:50])
+        agreement = neighbour_agreement(reference_chunks, chunk_vectors, reference_queries, backend.encode(queries))
+        print(f"{backend.name:<12}{drift['min_cosine']:>10.4f}{drift['mean_cosine']:>10.4f}{agreement:>12.2%}"
+              f"{throughput:>12.1f}{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 95):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
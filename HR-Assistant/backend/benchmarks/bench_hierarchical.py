@@ -0,0 +1,117 @@
+"""
+Compare flat chunk search with hierarchical (document, then chunk) retrieval.
+
+Documents come in families of near-identical policy versions. For each corpus
+size, reports mean and p95 latency, recall@k against exact brute-force nearest
+neighbours, and the hit rate for the policy term the query asks about.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_hierarchical [--sizes 2000,10000,50000] [--top-documents 5,10,20]
+"""
+import argparse
+import random
+import tempfile
+import time
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from app.services.vector_store import VectorStore
+from benchmarks.corpus import TOPICS, generate_documents
+
+QUESTION_TEMPLATES = [
+    "What is the policy on {term}?",
+    "How do I request {term}?",
+    "Who approves {term}?",
+    "{term} eligibility"
+]
+
+
+def build_store(model: SentenceTransformer, documents, persist_directory: str):
+    """Index the documents and return the store with the chunk IDs and vectors in insertion order"""
+    store = VectorStore(persist_directory=persist_directory)
+
+    # Versions share most chunks, so embed each distinct text once
+    texts = sorted({chunk for document in documents for chunk in document["chunks"]})
+    vectors = model.encode(texts, batch_size=128, show_progress_bar=False, normalize_embeddings=True)
+    vector_of = dict(zip(texts, vectors))
+
+    all_ids, all_vectors = [], []
+    for document in documents:
+        chunk_vectors = [vector_of[chunk] for chunk in document["chunks"]]
+        chunk_ids = store.add_document_chunks(
+            chunks=document["chunks"],
+            embeddings=[vector.tolist() for vector in chunk_vectors],
+            metadata_list=[
+                {"document_id": document["document_id"], "category": document["category"], "term": document["term"], "source": "synthetic"}
+                for _ in document["chunks"]
+            ]
+        )
+        store.add_document_metadata(document["document_id"], {
+            "original_name": f"{document['document_id']}.txt",
+            "category": document["category"],
+            "chunk_ids": chunk_ids
+        })
+        all_ids.extend(chunk_ids)
+        all_vectors.extend(chunk_vectors)
+    return store, all_ids, np.vstack(all_vectors)
+
+
+def evaluate(search, queries, query_vectors, exact, k: int):
+    """Return (mean ms, p95 ms, recall@k, hit rate) for one search function"""
+    latencies, recall, hits = [], 0.0, 0
+    for (query, term), vector, expected in zip(queries, query_vectors, exact):
+        start = time.perf_counter()
+        results = search(vector.tolist())
+        latencies.append(1000 * (time.perf_counter() - start))
+
+        recall += len(set(results["ids"][0]) & expected) / k
+        hits += any(metadata["term"] == term for metadata in results["metadatas"][0])
+    return float(np.mean(latencies)), float(np.percentile(latencies, 95)), recall / len(queries), hits / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="2000,10000,50000", help="Corpus sizes in chunks")
+    parser.add_argument("--chunks-per-document", type=int, default=20)
+    parser.add_argument("--versions", type=int, default=3, help="Near-identical versions per policy")
+    parser.add_argument("--top-documents", default="5,10,20")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    terms = [term for category_terms in TOPICS.values() for term in category_terms]
+    queries = []
+    for _ in range(args.queries):
+        term = rng.choice(terms)
+        queries.append((rng.choice(QUESTION_TEMPLATES).format(term=term), term))
+    query_vectors = model.encode([query for query, _ in queries], normalize_embeddings=True)
+
+    print(f"{'chunks':>8}{'mode':>18}{'mean ms':>10}{'p95 ms':>10}{'recall@k':>10}{'hit@k':>8}")
+    for size in (int(size) for size in args.sizes.split(",")):
+        documents = generate_documents(size // args.chunks_per_document, args.chunks_per_document, args.versions)
+        with tempfile.TemporaryDirectory() as persist_directory:
+            store, chunk_ids, chunk_vectors = build_store(model, documents, persist_directory)
+
+            # Exact nearest neighbours as ground truth
+            top = np.argsort(-(query_vectors @ chunk_vectors.T), axis=1)[:, :args.k]
+            exact = [{chunk_ids[i] for i in row} for row in top]
+
+            runs = [("flat", lambda vector: store.query(vector, k=args.k, mode="dense"))]
+            for top_documents in (int(n) for n in args.top_documents.split(",")):
+                runs.append((
+                    f"hierarchical@{top_documents}",
+                    lambda vector, n=top_documents: store._hierarchical_query(store.collection, vector, args.k, None, top_documents=n)
+                ))
+
+            for name, search in runs:
+                # Warm up before timing
+                search(query_vectors[0].tolist())
+                mean_ms, p95_ms, recall, hit_rate = evaluate(search, queries, query_vectors, exact, args.k)
+                print(f"{len(chunk_ids):>8}{name:>18}{mean_ms:>10.2f}{p95_ms:>10.2f}{recall:>10.2%}{hit_rate:>8.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare dense and hybrid (dense + BM25) retrieval on a synthetic HR corpus.
+
+Each query asks about one exact policy term ("401k", "Form I-9", "PTO", ...); a
+retrieved chunk is relevant when it is about that term. Reports mean latency,
+hit rate and precision at small k.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_hybrid [--chunks 5000] [--queries 200]
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from sentence_transformers import SentenceTransformer
+
+from app.services.vector_store import VectorStore
+from benchmarks.corpus import TOPICS, generate_chunks
+
+QUESTION_TEMPLATES = [
+    "What is the policy on {term}?",
+    "How do I request {term}?",
+    "Who approves {term}?",
+    "{term} eligibility"
+]
+
+
+def build_store(model: SentenceTransformer, chunks, persist_directory: str) -> VectorStore:
+    """Index the synthetic chunks into a fresh vector store"""
+    store = VectorStore(persist_directory=persist_directory)
+    texts = [chunk["text"] for chunk in chunks]
+    embeddings = model.encode(texts, batch_size=128, show_progress_bar=False)
+    for i in range(0, len(chunks), 1000):
+        batch = chunks[i:i + 1000]
+        store.add_document_chunks(
+            chunks=[chunk["text"] for chunk in batch],
+            embeddings=[emb.tolist() for emb in embeddings[i:i + 1000]],
+            metadata_list=[{"category": chunk["category"], "term": chunk["term"], "source": "synthetic"} for chunk in batch]
+        )
+    return store
+
+
+def evaluate(store: VectorStore, model: SentenceTransformer, queries, k: int, mode: str):
+    """Return (mean latency ms, hit rate, precision) for one retrieval mode"""
+    latencies, hits, precision = [], 0, 0.0
+    for query, term in queries:
+        start = time.perf_counter()
+        embedding = model.encode(query).tolist()
+        results = store.query(embedding, k=k, query_text=query, mode=mode)
+        latencies.append(time.perf_counter() - start)
+
+        relevant = [metadata["term"] == term for metadata in results["metadatas"][0]]
+        hits += any(relevant)
+        precision += sum(relevant) / k
+    return 1000 * sum(latencies) / len(latencies), hits / len(queries), precision / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    chunks = generate_chunks(args.chunks)
+    terms = [term for category_terms in TOPICS.values() for term in category_terms]
+    queries = []
+    for _ in range(args.queries):
+        term = rng.choice(terms)
+        queries.append((rng.choice(QUESTION_TEMPLATES).format(term=term), term))
+
+    with tempfile.TemporaryDirectory() as persist_directory:
+        store = build_store(model, chunks, persist_directory)
+        print(f"{'mode':<8}{'k':>4}{'latency ms':>12}{'hit@k':>10}{'precision@k':>14}")
+        for k in (1, 3, 5):
+            for mode in ("dense", "hybrid"):
+                latency, hit_rate, precision = evaluate(store, model, queries, k, mode)
+                print(f"{mode:<8}{k:>4}{latency:>12.2f}{hit_rate:>10.2%}{precision:>14.2%}")
+
+
+if __name__ == "__main__":
+    main()
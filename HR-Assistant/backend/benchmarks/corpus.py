@@ -0,0 +1,97 @@
+import random
+from typing import List, Dict, Any
+
+TOPICS = {
+    "leave": ["PTO", "vacation", "sick leave", "parental leave", "bereavement leave", "holiday"],
+    "benefits": ["401k", "health insurance", "dental plan", "vision plan", "HSA", "life insurance"],
+    "compensation": ["salary band", "bonus", "merit increase", "payroll", "overtime", "stock options"],
+    "remote_work": ["remote work", "hybrid schedule", "home office stipend", "VPN", "co-working"],
+    "onboarding": ["first day", "orientation", "laptop setup", "badge", "buddy program", "Form I-9"],
+    "conduct": ["code of conduct", "harassment", "conflict of interest", "gifts", "whistleblower"]
+}
+
+SENTENCE_TEMPLATES = [
+    "Employees are eligible for {term} after completing {n} days of continuous service.",
+    "Requests related to {term} must be submitted through the HR portal at least {n} business days in advance.",
+    "The company reviews the {term} policy annually and communicates changes by email.",
+    "Managers approve {term} requests within {n} working days unless a blackout period applies.",
+    "Part-time staff receive {term} on a pro-rated basis according to scheduled hours.",
+    "Questions about {term} should be directed to the People Operations team or your HR business partner.",
+    "Form HR-{n} is required to change your {term} election outside of open enrollment.",
+    "Unused {term} balances up to {n} hours carry over to the next calendar year."
+]
+
+
+def generate_section(rng: random.Random, category: str, sentences: int) -> str:
+    """Generate one policy section as a few paragraphs of sentences"""
+    terms = TOPICS[category]
+    paragraphs = []
+    remaining = sentences
+    while remaining > 0:
+        size = min(remaining, rng.randint(3, 8))
+        paragraph = " ".join(
+            rng.choice(SENTENCE_TEMPLATES).format(term=rng.choice(terms), n=rng.randint(1, 90))
+            for _ in range(size)
+        )
+        paragraphs.append(paragraph)
+        remaining -= size
+    title = f"{category.replace('_', ' ').title()} Policy"
+    return title + "\n\n" + "\n\n".join(paragraphs)
+
+
+def generate_handbook(pages: int = 200, seed: int = 0) -> str:
+    """Generate a synthetic employee handbook of roughly ``pages`` pages (~25 sentences each)"""
+    rng = random.Random(seed)
+    categories = list(TOPICS)
+    sections = [generate_section(rng, rng.choice(categories), 25) for _ in range(pages)]
+    return "\n\n".join(sections)
+
+
+def generate_chunks(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Generate ``count`` labelled chunks as {"text", "category", "term"} dictionaries"""
+    rng = random.Random(seed)
+    categories = list(TOPICS)
+    chunks = []
+    for _ in range(count):
+        category = rng.choice(categories)
+        term = rng.choice(TOPICS[category])
+        text = " ".join(
+            rng.choice(SENTENCE_TEMPLATES).format(term=term, n=rng.randint(1, 90))
+            for _ in range(rng.randint(3, 6))
+        )
+        chunks.append({"text": text, "category": category, "term": term})
+    return chunks
+
+
+def generate_documents(count: int, chunks_per_document: int = 20, versions: int = 3, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Generate ``count`` labelled documents, each about one policy term.
+
+    Documents come in families of ``versions`` near-identical revisions that differ
+    in a few chunks, like successive versions of the same policy. Each document is
+    {"document_id", "category", "term", "chunks"}.
+    """
+    rng = random.Random(seed)
+    categories = list(TOPICS)
+    documents = []
+    while len(documents) < count:
+        category = rng.choice(categories)
+        term = rng.choice(TOPICS[category])
+        base = [
+            " ".join(rng.choice(SENTENCE_TEMPLATES).format(term=term, n=rng.randint(1, 90)) for _ in range(rng.randint(3, 6)))
+            for _ in range(chunks_per_document)
+        ]
+        for version in range(min(versions, count - len(documents))):
+            chunks = list(base)
+            # Each revision rewrites a couple of chunks
+            for position in rng.sample(range(chunks_per_document), min(2, chunks_per_document)):
+                chunks[position] = " ".join(
+                    rng.choice(SENTENCE_TEMPLATES).format(term=term, n=rng.randint(1, 90)) for _ in range(rng.randint(3, 6))
+                )
+            documents.append({
+                "document_id": f"doc_{len(documents)}",
+                "category": category,
+                "term": term,
+                "chunks": chunks
+            })
+    return documents
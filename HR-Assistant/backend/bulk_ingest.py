@@ -0,0 +1,329 @@
+"""
+Bulk-ingest a directory tree of HR documents without going through the HTTP API.
+
+Categories come from the folder layout: the first folder below the root is the
+category and the second (if any) the document type, e.g.
+
+    handbooks/benefits/plans/dental.pdf  ->  category "benefits", type "plans"
+
+Text extraction and chunking run in a process pool while the main process embeds
+chunks from many documents together in large batches and writes them to the vector
+store. Every finished file is appended to a manifest, so rerunning the command after
+a crash skips completed files; files that changed since are updated in place.
+
+The vector store can only be open in one process, so stop the API server first
+(or upload through its /upload endpoint instead); it sees the new documents
+when it starts again.
+
+Usage (from the backend directory):
+    python bulk_ingest.py /path/to/hr_documents [--workers 4] [--batch-size 256]
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.config import (
+    UPLOAD_DIR,
+    CHROMA_DIR,
+    MAX_UPLOAD_SIZE,
+    UPLOAD_CHUNK_SIZE,
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS
+)
+from app.services.chunker import TokenChunker, get_model_token_budget
+from app.services.document_processor import DocumentProcessor
+from app.services.file_storage import save_file_stream
+from app.services.vector_store import VectorStore, StoreInUseError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("bulk_ingest")
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
+
+# Chunker of each worker process, built once by _init_worker
+_worker_chunker = None
+
+
+class IngestManifest:
+    def __init__(self, path: str):
+        """Append-only JSONL record of processed files; the last entry per path wins"""
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-write
+                        continue
+                    self.entries[entry["path"]] = entry
+        self._file = open(path, "a", encoding="utf-8")
+
+    def is_current(self, path: str, size: int, mtime: float) -> bool:
+        """Whether ``path`` was ingested successfully and has not changed since"""
+        entry = self.entries.get(path)
+        return bool(entry) and entry["status"] == "done" and entry["size"] == size and entry["mtime"] == mtime
+
+    def document_id(self, path: str) -> Optional[str]:
+        """Document ID from an earlier successful ingest of ``path``"""
+        entry = self.entries.get(path)
+        return entry.get("document_id") if entry else None
+
+    def record(self, entry: Dict[str, Any]):
+        """Durably append one entry"""
+        entry["recorded_at"] = time.time()
+        self.entries[entry["path"]] = entry
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def discover_files(root: str, default_category: str, default_document_type: str) -> List[Dict[str, Any]]:
+    """Walk ``root`` and describe every supported file with its category and type"""
+    found = []
+    for directory, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            path = os.path.abspath(os.path.join(directory, filename))
+            folders = os.path.relpath(directory, root).split(os.sep)
+            folders = [folder for folder in folders if folder not in (".", "")]
+            stat = os.stat(path)
+            found.append({
+                "path": path,
+                "original_name": filename,
+                "category": folders[0] if folders else default_category,
+                "document_type": folders[1] if len(folders) > 1 else default_document_type,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime
+            })
+    return found
+
+
+def _init_worker(tokenizer, max_tokens: int, overlap_tokens: int):
+    """Build the chunker once per worker process"""
+    global _worker_chunker
+    _worker_chunker = TokenChunker(tokenizer=tokenizer, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+
+def _prepare_file(source: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """Copy a file into the upload directory (hashing it) and extract and chunk its text"""
+    file_extension = os.path.splitext(source["path"])[1]
+    saved_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}{file_extension}")
+    with open(source["path"], "rb") as f:
+        saved = save_file_stream(f, saved_path, MAX_UPLOAD_SIZE, UPLOAD_CHUNK_SIZE)
+
+    try:
+        chunks = _worker_chunker.split_text(DocumentProcessor._extract_text(saved_path))
+    except Exception:
+        os.remove(saved_path)
+        raise
+
+    file_info = {
+        "original_name": source["original_name"],
+        "saved_path": saved_path,
+        "category": source["category"],
+        "document_type": source["document_type"],
+        "content_hash": saved["content_hash"],
+        "file_size": saved["size"]
+    }
+    return file_info, chunks
+
+
+class BulkIngester:
+    def __init__(self, vector_store: VectorStore, manifest: IngestManifest, workers: int, batch_size: int):
+        """Pipeline of parallel extraction, batched embedding and storage"""
+        self.vector_store = vector_store
+        self.document_processor = DocumentProcessor(vector_store)
+        self.manifest = manifest
+        self.workers = workers
+        self.batch_size = batch_size
+
+        # Documents whose chunks are waiting to be embedded: (source, file_info, chunks)
+        self._pending = []
+        self._pending_chunks = 0
+        # Content hash of each pending document -> sources found with the same content
+        self._pending_duplicates: Dict[str, List[Dict[str, Any]]] = {}
+        self.stats = {"done": 0, "updated": 0, "duplicates": 0, "failed": 0, "skipped": 0, "chunks": 0}
+
+    def run(self, sources: List[Dict[str, Any]]):
+        """Ingest every source that is not already current in the manifest"""
+        todo = []
+        for source in sources:
+            if self.manifest.is_current(source["path"], source["size"], source["mtime"]):
+                self.stats["skipped"] += 1
+            else:
+                todo.append(source)
+        logger.info(f"{len(todo)} files to ingest, {self.stats['skipped']} already done")
+
+        model = self.document_processor.model
+        init_args = (
+            model.tokenizer,
+            CHUNK_MAX_TOKENS or get_model_token_budget(model),
+            CHUNK_OVERLAP_TOKENS
+        )
+        started = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=init_args) as executor:
+            queue = iter(todo)
+            in_flight = {}
+            # Keep a bounded number of files in flight so memory stays flat
+            for source in queue:
+                in_flight[executor.submit(_prepare_file, source)] = source
+                if len(in_flight) >= 2 * self.workers:
+                    break
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    source = in_flight.pop(future)
+                    next_source = next(queue, None)
+                    if next_source is not None:
+                        in_flight[executor.submit(_prepare_file, next_source)] = next_source
+                    self._handle_prepared(source, future)
+
+                if self._pending_chunks >= self.batch_size:
+                    self._flush()
+
+        self._flush()
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Finished in {elapsed:.1f}s: {self.stats['done']} new, {self.stats['updated']} updated, "
+            f"{self.stats['duplicates']} duplicates, {self.stats['failed']} failed, "
+            f"{self.stats['chunks']} chunks ({self.stats['chunks'] / max(elapsed, 1e-9):.1f} chunks/s)"
+        )
+
+    def _handle_prepared(self, source: Dict[str, Any], future):
+        """Route a prepared file to the embedding batch, an in-place update, or the manifest"""
+        try:
+            file_info, chunks = future.result()
+        except Exception as e:
+            self._record_failure(source, e)
+            return
+
+        content_hash = file_info["content_hash"]
+        existing_id = self.vector_store.find_document_by_hash(content_hash)
+        if existing_id or content_hash in self._pending_duplicates:
+            os.remove(file_info["saved_path"])
+            self.stats["duplicates"] += 1
+            if existing_id:
+                self._record(source, "done", existing_id, None)
+            else:
+                # Same content as a file still waiting to be embedded; recorded when that one is stored
+                self._pending_duplicates[content_hash].append(source)
+            return
+
+        previous_id = self.manifest.document_id(source["path"])
+        if previous_id and self.vector_store.get_document_metadata(previous_id):
+            # The file changed since it was ingested: only re-embed changed chunks
+            try:
+                file_info["document_id"] = previous_id
+                result = self.document_processor.process_document(file_info, chunks=chunks)
+                self.stats["updated"] += 1
+                self.stats["chunks"] += result["changes"]["added"]
+                self._record(source, "done", previous_id, result["chunk_count"])
+            except Exception as e:
+                if os.path.exists(file_info["saved_path"]):
+                    os.remove(file_info["saved_path"])
+                self._record_failure(source, e)
+            return
+
+        self._pending.append((source, file_info, chunks))
+        self._pending_chunks += len(chunks)
+        self._pending_duplicates[content_hash] = []
+
+    def _flush(self):
+        """Embed all pending chunks in one batch and store their documents"""
+        if not self._pending:
+            return
+
+        pending, self._pending, self._pending_chunks = self._pending, [], 0
+        texts = [chunk for _, _, chunks in pending for chunk in chunks]
+        index = self.vector_store.active_index
+        embeddings = index.model.encode(texts, batch_size=64, show_progress_bar=False).tolist() if texts else []
+
+        offset = 0
+        for source, file_info, chunks in pending:
+            document_embeddings = embeddings[offset:offset + len(chunks)]
+            offset += len(chunks)
+            duplicates = self._pending_duplicates.pop(file_info["content_hash"], [])
+            try:
+                document_id = self.document_processor.index_document(
+                    file_info, chunks, document_embeddings, index_version=index.version
+                )
+                self.stats["done"] += 1
+                self.stats["chunks"] += len(chunks)
+                self._record(source, "done", document_id, len(chunks))
+                for duplicate in duplicates:
+                    self._record(duplicate, "done", document_id, None)
+            except Exception as e:
+                if os.path.exists(file_info["saved_path"]):
+                    os.remove(file_info["saved_path"])
+                for failed_source in [source] + duplicates:
+                    self._record_failure(failed_source, e)
+
+        logger.info(f"Stored {len(pending)} documents ({len(texts)} chunks)")
+
+    def _record(self, source: Dict[str, Any], status: str, document_id: Optional[str], chunk_count: Optional[int], error: Optional[str] = None):
+        self.manifest.record({
+            "path": source["path"],
+            "size": source["size"],
+            "mtime": source["mtime"],
+            "status": status,
+            "document_id": document_id,
+            "chunk_count": chunk_count,
+            "error": error
+        })
+
+    def _record_failure(self, source: Dict[str, Any], error: Exception):
+        logger.error(f"Error processing {source['path']}: {error}")
+        self.stats["failed"] += 1
+        self._record(source, "failed", None, None, str(error))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="Directory tree of HR documents")
+    parser.add_argument("--manifest", default="ingest_manifest.jsonl", help="Progress manifest used to resume")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="Extraction processes")
+    parser.add_argument("--batch-size", type=int, default=256, help="Chunks embedded per batch")
+    parser.add_argument("--default-category", default="general", help="Category for files directly under the root")
+    parser.add_argument("--default-document-type", default="policy", help="Document type when there is no type folder")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        parser.error(f"{args.root} is not a directory")
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    sources = discover_files(args.root, args.default_category, args.default_document_type)
+
+    try:
+        vector_store = VectorStore(persist_directory=CHROMA_DIR)
+    except StoreInUseError as e:
+        logger.error(str(e))
+        return 2
+
+    manifest = IngestManifest(args.manifest)
+    try:
+        ingester = BulkIngester(vector_store, manifest, args.workers, args.batch_size)
+        ingester.run(sources)
+    finally:
+        manifest.close()
+        vector_store.close()
+
+    return 1 if ingester.stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Precompute answers for the most frequent HR questions.
+
+Asks the running API to read its query log, cluster the logged queries by
+embedding and answer the largest clusters against the index it is serving. The
+build runs in the background of the API process (the vector store can only be
+open in one process); this command starts it and waits for it to finish.
+
+Usage (from the backend directory, with the API running):
+    python precompute_answers.py [--top 50] [--days 30] [--cluster-threshold 0.85] [--url http://localhost:8000]
+"""
+import sys
+import time
+import argparse
+import logging
+from typing import List, Optional
+
+import requests
+
+from app.config import PRECOMPUTED_CLUSTER_THRESHOLD, PRECOMPUTED_TOP_CLUSTERS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("precompute_answers")
+
+# Seconds between status checks while the build runs
+POLL_INTERVAL = 2.0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=PRECOMPUTED_TOP_CLUSTERS, help="Number of clusters to answer")
+    parser.add_argument("--days", type=float, default=None, help="Only use queries from the last N days")
+    parser.add_argument("--cluster-threshold", type=float, default=PRECOMPUTED_CLUSTER_THRESHOLD)
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the running API")
+    args = parser.parse_args(argv)
+
+    base_url = args.url.rstrip("/")
+    try:
+        response = requests.post(
+            f"{base_url}/admin/precomputed-answers/build",
+            json={"top": args.top, "days": args.days, "cluster_threshold": args.cluster_threshold},
+            timeout=30
+        )
+    except requests.RequestException as e:
+        logger.error(f"Could not reach the API at {base_url}: {e}")
+        return 1
+    if response.status_code != 202:
+        logger.error(f"Build not started ({response.status_code}): {response.json().get('detail')}")
+        return 1
+    logger.info(response.json()["message"])
+
+    while True:
+        time.sleep(POLL_INTERVAL)
+        result = requests.get(f"{base_url}/admin/precomputed-answers", timeout=30).json()
+        build = result["build"]
+        if build["status"] != "running":
+            break
+
+    if build["status"] != "completed":
+        logger.error(f"Build failed: {build.get('error')}")
+        return 1
+
+    covered = build["covered_queries"]
+    logger.info(
+        f"Precomputed {build['answers']} answers in {build['seconds']:.1f}s, covering "
+        f"{covered}/{build['logged_queries']} logged queries ({covered / build['logged_queries']:.0%})"
+    )
+    for entry in result["answers"][:10]:
+        logger.info(f"  {entry['cluster_size']:>6}  {entry['question']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
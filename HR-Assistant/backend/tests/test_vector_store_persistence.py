@@ -0,0 +1,104 @@
+"""
+The vector store is written by one process and read by another (bulk_ingest.py
+and precompute_answers.py run outside the API), so what a process stores must
+be on disk when it exits. Only one process may have the store open at a time.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+import os
+import sys
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WRITE_CHUNKS = """
+import sys
+from app.services.vector_store import VectorStore
+
+store = VectorStore(persist_directory=sys.argv[1])
+ids = store.add_document_chunks(
+    chunks=["Employees accrue 20 days of paid leave per year.", "Dental plans are renewed every January."],
+    embeddings=[[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+    metadata_list=[
+        {"document_id": "doc_test", "source": "handbook.txt", "category": "benefits", "chunk_index": i}
+        for i in range(2)
+    ]
+)
+print(",".join(ids))
+"""
+
+READ_CHUNKS = """
+import sys
+from app.services.vector_store import VectorStore
+
+store = VectorStore(persist_directory=sys.argv[1])
+texts = store.get_chunk_texts(sys.argv[2].split(","))
+print(store.collection.count(), len(store.bm25_index))
+for chunk_id in sys.argv[2].split(","):
+    print(texts[chunk_id])
+"""
+
+
+def _run(script: str, *args: str) -> str:
+    completed = subprocess.run(
+        [sys.executable, "-c", script, *args],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True
+    )
+    assert completed.returncode == 0, completed.stderr
+    return completed.stdout.strip()
+
+
+def test_chunks_are_readable_from_another_process(tmp_path):
+    persist_directory = str(tmp_path / "chroma_db")
+
+    chunk_ids = _run(WRITE_CHUNKS, persist_directory)
+    lines = _run(READ_CHUNKS, persist_directory, chunk_ids).splitlines()
+
+    assert lines[0] == "2 2"
+    assert lines[1:] == [
+        "Employees accrue 20 days of paid leave per year.",
+        "Dental plans are renewed every January."
+    ]
+
+
+HOLD_STORE = """
+import sys
+from app.services.vector_store import VectorStore
+
+store = VectorStore(persist_directory=sys.argv[1])
+print("ready", flush=True)
+sys.stdin.read()
+"""
+
+OPEN_STORE = """
+import sys
+from app.services.vector_store import VectorStore, StoreInUseError
+
+try:
+    VectorStore(persist_directory=sys.argv[1])
+    print("opened")
+except StoreInUseError:
+    print("in use")
+"""
+
+
+def test_store_cannot_be_opened_by_two_processes(tmp_path):
+    persist_directory = str(tmp_path / "chroma_db")
+
+    holder = subprocess.Popen(
+        [sys.executable, "-c", HOLD_STORE, persist_directory],
+        cwd=BACKEND_DIR,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True
+    )
+    try:
+        assert holder.stdout.readline().strip() == "ready"
+        assert _run(OPEN_STORE, persist_directory) == "in use"
+    finally:
+        holder.communicate("")
+
+    assert _run(OPEN_STORE, persist_directory) == "opened"
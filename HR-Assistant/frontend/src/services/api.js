@@ -29,11 +29,31 @@ export const uploadDocuments = async (files, documentType, category) => {
   return response.data;
 };
 
+export const getJob = async (jobId) => {
+  const response = await api.get(`/jobs/${jobId}`);
+  return response.data;
+};
+
 export const getDocuments = async () => {
   const response = await api.get('/documents');
   return response.data.documents;
 };
 
+export const updateDocument = async (documentId, file, documentType = null, category = null) => {
+  const formData = new FormData();
+  formData.append('file', file);
+  if (documentType) formData.append('document_type', documentType);
+  if (category) formData.append('category', category);
+
+  const response = await api.put(`/documents/${documentId}`, formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+  });
+
+  return response.data;
+};
+
 export const deleteDocument = async (documentId) => {
   const response = await api.delete(`/documents/${documentId}`);
   return response.data;
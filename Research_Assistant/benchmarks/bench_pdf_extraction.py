@@ -0,0 +1,72 @@
+"""
+Compare serial and parallel PDF text extraction.
+
+Generates synthetic text PDFs of several page counts and times
+extract_text_from_pdf against extract_text_from_pdf_parallel with different
+numbers of worker processes, checking that both produce the same text.
+
+Usage (from the Research_Assistant directory):
+    python -m benchmarks.bench_pdf_extraction [--pages 50,200,800] [--workers 2,4,8]
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+import fitz  # PyMuPDF
+
+from utils.pdf_processor import extract_text_from_pdf, extract_text_from_pdf_parallel
+
+WORDS = (
+    "retrieval embedding transformer attention corpus benchmark latency throughput "
+    "evaluation dataset baseline gradient inference quantization hypothesis experiment"
+).split()
+
+
+def make_pdf(path: str, pages: int, lines_per_page: int = 45, seed: int = 0) -> None:
+    """Write a PDF with ``pages`` pages of random text lines"""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        text = "\n".join(" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines_per_page))
+        page.insert_textbox(fitz.Rect(40, 40, page.rect.width - 40, page.rect.height - 40), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def timed(function, *args, repeats: int = 3, **kwargs):
+    """Return (best time in seconds, result) over ``repeats`` runs"""
+    best, result = float("inf"), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="50,200,800")
+    parser.add_argument("--workers", default=",".join(str(n) for n in (2, 4, 8) if n <= (os.cpu_count() or 1)) or "2")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'pages':>6}{'workers':>9}{'seconds':>10}{'pages/s':>10}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for pages in (int(n) for n in args.pages.split(",")):
+            path = os.path.join(directory, f"synthetic_{pages}.pdf")
+            make_pdf(path, pages)
+
+            serial_time, serial_text = timed(extract_text_from_pdf, path, repeats=args.repeats)
+            print(f"{pages:>6}{'serial':>9}{serial_time:>10.3f}{pages / serial_time:>10.1f}{1.0:>9.2f}")
+
+            for workers in (int(n) for n in args.workers.split(",")):
+                parallel_time, parallel_text = timed(extract_text_from_pdf_parallel, path, workers=workers, repeats=args.repeats)
+                assert parallel_text == serial_text, "parallel extraction changed the text"
+                print(f"{pages:>6}{workers:>9}{parallel_time:>10.3f}{pages / parallel_time:>10.1f}{serial_time / parallel_time:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
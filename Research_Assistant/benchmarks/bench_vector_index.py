@@ -0,0 +1,100 @@
+"""
+Compare the NumPy vector index with a Chroma collection.
+
+Generates random unit vectors (384 dimensions, like all-MiniLM-L6-v2) for
+several collection sizes and reports build time and per-query p50/p95 latency
+for NumpyVectorIndex and an in-memory Chroma collection, plus Chroma's
+recall@k against the exact results of the NumPy index. Both backends run at
+every size by default; building Chroma's index for 1M vectors takes a long
+time, so --chroma-max-size can skip Chroma above a size.
+
+Usage (from the Research_Assistant directory):
+    python -m benchmarks.bench_vector_index [--sizes 1000,100000,1000000] [--queries 200] [--k 5] [--chroma-max-size N]
+"""
+import time
+import argparse
+
+import numpy as np
+
+from utils.numpy_index import NumpyVectorIndex
+
+DIMENSION = 384
+# Largest batch Chroma accepts comfortably in one add call
+CHROMA_BATCH_SIZE = 5000
+
+
+def random_unit_vectors(count: int, dimension: int, rng: np.random.Generator) -> np.ndarray:
+    vectors = rng.standard_normal((count, dimension), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def latencies(query_function, queries: np.ndarray):
+    """Return (p50, p95) latency in milliseconds and the results of one query each"""
+    seconds, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(query_function(query))
+        seconds.append(time.perf_counter() - start)
+    p50, p95 = np.percentile(seconds, [50, 95]) * 1000
+    return p50, p95, results
+
+
+def bench_numpy(vectors: np.ndarray, queries: np.ndarray, k: int):
+    start = time.perf_counter()
+    index = NumpyVectorIndex("bench", capacity=len(vectors))
+    ids = [str(i) for i in range(len(vectors))]
+    for offset in range(0, len(vectors), CHROMA_BATCH_SIZE):
+        index.add(ids=ids[offset:offset + CHROMA_BATCH_SIZE], embeddings=vectors[offset:offset + CHROMA_BATCH_SIZE])
+    build = time.perf_counter() - start
+
+    p50, p95, results = latencies(lambda query: index.search(query, k)[0][0], queries)
+    return build, p50, p95, [set(rows.tolist()) for rows in results]
+
+
+def bench_chroma(vectors: np.ndarray, queries: np.ndarray, k: int):
+    import chromadb
+
+    start = time.perf_counter()
+    client = chromadb.Client()
+    name = f"bench_{len(vectors)}"
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass
+    collection = client.create_collection(name, metadata={"hnsw:space": "cosine"})
+    for offset in range(0, len(vectors), CHROMA_BATCH_SIZE):
+        batch = vectors[offset:offset + CHROMA_BATCH_SIZE]
+        collection.add(ids=[str(offset + i) for i in range(len(batch))], embeddings=batch.tolist())
+    build = time.perf_counter() - start
+
+    query = lambda query: collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])["ids"][0]
+    p50, p95, results = latencies(query, queries)
+    client.delete_collection(name)
+    return build, p50, p95, [{int(i) for i in ids} for ids in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--chroma-max-size", type=int, default=None, help="Largest size Chroma is benchmarked at (default: all)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>9}{'backend':>9}{'build s':>10}{'p50 ms':>9}{'p95 ms':>9}{'recall':>8}")
+    for size in (int(n) for n in args.sizes.split(",")):
+        vectors = random_unit_vectors(size, DIMENSION, rng)
+        queries = random_unit_vectors(args.queries, DIMENSION, rng)
+
+        build, p50, p95, exact = bench_numpy(vectors, queries, args.k)
+        print(f"{size:>9}{'numpy':>9}{build:>10.2f}{p50:>9.2f}{p95:>9.2f}{1.0:>8.3f}")
+
+        if args.chroma_max_size is None or size <= args.chroma_max_size:
+            build, p50, p95, approximate = bench_chroma(vectors, queries, args.k)
+            recall = np.mean([len(found & truth) / len(truth) for found, truth in zip(approximate, exact)])
+            print(f"{size:>9}{'chroma':>9}{build:>10.2f}{p50:>9.2f}{p95:>9.2f}{recall:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
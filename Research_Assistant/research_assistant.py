@@ -1,18 +1,60 @@
 import os
 import streamlit as st
 import time
+import tempfile
 from dotenv import load_dotenv
-from utils.pdf_processor import extract_text_from_pdf, chunk_text
+from utils.pdf_processor import iter_pdf_pages, iter_chunks
 from utils.embeddings import get_embedding_model
-from utils.vector_store import create_collection, store_chunks
-from utils.retrieval import sparse_search, hybrid_retrieval, rerank_results
+from utils.document_library import DocumentLibrary, content_hash
+from utils.retrieval import sparse_search_scored, dense_search_scored, hybrid_retrieval_scored, rerank_results, unit_scores, relevance_scores
 from utils.web_search import web_search_serper
-from utils.response_generator import generate_response
-from utils.monitoring import log_query, log_response
+from utils.pipeline import fan_out
+from utils.response_generator import generate_response_stream
+from utils.context_packer import pack_context
+from utils.monitoring import log_query, log_response, log_error, log_span, get_cache_stats, get_stage_latency
+from utils.tracing import trace, timed_iter
 
 # Load environment variables
 load_dotenv()
 
+# Processed PDFs are kept here and reused across sessions
+LIBRARY_DIR = os.getenv("LIBRARY_DIR", "library")
+# Vector store for the library: "chroma" or the in-process "numpy" index
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+
+# Retrieval settings
+TOP_K = 5  # Chunks passed to the response generator
+RERANK_CANDIDATES = 20  # First-stage candidates retrieved when reranking
+RERANK_CASCADE = 10  # Best first-stage candidates scored by the cross-encoder
+RERANK_TIME_BUDGET = 1.0  # Seconds available for cross-encoder scoring
+RERANK_BATCH_SIZE = 4  # Pairs per cross-encoder call; the budget is checked between calls
+
+# Deadlines for the query branches, which run concurrently
+WEB_SEARCH_TIMEOUT = 8.0  # Seconds before answering without web results
+RETRIEVAL_TIMEOUT = 30.0  # Seconds before answering without PDF chunks (includes a first model load)
+
+# Prompt tokens available for PDF chunks and web snippets
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+
+def render_stream(pieces, refresh_interval: float = 0.05) -> str:
+    """Render streamed response text as it arrives and return the full text"""
+    placeholder = st.empty()
+    text = ""
+    last_render = 0.0
+    for piece in pieces:
+        text += piece
+        # Re-rendering markdown for every token is slow on long answers
+        if time.monotonic() - last_render >= refresh_interval:
+            placeholder.markdown(text + "▌")
+            last_render = time.monotonic()
+    placeholder.markdown(text)
+    return text
+
+@st.cache_resource
+def get_library() -> DocumentLibrary:
+    """One library per process, shared by all sessions so their uploads are serialized"""
+    return DocumentLibrary(LIBRARY_DIR, backend=VECTOR_BACKEND)
+
 # Check for API keys
 if not os.getenv("GROQ_API_KEY"):
     st.error("⚠️ GROQ_API_KEY not found in .env file")
@@ -20,12 +62,6 @@ if not os.getenv("SERP_API_KEY"):
     st.error("⚠️ SERP_API_KEY not found in .env file")
 
 # Initialize session state
-if "chunks" not in st.session_state:
-    st.session_state.chunks = None
-if "collection" not in st.session_state:
-    st.session_state.collection = None
-if "pdf_name" not in st.session_state:
-    st.session_state.pdf_name = None
 if "query_history" not in st.session_state:
     st.session_state.query_history = []
 if "response_history" not in st.session_state:
@@ -35,7 +71,7 @@ if "response_history" not in st.session_state:
 st.title("Research Assistant")
 st.markdown("""
 This app combines PDF document analysis with web search to provide comprehensive answers to your questions.
-Upload a PDF document, ask a question, and get answers with citations from both the document and the web.
+Upload one or more PDF documents, ask a question, and get answers with citations from both the document and the web.
 """)
 
 # Sidebar for configuration
@@ -44,111 +80,235 @@ retrieval_method = st.sidebar.selectbox(
     "Retrieval Method",
     ["Hybrid (Dense + Sparse)", "Dense Only", "Sparse Only"]
 )
+fusion_method = st.sidebar.selectbox(
+    "Hybrid Fusion",
+    ["Weighted Scores", "Reciprocal Rank Fusion"],
+    disabled=retrieval_method != "Hybrid (Dense + Sparse)"
+)
 use_reranking = st.sidebar.checkbox("Use Cross-Encoder Reranking", value=True)
 web_results_count = st.sidebar.slider("Number of Web Results", 0, 10, 3)
 temperature = st.sidebar.slider("Response Temperature", 0.0, 1.0, 0.3)
 
+# Where query and ingestion time goes, over recent spans
+with st.sidebar.expander("Stage Latency"):
+    stage_latency = get_stage_latency()
+    if not stage_latency:
+        st.write("No timings recorded yet.")
+    else:
+        st.table([
+            {"Stage": stage, "Count": stats["count"], "p50 (ms)": round(stats["p50_ms"], 1), "p95 (ms)": round(stats["p95_ms"], 1)}
+            for stage, stats in sorted(stage_latency.items(), key=lambda item: -item[1]["p95_ms"])
+        ])
+
+# Web cache effectiveness since the app started
+with st.sidebar.expander("Web Cache"):
+    cache_stats = get_cache_stats()
+    if not cache_stats:
+        st.write("No web lookups yet.")
+    for kind, counters in cache_stats.items():
+        st.markdown(
+            f"**{kind.title()}**: {counters['hit'] + counters['stale_hit']} hits, "
+            f"{counters['miss']} misses ({counters['hit_rate']:.0%}), "
+            f"{counters['saved_seconds']:.1f}s saved"
+        )
+
 # File uploader
-uploaded_file = st.file_uploader("Upload a PDF document", type="pdf")
-
-if uploaded_file:
-    # Process the PDF if it's new or different from the last one
-    if st.session_state.pdf_name != uploaded_file.name:
-        with st.spinner("Processing PDF..."):
-            # Save the uploaded file temporarily
-            temp_file_path = f"temp_{uploaded_file.name}"
-            with open(temp_file_path, "wb") as f:
+library = get_library()
+uploaded_files = st.file_uploader("Upload PDF documents", type="pdf", accept_multiple_files=True)
+
+uploaded_hashes = []
+for uploaded_file in uploaded_files or []:
+    document_hash = content_hash(uploaded_file.getbuffer())
+    uploaded_hashes.append(document_hash)
+    
+    # PDFs already in the library (under any name) are not processed again
+    if not library.has_document(document_hash):
+        with st.spinner(f"Processing {uploaded_file.name}..."):
+            # Save the uploaded file temporarily (per session, as another one may upload it too)
+            temp_fd, temp_file_path = tempfile.mkstemp(prefix=f"temp_{document_hash[:16]}_", suffix=".pdf", dir=".")
+            with os.fdopen(temp_fd, "wb") as f:
                 f.write(uploaded_file.getbuffer())
             
-            # Extract text from PDF
-            text = extract_text_from_pdf(temp_file_path)
-            
-            # Chunk the text
-            chunks = chunk_text(text)
-            
-            # Get embedding model
-            embedding_model = get_embedding_model()
-            
-            # Create and store embeddings
-            collection = create_collection("pdf_chunks")
-            store_chunks(chunks, collection, embedding_model)
-            
-            # Update session state
-            st.session_state.chunks = chunks
-            st.session_state.collection = collection
-            st.session_state.pdf_name = uploaded_file.name
-            
-            # Clean up
-            os.remove(temp_file_path)
+            try:
+                with trace(document_hash):
+                    # Extract pages on all cores and chunk them as they arrive, so
+                    # embedding starts before extraction has finished
+                    pages = timed_iter("pdf_extraction", iter_pdf_pages(temp_file_path))
+                    chunks = timed_iter("chunking", iter_chunks(pages))
+                    
+                    # Embed and store the chunks and update the keyword index
+                    entry = library.add_document(document_hash, uploaded_file.name, chunks, get_embedding_model())
+            finally:
+                # Clean up
+                os.remove(temp_file_path)
         
-        st.success(f"✅ Processed {len(chunks)} chunks from {uploaded_file.name}")
+        st.success(f"✅ Processed {entry['chunk_count']} chunks from {uploaded_file.name}")
+
+# Choose which library documents to search; newly uploaded ones by default
+documents = library.list_documents()
+selected_hashes = []
+if documents:
+    selected_hashes = st.multiselect(
+        "Documents to search",
+        options=[document["hash"] for document in documents],
+        default=list(dict.fromkeys(uploaded_hashes)) or [document["hash"] for document in documents],
+        format_func=lambda document_hash: library.documents[document_hash]["name"]
+    )
 
+if selected_hashes:
+    pdf_name = ", ".join(library.documents[document_hash]["name"] for document_hash in selected_hashes)
+    where_filter = library.where_filter(selected_hashes)
+    position_mask = library.position_mask(selected_hashes)
+    
     # Query input
-    query = st.text_input("Ask a question about the document:")
+    query = st.text_input("Ask a question about the documents:")
     
-    if query and st.session_state.chunks and st.session_state.collection:
+    if query:
+        answer_rendered = False
         if query not in st.session_state.query_history:
-            with st.spinner("Searching for answers..."):
-                # Log the query
-                query_id = log_query(query, st.session_state.pdf_name)
-                
-                # Get embedding model
-                embedding_model = get_embedding_model()
-                
-                # Retrieve relevant chunks based on selected method
-                if retrieval_method == "Dense Only":
-                    dense_emb = embedding_model.encode(query)
-                    results = st.session_state.collection.query(
-                        query_embeddings=[dense_emb.tolist()], 
-                        n_results=5
+            # Log the query
+            query_id = log_query(query, pdf_name)
+            
+            # Time each stage of this query under its ID
+            with trace(query_id):
+                with st.spinner("Searching for answers..."):
+                    def retrieve_pdf_chunks():
+                        # Get embedding model
+                        embedding_model = get_embedding_model()
+                        
+                        # Retrieve candidates with their first-stage scores; fetch more
+                        # when a reranker will pick the best of them
+                        candidate_count = RERANK_CANDIDATES if use_reranking else TOP_K
+                        score_kind = "similarity"
+                        if retrieval_method == "Dense Only":
+                            positions, scores = dense_search_scored(
+                                query,
+                                library.collection,
+                                embedding_model,
+                                top_k=candidate_count,
+                                where=where_filter
+                            )
+                        elif retrieval_method == "Sparse Only":
+                            positions, scores = sparse_search_scored(
+                                query,
+                                library.chunks,
+                                top_k=candidate_count,
+                                sparse_index=library.sparse_index,
+                                position_mask=position_mask
+                            )
+                        else:  # Hybrid
+                            positions, scores = hybrid_retrieval_scored(
+                                query, 
+                                library.chunks, 
+                                library.collection,
+                                embedding_model,
+                                top_k=candidate_count,
+                                sparse_index=library.sparse_index,
+                                fusion="rrf" if fusion_method == "Reciprocal Rank Fusion" else "weighted",
+                                where=where_filter,
+                                position_mask=position_mask
+                            )
+                            if fusion_method == "Reciprocal Rank Fusion":
+                                score_kind = "rrf"
+                        scored_chunks = [(library.chunks[i], float(score)) for i, score in zip(positions, scores)]
+                        
+                        # Apply reranking if enabled: only the best first-stage candidates
+                        # go through the cross-encoder, within a latency budget
+                        if use_reranking and len(scored_chunks) > 1:
+                            scored_chunks = rerank_results(
+                                query,
+                                [chunk for chunk, _ in scored_chunks],
+                                top_k=TOP_K,
+                                first_stage_scores=[score for _, score in scored_chunks],
+                                batch_size=RERANK_BATCH_SIZE,
+                                chunk_ids=[str(i) for i in positions],
+                                cascade_top_n=RERANK_CASCADE,
+                                time_budget=RERANK_TIME_BUDGET,
+                                return_scores=True
+                            )
+                            score_kind = "cross_encoder"
+                        
+                        # Keep the scores so context packing can rank chunks against web results
+                        scores = unit_scores([score for _, score in scored_chunks], score_kind)
+                        return [(chunk, score) for (chunk, _), score in zip(scored_chunks, scores)]
+                    
+                    # The web search does not depend on the PDFs, so it runs alongside
+                    # retrieval and reranking instead of after them
+                    branches = {}
+                    if web_results_count > 0:
+                        branches["web"] = lambda: web_search_serper(query, web_results_count, timeout=WEB_SEARCH_TIMEOUT)
+                    branches["pdf"] = retrieve_pdf_chunks
+                    results, statuses = fan_out(
+                        branches,
+                        timeouts={"pdf": RETRIEVAL_TIMEOUT, "web": WEB_SEARCH_TIMEOUT},
+                        fallbacks={"pdf": [], "web": []}
                     )
-                    top_pdf_chunks = results['documents'][0]
-                elif retrieval_method == "Sparse Only":
-                    sparse_results = sparse_search(query, st.session_state.chunks)
-                    top_pdf_chunks = [chunk for chunk, _ in sparse_results]
-                else:  # Hybrid
-                    top_pdf_chunks = hybrid_retrieval(
-                        query, 
-                        st.session_state.chunks, 
-                        st.session_state.collection,
-                        embedding_model
+                    top_pdf_chunks = [chunk for chunk, _ in results["pdf"]]
+                    pdf_scores = [score for _, score in results["pdf"]]
+                    web_results = results.get("web", [])
+                    
+                    # Score the snippets on the same scale as the chunks: with the
+                    # cross-encoder when reranking, otherwise by embedding similarity
+                    web_scores = relevance_scores(
+                        query,
+                        [result.get("snippet", "") for result in web_results],
+                        get_embedding_model(),
+                        use_cross_encoder=use_reranking
                     )
+                    
+                    for name, status in statuses.items():
+                        if status["status"] != "ok":
+                            log_error(f"{name}_branch_{status['status']}", status["error"], {"query_id": query_id})
+                            st.warning(f"⚠️ {'Web search' if name == 'web' else 'Document retrieval'} skipped: {status['error']}")
                 
-                # Apply reranking if enabled
-                if use_reranking and len(top_pdf_chunks) > 1:
-                    top_pdf_chunks = rerank_results(query, top_pdf_chunks)
-                
-                # Search the web if web results are requested
-                if web_results_count > 0:
-                    web_results = web_search_serper(query, web_results_count)
-                else:
-                    web_results = []
+                # Merge overlapping chunks, drop repeated passages and fit the
+                # rest into the prompt budget
+                top_pdf_chunks, web_results, packing = pack_context(
+                    top_pdf_chunks,
+                    web_results,
+                    token_budget=CONTEXT_TOKEN_BUDGET,
+                    pdf_scores=pdf_scores,
+                    web_scores=web_scores
+                )
+                log_span(query_id, "context_packing", packing["seconds"], attributes=packing)
                 
-                # Generate response
-                response = generate_response(
+                # Generate the response, showing it as it streams in
+                st.markdown("### Answer")
+                response = render_stream(generate_response_stream(
                     query, 
                     top_pdf_chunks, 
                     web_results,
                     temperature
-                )
-                
-                # Log the response
-                log_response(query_id, response)
-                
-                # Update session state
-                st.session_state.query_history.append(query)
-                st.session_state.response_history.append({
-                    "query": query,
-                    "response": response,
-                    "pdf_chunks": top_pdf_chunks,
-                    "web_results": web_results
-                })
+                ))
+                answer_rendered = True
+            
+            # Log the response
+            log_response(query_id, response)
+            
+            # Update session state
+            st.session_state.query_history.append(query)
+            st.session_state.response_history.append({
+                "query": query,
+                "response": response,
+                "pdf_chunks": top_pdf_chunks,
+                "web_results": web_results,
+                "packing": packing
+            })
         
         # Display the most recent response
         if st.session_state.response_history:
             latest = st.session_state.response_history[-1]
-            st.markdown("### Answer")
-            st.write(latest["response"])
+            if not answer_rendered:
+                st.markdown("### Answer")
+                st.write(latest["response"])
+            
+            packing = latest["packing"]
+            st.caption(
+                f"Context: {packing['original_tokens']} → {packing['packed_tokens']} tokens "
+                f"({packing['merged']} chunks merged, {packing['duplicates']} duplicates and "
+                f"{packing['over_budget']} over-budget passages dropped; "
+                f"~{max(0.0, packing['estimated_seconds_saved']):.2f}s prompt processing saved)"
+            )
             
             # Show sources
             with st.expander("View Sources"):
@@ -166,7 +326,7 @@ if uploaded_file:
                 for i, hist in enumerate(st.session_state.response_history):
                     st.markdown(f"**Query {i+1}:** {hist['query']}")
 else:
-    st.info("Please upload a PDF document to get started.")
+    st.info("Please upload a PDF document (or select one from the library) to get started.")
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,161 @@
+"""
+Tests for utils.page_fetcher against a local HTTP server.
+
+Run from the Research_Assistant directory:
+    python -m pytest tests
+"""
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.page_fetcher import fetch_page, fetch_main_text, fetch_pages, extract_main_text, MAX_CONNECTIONS_PER_HOST
+
+ARTICLE = """<html><head><title>Test page</title><style>p { color: red }</style></head>
+<body>
+<nav><a href="/">Home</a> <a href="/about">About us and our team</a></nav>
+<article>
+<header><h1>Attention is all you need</h1></header>
+<p>The transformer relies entirely on attention to draw global dependencies.</p>
+<script>var tracking = "should not appear in the text";</script>
+</article>
+<footer>Copyright notice for this example site</footer>
+</body></html>"""
+
+# ASP.NET WebForms pages wrap the whole body in a form
+FORM_PAGE = """<html><body><form method="post" action="./page.aspx">
+<div><p>The whole page content lives inside a single server-side form element.</p></div>
+</form></body></html>"""
+
+# /slow requests being served now, and the most served at once
+_active = {"now": 0, "max": 0}
+_active_lock = threading.Lock()
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body: bytes, content_type: str = "text/html; charset=utf-8"):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except OSError:
+            # The client stopped reading at its byte cap
+            pass
+
+    def do_GET(self):
+        if self.path == "/article":
+            self._send(ARTICLE.encode("utf-8"))
+        elif self.path == "/form":
+            self._send(FORM_PAGE.encode("utf-8"))
+        elif self.path == "/plain":
+            self._send(b"Plain text body", "text/plain")
+        elif self.path == "/binary":
+            self._send(b"%PDF-1.4 binary", "application/pdf")
+        elif self.path == "/large":
+            self._send(b"<p>" + b"word " * 1_000_000 + b"</p>")
+        elif self.path == "/stall":
+            # Headers arrive, the body never does
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", "100")
+            self.end_headers()
+            self.wfile.flush()
+            time.sleep(3)
+        elif self.path == "/trickle":
+            # Each byte arrives well within the read timeout, but the body never ends
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            try:
+                for _ in range(100):
+                    self.wfile.write(b"x")
+                    self.wfile.flush()
+                    time.sleep(0.1)
+            except OSError:
+                pass
+        elif self.path.startswith("/slow"):
+            with _active_lock:
+                _active["now"] += 1
+                _active["max"] = max(_active["max"], _active["now"])
+            time.sleep(0.3)
+            with _active_lock:
+                _active["now"] -= 1
+            self._send(f"<p>Slow page {self.path} with enough words to keep.</p>".encode("utf-8"))
+        else:
+            self.send_error(404)
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_extracts_article_text_without_page_furniture(server_url):
+    text = fetch_main_text(f"{server_url}/article")
+
+    assert "Attention is all you need" in text
+    assert "global dependencies" in text
+    assert "About us" not in text
+    assert "Copyright" not in text
+    assert "tracking" not in text
+
+
+def test_keeps_content_wrapped_in_a_form(server_url):
+    text = fetch_main_text(f"{server_url}/form")
+
+    assert text == "The whole page content lives inside a single server-side form element."
+
+
+def test_plain_text_is_kept_and_binary_content_skipped(server_url):
+    assert fetch_main_text(f"{server_url}/plain") == "Plain text body"
+    assert fetch_main_text(f"{server_url}/binary") is None
+    assert fetch_main_text(f"{server_url}/missing") is None
+
+
+def test_body_is_capped_at_max_bytes(server_url):
+    content_type, body = fetch_page(f"{server_url}/large", max_bytes=50_000)
+
+    assert content_type == "text/html"
+    assert len(body) == 50_000
+
+
+def test_read_timeout_gives_up_on_a_stalled_body(server_url):
+    start = time.monotonic()
+    page = fetch_page(f"{server_url}/stall", timeout=(1.0, 0.5))
+
+    assert page is None
+    assert time.monotonic() - start < 2.0
+
+
+def test_total_timeout_cuts_a_trickling_download(server_url):
+    start = time.monotonic()
+    content_type, body = fetch_page(f"{server_url}/trickle", timeout=(1.0, 1.0), total_timeout=1.0)
+
+    assert time.monotonic() - start < 1.5
+    assert 0 < len(body) < 20
+
+
+def test_concurrent_requests_per_host_are_limited(server_url):
+    urls = [f"{server_url}/slow/{i}" for i in range(6)]
+    texts = fetch_pages(urls, max_workers=6)
+
+    assert all(texts[url] for url in urls)
+    assert _active["max"] <= MAX_CONNECTIONS_PER_HOST
+
+
+def test_extract_main_text_prefers_article_over_the_rest_of_the_page():
+    html = "<div><p>Sidebar text with several words in it.</p></div><main><p>Main body with several words.</p></main>"
+
+    assert extract_main_text(html) == "Main body with several words."
@@ -3,18 +3,32 @@
 
 from . import pdf_processor
 from . import embeddings
+from . import numpy_index
 from . import vector_store
+from . import sparse_index
 from . import retrieval
+from . import page_fetcher
+from . import web_cache
 from . import web_search
+from . import pipeline
+from . import context_packer
 from . import response_generator
 from . import monitoring
+from . import tracing
 
 __all__ = [
     'pdf_processor',
     'embeddings',
+    'numpy_index',
     'vector_store',
+    'sparse_index',
     'retrieval',
+    'page_fetcher',
+    'web_cache',
     'web_search',
+    'pipeline',
+    'context_packer',
     'response_generator',
-    'monitoring'
+    'monitoring',
+    'tracing'
 ] 
\ No newline at end of file
@@ -0,0 +1,219 @@
+import re
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+# Default prompt budget for sources, well inside the model's 8k context
+CONTEXT_TOKEN_BUDGET = 3000
+
+# Minimum shared words for two chunks to be merged (chunk_text overlaps by 20)
+MIN_OVERLAP_WORDS = 5
+# Word-trigram similarity at which two passages count as near-duplicates
+DUPLICATE_THRESHOLD = 0.8
+
+# Rough prompt processing speed of the LLM, used to estimate the latency saved
+PREFILL_TOKENS_PER_SECOND = 2000.0
+
+# Tokenizer for counting prompt tokens, loaded on first use
+_encoding = None
+_encoding_loaded = False
+
+# Fallback token estimate: words and individual punctuation marks
+_TOKEN_ESTIMATE_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text.
+
+    Uses tiktoken's cl100k_base encoding when it is installed (close to the
+    Llama 3 tokenizer); otherwise estimates from words and punctuation.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Number of tokens
+    """
+    global _encoding, _encoding_loaded
+
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = None
+
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    words = _TOKEN_ESTIMATE_PATTERN.findall(text)
+    # Long words split into several tokens
+    return sum(1 + len(word) // 8 for word in words)
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text at a word boundary so it fits in ``max_tokens``"""
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:middle])) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low])
+
+def _overlap_length(first: List[str], second: List[str]) -> int:
+    """Number of words at the end of ``first`` that start ``second`` (longest match)"""
+    for length in range(min(len(first), len(second)), MIN_OVERLAP_WORDS - 1, -1):
+        if first[-length:] == second[:length]:
+            return length
+    return 0
+
+def _shingles(text: str) -> set:
+    words = text.lower().split()
+    if len(words) < 3:
+        return {tuple(words)}
+    return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+def merge_overlapping(passages: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Join passages whose text continues another one's.
+
+    Chunks from chunk_text share their boundary words with the next chunk, so
+    when both were retrieved the second is appended to the first without the
+    repeated words. A merged passage keeps the best score of its parts.
+
+    Args:
+        passages: Passages with "text" and "score"
+
+    Returns:
+        Tuple of (merged passages, number of merges)
+    """
+    passages = [dict(passage, words=passage["text"].split()) for passage in passages]
+    merges = 0
+    merged = True
+    while merged:
+        merged = False
+        for i, first in enumerate(passages):
+            for j, second in enumerate(passages):
+                if i == j:
+                    continue
+                length = _overlap_length(first["words"], second["words"])
+                if length:
+                    first["words"] = first["words"] + second["words"][length:]
+                    first["score"] = max(first["score"], second["score"])
+                    del passages[j]
+                    merges += 1
+                    merged = True
+                    break
+            if merged:
+                break
+
+    for passage in passages:
+        passage["text"] = " ".join(passage.pop("words"))
+    return passages, merges
+
+def drop_near_duplicates(passages: List[Dict[str, Any]],
+                         threshold: float = DUPLICATE_THRESHOLD) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Remove passages that repeat a better-scored passage.
+
+    Two passages are near-duplicates when most word trigrams of the shorter
+    one also occur in the other (so a snippet of a page counts too).
+
+    Args:
+        passages: Passages with "text" and "score"
+        threshold: Fraction of shared trigrams at which a passage is dropped
+
+    Returns:
+        Tuple of (kept passages, best first, and number dropped)
+    """
+    kept = []
+    kept_shingles = []
+    for passage in sorted(passages, key=lambda passage: -passage["score"]):
+        shingles = _shingles(passage["text"])
+        is_duplicate = any(
+            len(shingles & other) / max(1, min(len(shingles), len(other))) >= threshold
+            for other in kept_shingles
+        )
+        if not is_duplicate:
+            kept.append(passage)
+            kept_shingles.append(shingles)
+    return kept, len(passages) - len(kept)
+
+def pack_context(pdf_sources: List[str],
+                 web_sources: List[Dict[str, str]],
+                 token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 pdf_scores: Optional[List[float]] = None,
+                 web_scores: Optional[List[float]] = None) -> Tuple[List[str], List[Dict[str, str]], Dict[str, Any]]:
+    """
+    Fit PDF chunks and web results into a prompt token budget.
+
+    Overlapping PDF chunks are merged, near-duplicate passages are dropped, and
+    the remaining passages are added best first until the budget is used up;
+    the best passage is truncated rather than dropped if it alone is too long.
+    PDF and web passages compete on their relevance scores, which should share
+    a 0-1 scale (see retrieval.unit_scores); a list without scores is ranked by
+    reciprocal rank instead.
+
+    Args:
+        pdf_sources: PDF text chunks, best first
+        web_sources: Web search results, best first (their snippets are packed)
+        token_budget: Maximum number of source tokens
+        pdf_scores: Scores of the PDF chunks on a 0-1 scale (if None, from their order)
+        web_scores: Scores of the web snippets on the same scale (if None, from their order)
+
+    Returns:
+        Tuple of (packed PDF passages, packed web results, statistics with
+        original_tokens, packed_tokens, saved_tokens, merged, duplicates,
+        over_budget, seconds and estimated_seconds_saved)
+    """
+    start = time.perf_counter()
+
+    passages = []
+    for rank, text in enumerate(pdf_sources):
+        score = pdf_scores[rank] if pdf_scores is not None else 1.0 / (rank + 1)
+        passages.append({"text": text, "score": score, "source": "pdf", "order": rank})
+    web_passages = []
+    for rank, result in enumerate(web_sources):
+        score = web_scores[rank] if web_scores is not None else 1.0 / (rank + 1)
+        web_passages.append({"text": result.get("snippet", ""), "score": score, "source": "web", "order": rank, "result": result})
+
+    original_tokens = sum(count_tokens(passage["text"]) for passage in passages + web_passages)
+
+    # Only PDF chunks overlap by construction; web results are deduplicated only
+    passages, merged = merge_overlapping(passages)
+    candidates, duplicates = drop_near_duplicates(passages + web_passages)
+
+    packed = []
+    used = 0
+    for passage in candidates:
+        tokens = count_tokens(passage["text"])
+        if used + tokens > token_budget:
+            if packed or token_budget - used <= 0:
+                continue
+            passage = dict(passage, text=_truncate_to_tokens(passage["text"], token_budget - used))
+            tokens = count_tokens(passage["text"])
+        packed.append(passage)
+        used += tokens
+
+    # Present the passages in their original order within each source
+    packed.sort(key=lambda passage: (passage["source"] != "pdf", passage["order"]))
+    packed_pdf = [passage["text"] for passage in packed if passage["source"] == "pdf"]
+    packed_web = []
+    for passage in packed:
+        if passage["source"] == "web":
+            packed_web.append(dict(passage["result"], snippet=passage["text"]))
+
+    seconds = time.perf_counter() - start
+    saved_tokens = original_tokens - used
+    stats = {
+        "original_tokens": original_tokens,
+        "packed_tokens": used,
+        "saved_tokens": saved_tokens,
+        "merged": merged,
+        "duplicates": duplicates,
+        "over_budget": len(candidates) - len(packed),
+        "seconds": seconds,
+        "estimated_seconds_saved": saved_tokens / PREFILL_TOKENS_PER_SECOND - seconds
+    }
+    return packed_pdf, packed_web, stats
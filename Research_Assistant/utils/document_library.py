@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import chromadb
+import numpy as np
+from typing import List, Dict, Any, Optional, Iterable, Union
+from sentence_transformers import SentenceTransformer
+from .sparse_index import SparseIndex
+from .vector_store import chunk_record
+from .numpy_index import NumpyVectorIndex
+from .tracing import span
+
+def content_hash(data: bytes) -> str:
+    """
+    Compute the content hash that identifies a PDF in the library.
+
+    Args:
+        data: Raw file contents
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    return hashlib.sha256(data).hexdigest()
+
+class DocumentLibrary:
+    """
+    Persistent, content-addressed store of processed PDFs.
+
+    Each PDF is keyed by the SHA-256 of its bytes, so uploading a file that was
+    processed before (under any name) loads instantly. Chunk texts are appended to
+    ``chunks.jsonl``, embeddings live in a persistent Chroma collection and one
+    library-wide sparse index is saved next to them. Chunks are numbered by a
+    library-wide position and stored under collision-free ids
+    ``{hash[:16]}_{i}``. The manifest is written last and is the commit point:
+    an add that fails removes what it stored, and data left by an interrupted
+    add is dropped on the next load.
+
+    With ``backend="numpy"`` the embeddings are kept in a memory-mapped
+    NumpyVectorIndex under ``vectors/`` instead of Chroma.
+
+    Use one instance per library directory (the app shares it across sessions):
+    adds are serialized by an instance lock, and separate instances over the
+    same directory would assign overlapping positions and overwrite each
+    other's manifest.
+    """
+
+    def __init__(self, library_dir: str = "library", collection_name: str = "pdf_library", backend: str = "chroma"):
+        os.makedirs(library_dir, exist_ok=True)
+        self.library_dir = library_dir
+        self._manifest_path = os.path.join(library_dir, "manifest.json")
+        self._chunks_path = os.path.join(library_dir, "chunks.jsonl")
+        self._sparse_path = os.path.join(library_dir, "sparse_index")
+
+        self.backend = backend
+        if backend == "numpy":
+            self.client = None
+            self.collection = NumpyVectorIndex(collection_name, path=os.path.join(library_dir, "vectors"))
+        elif backend == "chroma":
+            self.client = chromadb.PersistentClient(path=os.path.join(library_dir, "chroma"))
+            self.collection = self.client.get_or_create_collection(collection_name)
+        else:
+            raise ValueError(f"Unknown vector backend: {backend}")
+
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, "r") as f:
+                self.documents = json.load(f)
+
+        self.chunks = self._load_chunks()
+        self._drop_uncommitted_vectors()
+        self.sparse_index = self._load_sparse_index()
+
+        # Serializes add_document, which appends positions, chunks and manifest entries
+        self._write_lock = threading.Lock()
+
+    def _committed_chunk_count(self) -> int:
+        return sum(document["chunk_count"] for document in self.documents.values())
+
+    def _load_chunks(self) -> List[str]:
+        """Read the committed chunk texts, dropping any tail from an interrupted add"""
+        committed = self._committed_chunk_count()
+        chunks = []
+        if os.path.exists(self._chunks_path):
+            with open(self._chunks_path, "r") as f:
+                for line in f:
+                    if len(chunks) == committed:
+                        break
+                    chunks.append(json.loads(line)["text"])
+        if len(chunks) != committed:
+            raise ValueError(f"Library chunk file has {len(chunks)} of {committed} committed chunks")
+
+        # Rewrite the file without the uncommitted tail so new chunks append in order
+        if os.path.exists(self._chunks_path) and os.path.getsize(self._chunks_path) > 0:
+            self._truncate_chunks(committed)
+        return chunks
+
+    def _truncate_chunks(self, count: int) -> None:
+        """Cut ``chunks.jsonl`` back to its first ``count`` lines"""
+        with open(self._chunks_path, "r+") as f:
+            for _ in range(count):
+                f.readline()
+            f.truncate(f.tell())
+
+    def _drop_uncommitted_vectors(self) -> None:
+        """Delete vectors stored by an add that never reached the manifest"""
+        if self.collection.count() <= len(self.chunks):
+            return
+        stored = self.collection.get(include=["metadatas"])
+        orphans = []
+        for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+            entry = self.documents.get((metadata or {}).get("document"))
+            if entry is None or not 0 <= metadata["position"] - entry["position_start"] < entry["chunk_count"]:
+                orphans.append(chunk_id)
+        if orphans:
+            self.collection.delete(ids=orphans)
+
+    def _load_sparse_index(self) -> SparseIndex:
+        """Load the saved sparse index, rebuilding it if it is missing or out of date"""
+        try:
+            return SparseIndex.load(self._sparse_path, self.chunks)
+        except (OSError, ValueError):
+            index = SparseIndex()
+            index.add(self.chunks)
+            if self.chunks:
+                index.save(self._sparse_path)
+            return index
+
+    def has_document(self, document_hash: str) -> bool:
+        """
+        Check whether a PDF has already been processed.
+
+        Args:
+            document_hash: Content hash of the PDF
+
+        Returns:
+            True if the PDF is in the library
+        """
+        return document_hash in self.documents
+
+    def add_document(self,
+                     document_hash: str,
+                     name: str,
+                     chunks: Iterable[Union[str, Dict[str, Any]]],
+                     embedding_model: SentenceTransformer,
+                     batch_size: int = 100) -> Dict[str, Any]:
+        """
+        Embed and store the chunks of a new PDF.
+
+        Chunks are consumed lazily and stored batch by batch, so passing
+        pdf_processor.iter_chunks overlaps embedding with extraction.
+
+        Args:
+            document_hash: Content hash of the PDF
+            name: Display name (the uploaded file name)
+            chunks: Text chunks of the PDF, or chunk dictionaries with page spans, in order
+            embedding_model: SentenceTransformer model for embeddings
+            batch_size: Number of chunks embedded and stored at once
+
+        Returns:
+            Manifest entry of the document
+        """
+        with self._write_lock:
+            # Another session may have added the same PDF while this one waited
+            if self.has_document(document_hash):
+                return self.documents[document_hash]
+            return self._add_document(document_hash, name, chunks, embedding_model, batch_size)
+
+    def _add_document(self,
+                      document_hash: str,
+                      name: str,
+                      chunks: Iterable[Union[str, Dict[str, Any]]],
+                      embedding_model: SentenceTransformer,
+                      batch_size: int) -> Dict[str, Any]:
+        """Store a new PDF; called with the write lock held"""
+        start = len(self.chunks)
+        document_chunks = []
+        batch = []
+
+        def flush():
+            offset = len(document_chunks) - len(batch)
+            texts = [text for text, _ in batch]
+            with span("embedding", chunks=len(texts)):
+                embeddings = embedding_model.encode(texts).tolist()
+            self.collection.upsert(
+                ids=[f"{document_hash[:16]}_{offset + j}" for j in range(len(batch))],
+                documents=texts,
+                embeddings=embeddings,
+                metadatas=[
+                    dict(metadata, position=start + offset + j, document=document_hash, source=name)
+                    for j, (_, metadata) in enumerate(batch)
+                ]
+            )
+            with open(self._chunks_path, "a") as f:
+                for text, metadata in batch:
+                    f.write(json.dumps(dict(metadata, document=document_hash, text=text)) + "\n")
+            batch.clear()
+
+        try:
+            for chunk in chunks:
+                text, metadata = chunk_record(chunk)
+                document_chunks.append(text)
+                batch.append((text, metadata))
+                if len(batch) >= batch_size:
+                    flush()
+            if batch:
+                flush()
+        except Exception:
+            # Extraction or embedding failed partway: remove the batches already
+            # stored, so their positions cannot shadow the next document's
+            if document_chunks:
+                self.collection.delete(ids=[f"{document_hash[:16]}_{i}" for i in range(len(document_chunks))])
+            if os.path.exists(self._chunks_path):
+                self._truncate_chunks(start)
+            raise
+
+        self.chunks.extend(document_chunks)
+        self.sparse_index.add(document_chunks)
+        self.sparse_index.save(self._sparse_path)
+
+        entry = {
+            "name": name,
+            "position_start": start,
+            "chunk_count": len(document_chunks),
+            "added_at": time.time()
+        }
+        # Replace rather than mutate, so sessions listing documents never see the dict change
+        self.documents = dict(self.documents, **{document_hash: entry})
+        self._save_manifest()
+        return entry
+
+    def _save_manifest(self) -> None:
+        """Atomically write the manifest"""
+        tmp_path = f"{self._manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.documents, f)
+        os.replace(tmp_path, self._manifest_path)
+
+    def list_documents(self) -> List[Dict[str, Any]]:
+        """
+        List the documents in the library.
+
+        Returns:
+            List of manifest entries with their "hash", oldest first
+        """
+        documents = [dict(entry, hash=document_hash) for document_hash, entry in self.documents.items()]
+        return sorted(documents, key=lambda document: document["position_start"])
+
+    def position_mask(self, document_hashes: List[str]) -> np.ndarray:
+        """
+        Select the chunk positions that belong to some documents.
+
+        Args:
+            document_hashes: Content hashes of the documents to select
+
+        Returns:
+            Boolean array over all library chunk positions
+        """
+        mask = np.zeros(len(self.chunks), dtype=bool)
+        for document_hash in document_hashes:
+            entry = self.documents[document_hash]
+            mask[entry["position_start"]:entry["position_start"] + entry["chunk_count"]] = True
+        return mask
+
+    def where_filter(self, document_hashes: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Build a Chroma filter restricting a query to some documents.
+
+        Args:
+            document_hashes: Content hashes of the documents to search
+
+        Returns:
+            Chroma where filter, or None when every document is selected
+        """
+        if len(document_hashes) == len(self.documents):
+            return None
+        return {"document": {"$in": list(document_hashes)}}
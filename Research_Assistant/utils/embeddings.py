@@ -66,32 +66,37 @@ def cosine_similarity(embedding1: List[float], embedding2: List[float]) -> float
     
     return dot_product / (norm1 * norm2)
 
-def batch_cosine_similarity(query_embedding: List[float], 
-                           document_embeddings: List[List[float]]) -> List[float]:
+def batch_cosine_similarity(query_embedding: Union[List[float], np.ndarray], 
+                           document_embeddings: Union[List[List[float]], np.ndarray],
+                           normalized: bool = False) -> List[float]:
     """
     Calculate cosine similarity between a query embedding and multiple document embeddings.
     
+    Arrays are used as they are (float32 stays float32), and with ``normalized``
+    the document norms are not recomputed, e.g. for NumpyVectorIndex.vectors.
+    
     Args:
         query_embedding: Query embedding
-        document_embeddings: List of document embeddings
+        document_embeddings: List or matrix of document embeddings
+        normalized: Whether the document embeddings already have unit length
         
     Returns:
         List of similarity scores
     """
-    query_vec = np.array(query_embedding)
-    doc_vecs = np.array(document_embeddings)
-    
-    # Calculate dot products
-    dot_products = np.dot(doc_vecs, query_vec)
+    query_vec = np.asarray(query_embedding)
+    doc_vecs = np.asarray(document_embeddings)
+    if len(doc_vecs) == 0:
+        return []
     
-    # Calculate norms
+    # Normalize the query once instead of every document product
     query_norm = np.linalg.norm(query_vec)
-    doc_norms = np.linalg.norm(doc_vecs, axis=1)
-    
-    # Calculate similarities
-    similarities = dot_products / (doc_norms * query_norm)
+    if query_norm == 0:
+        return [0.0] * len(doc_vecs)
+    similarities = doc_vecs @ (query_vec / query_norm)
     
-    # Replace NaN values with 0
-    similarities = np.nan_to_num(similarities)
+    if not normalized:
+        # Zero-length documents get similarity 0
+        doc_norms = np.sqrt(np.einsum("ij,ij->i", doc_vecs, doc_vecs))
+        similarities = np.divide(similarities, doc_norms, out=np.zeros_like(similarities), where=doc_norms > 0)
     
     return similarities.tolist() 
\ No newline at end of file
@@ -2,21 +2,253 @@ import os
 import json
 import time
 import uuid
-from typing import Dict, Any, List, Optional
+import queue
+import atexit
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional, Tuple
 import datetime
 
 # Directory for logs
 LOG_DIR = "logs"
 
+# Background writer settings: records are written in batches of up to
+# BATCH_SIZE, at least every FLUSH_INTERVAL seconds
+BATCH_SIZE = 100
+FLUSH_INTERVAL = 1.0
+
+# Queued by LogWriter.flush to make the writer write its batch immediately
+_FLUSH = object()
+
+# JSONL logs are rotated to ``<name>.1`` ... ``<name>.<BACKUP_COUNT>`` once they reach MAX_LOG_BYTES
+MAX_LOG_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+
+# Quality metrics aggregated by get_response_metrics
+METRIC_KEYS = ["relevance", "completeness", "citation_quality", "overall"]
+
+# Most recent spans per stage used for latency percentiles
+LATENCY_WINDOW = 1000
+
+# Cache counters for this process, keyed by cache kind ("search", "page")
+_cache_stats: Dict[str, Dict[str, float]] = {}
+_cache_stats_lock = threading.Lock()
+
+_writer = None
+_writer_lock = threading.Lock()
+
 def ensure_log_dir():
     """Ensure log directory exists"""
     if not os.path.exists(LOG_DIR):
         os.makedirs(LOG_DIR)
 
+class LogWriter:
+    """
+    Background writer for the monitoring logs.
+
+    Records are queued by the logging functions and written by one thread in
+    batches: appended to rotating JSONL files (``queries``, ``responses``,
+    ``errors``, ``spans``) and, for all but errors, inserted into a SQLite
+    analytics store in the same pass. The store indexes queries by time and
+    spans by stage, and keeps daily rollups of response metrics, so history,
+    metric and latency lookups do not rescan the logs.
+    """
+
+    def __init__(self, log_dir: str = LOG_DIR):
+        self.log_dir = log_dir
+        os.makedirs(log_dir, exist_ok=True)
+
+        self._queue = queue.Queue()
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(log_dir, "analytics.sqlite3"), check_same_thread=False)
+        self._create_tables()
+
+        self._thread = threading.Thread(target=self._run, name="monitoring-writer", daemon=True)
+        self._thread.start()
+
+    def _create_tables(self) -> None:
+        """Create the analytics tables, importing existing JSONL logs into a new store"""
+        with self._db_lock:
+            is_new = self._db.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'queries'"
+            ).fetchone() is None
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS queries (
+                    id TEXT PRIMARY KEY,
+                    timestamp TEXT NOT NULL,
+                    entry TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS queries_timestamp ON queries (timestamp);
+                CREATE TABLE IF NOT EXISTS responses (
+                    query_id TEXT,
+                    timestamp TEXT NOT NULL,
+                    relevance REAL, completeness REAL, citation_quality REAL, overall REAL
+                );
+                CREATE INDEX IF NOT EXISTS responses_timestamp ON responses (timestamp);
+                CREATE TABLE IF NOT EXISTS response_daily (
+                    day TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL,
+                    relevance REAL, completeness REAL, citation_quality REAL, overall REAL
+                );
+                CREATE TABLE IF NOT EXISTS spans (
+                    trace_id TEXT,
+                    stage TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    duration_ms REAL NOT NULL,
+                    status TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS spans_stage_timestamp ON spans (stage, timestamp);
+                CREATE TABLE IF NOT EXISTS span_stages (stage TEXT PRIMARY KEY);
+            """)
+            self._db.commit()
+
+        if is_new:
+            for stream in ("queries", "responses"):
+                path = os.path.join(self.log_dir, f"{stream}.jsonl")
+                if os.path.exists(path):
+                    with open(path, "r") as f:
+                        entries = [json.loads(line) for line in f if line.strip()]
+                    self._index([(stream, entry) for entry in entries])
+
+    def write(self, stream: str, entry: Dict[str, Any]) -> None:
+        """
+        Queue a record for writing.
+
+        Args:
+            stream: Log name ("queries", "responses" or "errors")
+            entry: JSON-serializable record
+
+        Returns:
+            None
+        """
+        self._queue.put((stream, entry))
+
+    def flush(self) -> None:
+        """Write every queued record now and block until it is written"""
+        # The marker ends the batch being collected instead of waiting out FLUSH_INTERVAL
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = [] if item is _FLUSH else [item]
+            markers = 1 if item is _FLUSH else 0
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while not markers and len(batch) < BATCH_SIZE:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _FLUSH:
+                    markers += 1
+                else:
+                    batch.append(item)
+            try:
+                if batch:
+                    self._write_batch(batch)
+            except Exception as e:
+                print(f"❌ Error writing monitoring logs: {str(e)}")
+            finally:
+                for _ in range(len(batch) + markers):
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+        lines = {}
+        for stream, entry in batch:
+            lines.setdefault(stream, []).append(json.dumps(entry) + "\n")
+        for stream, stream_lines in lines.items():
+            path = os.path.join(self.log_dir, f"{stream}.jsonl")
+            self._rotate_if_full(path)
+            with open(path, "a") as f:
+                f.writelines(stream_lines)
+
+        self._index(batch)
+
+    def _rotate_if_full(self, path: str) -> None:
+        """Shift ``path`` to ``path.1`` (and older backups up by one) once it reaches MAX_LOG_BYTES"""
+        if not os.path.exists(path) or os.path.getsize(path) < MAX_LOG_BYTES:
+            return
+        for i in range(BACKUP_COUNT - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        os.replace(path, f"{path}.1")
+
+    def _index(self, batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Insert query, response and span records into the analytics store"""
+        with self._db_lock:
+            for stream, entry in batch:
+                if stream == "queries":
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO queries VALUES (?, ?, ?)",
+                        (entry["id"], entry["timestamp"], json.dumps(entry))
+                    )
+                elif stream == "responses":
+                    metrics = entry.get("metrics") or {}
+                    values = [metrics.get(key, 0.0) for key in METRIC_KEYS]
+                    self._db.execute(
+                        "INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                        [entry["query_id"], entry["timestamp"]] + values
+                    )
+                    self._db.execute(
+                        """
+                        INSERT INTO response_daily VALUES (?, 1, ?, ?, ?, ?)
+                        ON CONFLICT (day) DO UPDATE SET
+                            count = count + 1,
+                            relevance = relevance + excluded.relevance,
+                            completeness = completeness + excluded.completeness,
+                            citation_quality = citation_quality + excluded.citation_quality,
+                            overall = overall + excluded.overall
+                        """,
+                        [entry["timestamp"][:10]] + values
+                    )
+                elif stream == "spans":
+                    self._db.execute(
+                        "INSERT INTO spans VALUES (?, ?, ?, ?, ?)",
+                        (entry["trace_id"], entry["stage"], entry["timestamp"], entry["duration_ms"], entry["status"])
+                    )
+                    self._db.execute("INSERT OR IGNORE INTO span_stages VALUES (?)", (entry["stage"],))
+            self._db.commit()
+
+    def query(self, sql: str, parameters: tuple = ()) -> List[tuple]:
+        """
+        Read from the analytics store.
+
+        Reads do not wait for the writer, so records queued within the last
+        FLUSH_INTERVAL may be missing; call ``flush`` first where that matters.
+
+        Args:
+            sql: SELECT statement
+            parameters: Statement parameters
+
+        Returns:
+            Result rows
+        """
+        with self._db_lock:
+            return self._db.execute(sql, parameters).fetchall()
+
+def get_writer() -> LogWriter:
+    """
+    Get or start the shared log writer.
+
+    Returns:
+        LogWriter for ``LOG_DIR``
+    """
+    global _writer
+
+    with _writer_lock:
+        if _writer is None:
+            _writer = LogWriter(LOG_DIR)
+            atexit.register(_writer.flush)
+
+    return _writer
+
 def log_query(query: str, document_name: Optional[str] = None) -> str:
     """
     Log a user query.
     
+    The record is written in the background by the shared LogWriter.
+    
     Args:
         query: User query
         document_name: Name of the document being queried
@@ -24,8 +256,6 @@ def log_query(query: str, document_name: Optional[str] = None) -> str:
     Returns:
         Query ID
     """
-    ensure_log_dir()
-    
     # Generate query ID
     query_id = str(uuid.uuid4())
     
@@ -37,9 +267,7 @@ def log_query(query: str, document_name: Optional[str] = None) -> str:
         "document": document_name
     }
     
-    # Write to log file
-    with open(os.path.join(LOG_DIR, "queries.jsonl"), "a") as f:
-        f.write(json.dumps(log_entry) + "\n")
+    get_writer().write("queries", log_entry)
     
     return query_id
 
@@ -55,8 +283,6 @@ def log_response(query_id: str, response: str, metrics: Optional[Dict[str, float
     Returns:
         None
     """
-    ensure_log_dir()
-    
     # Create log entry
     log_entry = {
         "query_id": query_id,
@@ -65,9 +291,7 @@ def log_response(query_id: str, response: str, metrics: Optional[Dict[str, float
         "metrics": metrics or {}
     }
     
-    # Write to log file
-    with open(os.path.join(LOG_DIR, "responses.jsonl"), "a") as f:
-        f.write(json.dumps(log_entry) + "\n")
+    get_writer().write("responses", log_entry)
 
 def log_error(error_type: str, message: str, details: Optional[Dict[str, Any]] = None) -> None:
     """
@@ -81,8 +305,6 @@ def log_error(error_type: str, message: str, details: Optional[Dict[str, Any]] =
     Returns:
         None
     """
-    ensure_log_dir()
-    
     # Create log entry
     log_entry = {
         "timestamp": datetime.datetime.now().isoformat(),
@@ -91,9 +313,70 @@ def log_error(error_type: str, message: str, details: Optional[Dict[str, Any]] =
         "details": details or {}
     }
     
-    # Write to log file
-    with open(os.path.join(LOG_DIR, "errors.jsonl"), "a") as f:
-        f.write(json.dumps(log_entry) + "\n")
+    get_writer().write("errors", log_entry)
+
+def log_span(trace_id: Optional[str],
+             stage: str,
+             seconds: float,
+             status: str = "ok",
+             attributes: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Log the duration of one pipeline stage (see utils.tracing).
+    
+    Args:
+        trace_id: Query or document the stage ran for
+        stage: Stage name
+        seconds: Duration of the stage
+        status: "ok" or "error"
+        attributes: Additional span details
+        
+    Returns:
+        None
+    """
+    log_entry = {
+        "trace_id": trace_id,
+        "timestamp": datetime.datetime.now().isoformat(),
+        "stage": stage,
+        "duration_ms": seconds * 1000.0,
+        "status": status,
+        "attributes": attributes or {}
+    }
+    
+    get_writer().write("spans", log_entry)
+
+def get_stage_latency(window: int = LATENCY_WINDOW) -> Dict[str, Dict[str, float]]:
+    """
+    Get latency percentiles for each pipeline stage.
+    
+    Args:
+        window: Number of most recent spans per stage to summarize
+        
+    Returns:
+        Dictionary mapping stage to its span count, p50_ms, p95_ms and mean_ms
+    """
+    writer = get_writer()
+    stages = [stage for stage, in writer.query("SELECT stage FROM span_stages")]
+    
+    latency = {}
+    for stage in stages:
+        durations = sorted(duration for duration, in writer.query(
+            "SELECT duration_ms FROM spans WHERE stage = ? ORDER BY timestamp DESC LIMIT ?", (stage, window)
+        ))
+        latency[stage] = {
+            "count": len(durations),
+            "p50_ms": _percentile(durations, 50),
+            "p95_ms": _percentile(durations, 95),
+            "mean_ms": sum(durations) / len(durations)
+        }
+    
+    return latency
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    """Linearly interpolated percentile of sorted values"""
+    position = (len(sorted_values) - 1) * percentile / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
 
 def get_query_history(limit: int = 10) -> List[Dict[str, Any]]:
     """
@@ -105,63 +388,76 @@ def get_query_history(limit: int = 10) -> List[Dict[str, Any]]:
     Returns:
         List of query log entries
     """
-    ensure_log_dir()
-    
-    queries = []
-    query_file = os.path.join(LOG_DIR, "queries.jsonl")
-    
-    if os.path.exists(query_file):
-        with open(query_file, "r") as f:
-            for line in f:
-                queries.append(json.loads(line))
-    
-    # Sort by timestamp (newest first) and limit
-    queries.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-    return queries[:limit]
+    rows = get_writer().query(
+        "SELECT entry FROM queries ORDER BY timestamp DESC LIMIT ?", (limit,)
+    )
+    return [json.loads(entry) for entry, in rows]
 
 def get_response_metrics(days: int = 7) -> Dict[str, float]:
     """
     Get aggregated response metrics for a time period.
     
+    Whole days come from the daily rollups; only the day the period starts on
+    is summed from individual responses.
+    
     Args:
         days: Number of days to look back
         
     Returns:
         Dictionary with aggregated metrics
     """
-    ensure_log_dir()
-    
     # Calculate cutoff timestamp
     cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
     cutoff_str = cutoff.isoformat()
+    next_day = (cutoff.date() + datetime.timedelta(days=1)).isoformat()
     
-    responses = []
-    response_file = os.path.join(LOG_DIR, "responses.jsonl")
-    
-    if os.path.exists(response_file):
-        with open(response_file, "r") as f:
-            for line in f:
-                response = json.loads(line)
-                if response.get("timestamp", "") >= cutoff_str:
-                    responses.append(response)
+    columns = ", ".join(f"COALESCE(SUM({key}), 0)" for key in METRIC_KEYS)
+    writer = get_writer()
+    full_days = writer.query(
+        f"SELECT COALESCE(SUM(count), 0), {columns} FROM response_daily WHERE day >= ?", (next_day,)
+    )[0]
+    first_day = writer.query(
+        f"SELECT COUNT(*), {columns} FROM responses WHERE timestamp >= ? AND timestamp < ?", (cutoff_str, next_day)
+    )[0]
+    totals = [a + b for a, b in zip(full_days, first_day)]
     
     # Calculate aggregate metrics
-    metrics = {
-        "count": len(responses),
-        "relevance": 0.0,
-        "completeness": 0.0,
-        "citation_quality": 0.0,
-        "overall": 0.0
-    }
+    metrics = {"count": totals[0]}
+    for key, total in zip(METRIC_KEYS, totals[1:]):
+        metrics[key] = total / metrics["count"] if metrics["count"] > 0 else 0.0
+    
+    return metrics
+
+def record_cache_event(kind: str, event: str, saved_seconds: float = 0.0) -> None:
+    """
+    Count a web cache lookup.
     
-    if responses:
-        for response in responses:
-            response_metrics = response.get("metrics", {})
-            for key in ["relevance", "completeness", "citation_quality", "overall"]:
-                metrics[key] += response_metrics.get(key, 0.0)
+    Args:
+        kind: Cache kind ("search" or "page")
+        event: "hit", "stale_hit" or "miss"
+        saved_seconds: Latency avoided by serving from the cache
         
-        # Calculate averages
-        for key in ["relevance", "completeness", "citation_quality", "overall"]:
-            metrics[key] /= metrics["count"] if metrics["count"] > 0 else 1
+    Returns:
+        None
+    """
+    with _cache_stats_lock:
+        stats = _cache_stats.setdefault(kind, {"hit": 0, "stale_hit": 0, "miss": 0, "saved_seconds": 0.0})
+        stats[event] += 1
+        stats["saved_seconds"] += saved_seconds
+
+def get_cache_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Get web cache counters since the process started.
+    
+    Returns:
+        Dictionary mapping cache kind to its hit, stale_hit and miss counts,
+        hit_rate and total saved_seconds
+    """
+    with _cache_stats_lock:
+        stats = {kind: dict(counters) for kind, counters in _cache_stats.items()}
+    
+    for counters in stats.values():
+        lookups = counters["hit"] + counters["stale_hit"] + counters["miss"]
+        counters["hit_rate"] = (counters["hit"] + counters["stale_hit"]) / lookups if lookups else 0.0
     
-    return metrics 
\ No newline at end of file
+    return stats
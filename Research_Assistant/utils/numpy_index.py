@@ -0,0 +1,387 @@
+import os
+import json
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+
+# Rows allocated when an index is created; capacity doubles as it fills
+INITIAL_CAPACITY = 1024
+
+class NumpyVectorIndex:
+    """
+    In-process exact vector index over a contiguous float32 matrix.
+
+    Vectors are normalized when added, so a query is one matrix-vector product
+    followed by an ``argpartition`` top-k. Rows are appended into spare
+    capacity (doubling when full). With a ``path`` the matrix is a memory-mapped
+    file and ids, documents and metadata are appended to a JSONL log next to
+    it, so the index reopens without loading or re-embedding anything.
+
+    The methods used by this app (``add``, ``upsert``, ``query``, ``get``,
+    ``delete``, ``count``) follow the Chroma collection API, including squared
+    L2 distances in query results and ``where`` filters on metadata equality
+    and ``$in``, so the index can stand in for a Chroma collection.
+    """
+
+    def __init__(self, name: str, path: Optional[str] = None, capacity: int = INITIAL_CAPACITY):
+        self.name = name
+        self.path = path
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self._initial_capacity = capacity
+        self._vectors = None
+        # Metadata values as arrays, built on first use by a where filter
+        self._columns: Dict[str, np.ndarray] = {}
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._vectors_path = os.path.join(path, f"{name}.f32")
+            self._records_path = os.path.join(path, f"{name}.jsonl")
+            self._meta_path = os.path.join(path, f"{name}.json")
+            if os.path.exists(self._meta_path):
+                self._open()
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return None if self._vectors is None else self._vectors.shape[1]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Normalized vectors of the stored rows (a view, not a copy)"""
+        if self._vectors is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._vectors[:len(self.ids)]
+
+    def count(self) -> int:
+        """
+        Get the number of stored vectors.
+
+        Returns:
+            Number of rows
+        """
+        return len(self.ids)
+
+    def _open(self) -> None:
+        """Reopen a persisted index"""
+        with open(self._meta_path, "r") as f:
+            dimension = json.load(f)["dimension"]
+        capacity = os.path.getsize(self._vectors_path) // (4 * dimension)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dimension))
+
+        if not os.path.exists(self._records_path):
+            return
+        with open(self._records_path, "r") as f:
+            for line in f:
+                record = json.loads(line)
+                row = record["row"]
+                if row == len(self.ids):
+                    self.ids.append(record["id"])
+                    self.documents.append(record["document"])
+                    self.metadatas.append(record["metadata"])
+                else:
+                    # A later upsert of an existing row
+                    del self._rows[self.ids[row]]
+                    self.ids[row] = record["id"]
+                    self.documents[row] = record["document"]
+                    self.metadatas[row] = record["metadata"]
+                self._rows[record["id"]] = row
+
+    def _allocate(self, dimension: int, capacity: int) -> None:
+        """Create or grow the vector matrix to ``capacity`` rows"""
+        count = len(self.ids)
+        if self.path:
+            if self._vectors is None:
+                with open(self._meta_path, "w") as f:
+                    json.dump({"dimension": dimension}, f)
+            else:
+                self._vectors.flush()
+                del self._vectors
+            # Extending the file keeps the existing rows in place
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(capacity * dimension * 4)
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dimension))
+        else:
+            vectors = np.empty((capacity, dimension), dtype=np.float32)
+            if self._vectors is not None:
+                vectors[:count] = self._vectors[:count]
+            self._vectors = vectors
+
+    def upsert(self,
+               ids: List[str],
+               embeddings: List[List[float]],
+               documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Add vectors, replacing those whose id is already stored.
+
+        Args:
+            ids: Unique ids of the vectors
+            embeddings: Vectors to store (normalized on the way in)
+            documents: Text stored with each vector
+            metadatas: Metadata stored with each vector
+
+        Returns:
+            None
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("Expected one embedding per id")
+        if self._vectors is None:
+            self._allocate(vectors.shape[1], max(self._initial_capacity, len(ids)))
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dimension}")
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+        documents = documents or [""] * len(ids)
+        metadatas = metadatas or [{} for _ in ids]
+
+        # Existing ids keep their row; new ids are appended
+        rows = []
+        new_count = len(self.ids)
+        for chunk_id in ids:
+            if chunk_id in self._rows:
+                rows.append(self._rows[chunk_id])
+            else:
+                self._rows[chunk_id] = new_count
+                rows.append(new_count)
+                new_count += 1
+
+        if new_count > len(self._vectors):
+            capacity = len(self._vectors)
+            while capacity < new_count:
+                capacity *= 2
+            self._allocate(self.dimension, capacity)
+
+        self._vectors[rows] = vectors
+        records = []
+        for row, chunk_id, document, metadata in zip(rows, ids, documents, metadatas):
+            if row == len(self.ids):
+                self.ids.append(chunk_id)
+                self.documents.append(document)
+                self.metadatas.append(metadata)
+            else:
+                self.documents[row] = document
+                self.metadatas[row] = metadata
+            records.append(json.dumps({"row": row, "id": chunk_id, "document": document, "metadata": metadata}))
+        self._columns = {}
+
+        if self.path:
+            self._vectors.flush()
+            with open(self._records_path, "a") as f:
+                f.write("\n".join(records) + "\n")
+
+    def add(self,
+            ids: List[str],
+            embeddings: List[List[float]],
+            documents: Optional[List[str]] = None,
+            metadatas: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Add new vectors.
+
+        Args:
+            ids: Unique ids of the vectors (must not be stored yet)
+            embeddings: Vectors to store (normalized on the way in)
+            documents: Text stored with each vector
+            metadatas: Metadata stored with each vector
+
+        Returns:
+            None
+        """
+        duplicates = [chunk_id for chunk_id in ids if chunk_id in self._rows]
+        if duplicates:
+            raise ValueError(f"Ids already stored: {duplicates[:5]}")
+        self.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def get(self,
+            where: Optional[Dict[str, Any]] = None,
+            include: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Read stored records like a Chroma collection.
+
+        Args:
+            where: Metadata filter (see where_mask; if None, every row)
+            include: Fields to return besides ids (default documents and metadatas)
+
+        Returns:
+            Dictionary with the "ids" and the included fields of the matching rows
+        """
+        include = include if include is not None else ["documents", "metadatas"]
+        rows = np.flatnonzero(self.where_mask(where)) if where else range(len(self.ids))
+
+        results = {"ids": [self.ids[row] for row in rows]}
+        if "documents" in include:
+            results["documents"] = [self.documents[row] for row in rows]
+        if "metadatas" in include:
+            results["metadatas"] = [self.metadatas[row] for row in rows]
+        return results
+
+    def delete(self, ids: List[str]) -> None:
+        """
+        Remove vectors by id; ids that are not stored are ignored.
+
+        The remaining rows are compacted and, when persisted, the record log is
+        rewritten, so this is meant for occasional cleanup rather than churn.
+
+        Args:
+            ids: Ids of the vectors to remove
+
+        Returns:
+            None
+        """
+        removed = {self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows}
+        if not removed:
+            return
+
+        keep = [row for row in range(len(self.ids)) if row not in removed]
+        self._vectors[:len(keep)] = self._vectors[keep]
+        self.ids = [self.ids[row] for row in keep]
+        self.documents = [self.documents[row] for row in keep]
+        self.metadatas = [self.metadatas[row] for row in keep]
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self._columns = {}
+
+        if self.path:
+            self._vectors.flush()
+            tmp_path = f"{self._records_path}.tmp"
+            with open(tmp_path, "w") as f:
+                for row, (chunk_id, document, metadata) in enumerate(zip(self.ids, self.documents, self.metadatas)):
+                    f.write(json.dumps({"row": row, "id": chunk_id, "document": document, "metadata": metadata}) + "\n")
+            os.replace(tmp_path, self._records_path)
+
+    def _column(self, key: str) -> np.ndarray:
+        """Values of one metadata key for every row (None where missing)"""
+        if key not in self._columns:
+            column = np.empty(len(self.metadatas), dtype=object)
+            column[:] = [metadata.get(key) for metadata in self.metadatas]
+            self._columns[key] = column
+        return self._columns[key]
+
+    def where_mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """
+        Select the rows matching a Chroma-style metadata filter.
+
+        Args:
+            where: {key: value}, {key: {"$eq": value}}, {key: {"$in": [...]}} or
+                {"$and": [filters]}
+
+        Returns:
+            Boolean array over the stored rows
+        """
+        mask = np.ones(len(self.ids), dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for sub_filter in condition:
+                    mask &= self.where_mask(sub_filter)
+                continue
+            column = self._column(key)
+            if isinstance(condition, dict):
+                operator, value = next(iter(condition.items()))
+                if operator == "$in":
+                    mask &= np.isin(column, list(value))
+                elif operator == "$eq":
+                    mask &= column == value
+                else:
+                    raise ValueError(f"Unsupported where operator: {operator}")
+            else:
+                mask &= column == condition
+        return mask
+
+    def search(self,
+               query_embeddings: np.ndarray,
+               k: int,
+               mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the nearest stored vectors to one or more queries.
+
+        Args:
+            query_embeddings: Query vector or matrix of query vectors
+            k: Number of neighbours per query
+            mask: Boolean array selecting the rows that may be returned (if None, all)
+
+        Returns:
+            Tuple of (row indices, cosine similarities), each of shape
+            (queries, k') with k' <= k, best first
+        """
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1.0, norms)
+
+        candidates = None if mask is None else np.flatnonzero(mask)
+        k = min(k, self.count() if candidates is None else len(candidates))
+        if k <= 0:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        if candidates is None or 2 * len(candidates) > self.count():
+            # Score every row and rule out the filtered ones
+            similarities = queries @ self.vectors.T
+            if candidates is not None:
+                similarities[:, ~mask] = -np.inf
+                candidates = None
+        else:
+            # Few rows pass the filter: score only those
+            similarities = queries @ self.vectors[candidates].T
+
+        if k < similarities.shape[1]:
+            top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(similarities.shape[1]), (len(queries), k))
+        top_similarities = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_similarities, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_similarities = np.take_along_axis(top_similarities, order, axis=1)
+
+        rows = top if candidates is None else candidates[top]
+        return rows, top_similarities
+
+    def query(self,
+              query_embeddings: List[List[float]],
+              n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None,
+              include: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Query the index like a Chroma collection.
+
+        Args:
+            query_embeddings: Query vectors
+            n_results: Number of results per query
+            where: Metadata filter (see where_mask)
+            include: Fields to return besides ids (default documents, metadatas and distances)
+
+        Returns:
+            Dictionary with lists of per-query "ids" and the included fields;
+            distances are squared L2 between normalized vectors (2 - 2 * cosine)
+        """
+        include = include if include is not None else ["documents", "metadatas", "distances"]
+        mask = self.where_mask(where) if where else None
+        rows, similarities = self.search(query_embeddings, n_results, mask=mask)
+
+        results = {"ids": [[self.ids[row] for row in query_rows] for query_rows in rows]}
+        if "documents" in include:
+            results["documents"] = [[self.documents[row] for row in query_rows] for query_rows in rows]
+        if "metadatas" in include:
+            results["metadatas"] = [[self.metadatas[row] for row in query_rows] for query_rows in rows]
+        if "distances" in include:
+            results["distances"] = [(2.0 - 2.0 * query_similarities).tolist() for query_similarities in similarities]
+        if "embeddings" in include:
+            results["embeddings"] = [self.vectors[query_rows].tolist() for query_rows in rows]
+        return results
+
+    @staticmethod
+    def delete_files(name: str, path: str) -> None:
+        """
+        Remove the files of a persisted index.
+
+        Args:
+            name: Name of the index
+            path: Directory the index was persisted in
+
+        Returns:
+            None
+        """
+        for extension in ("f32", "jsonl", "json"):
+            file_path = os.path.join(path, f"{name}.{extension}")
+            if os.path.exists(file_path):
+                os.remove(file_path)
@@ -0,0 +1,296 @@
+import re
+import time
+import socket
+import threading
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Callable, Optional, Tuple
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+# Fetch limits
+CONNECT_TIMEOUT = 3.05  # Seconds to establish a connection
+READ_TIMEOUT = 10.0  # Seconds to wait for each read from the socket
+TOTAL_TIMEOUT = 15.0  # Seconds for the whole download of one page
+MAX_PAGE_BYTES = 2 * 1024 * 1024  # Bytes downloaded per page; the rest is ignored
+MAX_CONTENT_CHARS = 10000  # Characters of extracted text kept per page
+MAX_WORKERS = 8  # Pages fetched at once
+MAX_CONNECTIONS_PER_HOST = 2  # Concurrent requests to any one host
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+# Shared session so connections (and TLS handshakes) are reused across fetches
+_session = None
+_session_lock = threading.Lock()
+
+# Per-host semaphores limiting concurrent requests to one site
+_host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_host_semaphores_lock = threading.Lock()
+
+# Elements whose text is never part of the main content
+# (not <form> or <header>: some sites wrap the whole page, or the article's
+# title and lead, in them)
+SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe",
+    "head", "nav", "footer", "aside", "button", "select"
+}
+# Elements that end a block of text
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "br", "tr",
+    "table", "blockquote", "pre", "h1", "h2", "h3", "h4", "h5", "h6", "dd", "dt"
+}
+# Void elements have no end tag, so they must not open a skipped region
+VOID_TAGS = {"br", "hr", "img", "input", "meta", "link", "area", "base", "col", "embed", "source", "track", "wbr"}
+# Blocks shorter than this are treated as navigation or boilerplate
+MIN_BLOCK_WORDS = 4
+
+def get_session() -> requests.Session:
+    """
+    Get or initialize the shared HTTP session.
+
+    Returns:
+        Session with a connection pool sized for concurrent fetches
+    """
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.headers["User-Agent"] = USER_AGENT
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+
+    return _session
+
+def _host_semaphore(url: str) -> threading.BoundedSemaphore:
+    """Get the semaphore limiting concurrent requests to the host of a URL"""
+    host = urlsplit(url).netloc.lower()
+    with _host_semaphores_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(MAX_CONNECTIONS_PER_HOST)
+        return _host_semaphores[host]
+
+class MainTextExtractor(HTMLParser):
+    """
+    Collect the readable text of an HTML page.
+
+    Scripts, styles and page furniture (navigation, headers, footers, forms) are
+    dropped and text is grouped into blocks at block-level elements. When the
+    page has an <article> or <main> element, only its text is kept.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self._skip_depth = 0
+        self._main_depth = 0
+        self._in_title = False
+        self._blocks: List[str] = []
+        self._main_blocks: List[str] = []
+        self._current: List[str] = []
+        self._current_in_main = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._end_block()
+        if tag == "title":
+            self._in_title = True
+        elif tag in SKIP_TAGS and tag not in VOID_TAGS:
+            self._skip_depth += 1
+        elif tag in ("article", "main"):
+            self._main_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in BLOCK_TAGS:
+            self._end_block()
+        if tag == "title":
+            self._in_title = False
+        elif tag in SKIP_TAGS and self._skip_depth > 0:
+            self._skip_depth -= 1
+        elif tag in ("article", "main") and self._main_depth > 0:
+            self._end_block()
+            self._main_depth -= 1
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif self._skip_depth == 0:
+            if not self._current:
+                self._current_in_main = self._main_depth > 0
+            self._current.append(data)
+
+    def _end_block(self):
+        text = " ".join("".join(self._current).split())
+        if len(text.split()) >= MIN_BLOCK_WORDS:
+            self._blocks.append(text)
+            if self._current_in_main:
+                self._main_blocks.append(text)
+        self._current = []
+
+    def text(self) -> str:
+        """
+        Get the extracted text.
+
+        Returns:
+            Text blocks separated by blank lines
+        """
+        self._end_block()
+        return "\n\n".join(self._main_blocks or self._blocks)
+
+def extract_main_text(html: str) -> str:
+    """
+    Extract the main readable text from an HTML document.
+
+    Args:
+        html: HTML markup
+
+    Returns:
+        Main text of the page, without markup
+    """
+    parser = MainTextExtractor()
+    parser.feed(html)
+    parser.close()
+    return parser.text()
+
+def _decode(body: bytes, response: requests.Response) -> str:
+    """Decode a response body, preferring the declared charset and falling back to UTF-8"""
+    encoding = None
+    if "charset=" in response.headers.get("Content-Type", ""):
+        encoding = response.encoding
+    else:
+        match = re.search(rb"""<meta[^>]+charset=["']?([\w-]+)""", body[:2048], re.IGNORECASE)
+        if match:
+            encoding = match.group(1).decode("ascii")
+    try:
+        return body.decode(encoding or "utf-8", errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+def _abort(response: requests.Response) -> None:
+    """Shut down the socket of a response, waking a read blocked on a slow server"""
+    # urllib3 2.x exposes the connection as ``connection``, 1.x as ``_connection``
+    connection = getattr(response.raw, "connection", None) or getattr(response.raw, "_connection", None)
+    sock = getattr(connection, "sock", None)
+    if sock is None:
+        # http.client detaches the socket from connections that close after this
+        # response; it is still reachable through the response's file object
+        fp = getattr(getattr(response.raw, "_fp", None), "fp", None)
+        sock = getattr(getattr(fp, "raw", None), "_sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+def fetch_page(url: str,
+               session: Optional[requests.Session] = None,
+               timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT),
+               total_timeout: float = TOTAL_TIMEOUT,
+               max_bytes: int = MAX_PAGE_BYTES) -> Optional[Tuple[str, str]]:
+    """
+    Download a page, streaming at most ``max_bytes`` of its body.
+
+    Args:
+        url: URL of the page
+        session: HTTP session (if None, the shared session)
+        timeout: (connect, read) timeouts in seconds
+        total_timeout: Seconds allowed for the whole download
+        max_bytes: Maximum number of body bytes read
+
+    Returns:
+        Tuple of (content type, decoded body), or None if the page could not be fetched
+    """
+    session = session or get_session()
+    deadline = time.monotonic() + total_timeout
+
+    try:
+        with _host_semaphore(url):
+            with session.get(url, timeout=timeout, stream=True) as response:
+                if response.status_code != 200:
+                    return None
+                content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+
+                # The read timeout applies to each socket read, so a server trickling
+                # bytes could keep the download going; the watchdog cuts it at the deadline
+                watchdog = threading.Timer(max(0.0, deadline - time.monotonic()), _abort, args=(response,))
+                watchdog.daemon = True
+                watchdog.start()
+                body = bytearray()
+                try:
+                    for block in response.iter_content(chunk_size=16384):
+                        body.extend(block)
+                        if len(body) >= max_bytes or time.monotonic() > deadline:
+                            break
+                except requests.RequestException:
+                    # Keep what arrived before the deadline
+                    if time.monotonic() < deadline or not body:
+                        raise
+                finally:
+                    watchdog.cancel()
+
+                return content_type, _decode(bytes(body[:max_bytes]), response)
+    except requests.RequestException as e:
+        print(f"❌ Error fetching {url}: {str(e)}")
+        return None
+
+def fetch_main_text(url: str,
+                    session: Optional[requests.Session] = None,
+                    max_chars: int = MAX_CONTENT_CHARS,
+                    **fetch_kwargs) -> Optional[str]:
+    """
+    Fetch a page and extract its main text.
+
+    Args:
+        url: URL of the page
+        session: HTTP session (if None, the shared session)
+        max_chars: Maximum number of characters returned
+        **fetch_kwargs: Timeouts and byte cap passed to fetch_page
+
+    Returns:
+        Main text of the page, or None for failed fetches and non-text content
+    """
+    page = fetch_page(url, session=session, **fetch_kwargs)
+    if page is None:
+        return None
+
+    content_type, body = page
+    if content_type in ("text/html", "application/xhtml+xml", ""):
+        text = extract_main_text(body)
+    elif content_type.startswith("text/"):
+        text = body.strip()
+    else:
+        return None
+
+    return text[:max_chars] or None
+
+def fetch_pages(urls: List[str],
+                session: Optional[requests.Session] = None,
+                max_workers: int = MAX_WORKERS,
+                fetch: Optional[Callable[[str], Optional[str]]] = None,
+                **fetch_kwargs) -> Dict[str, Optional[str]]:
+    """
+    Fetch the main text of several pages concurrently.
+
+    Args:
+        urls: URLs of the pages
+        session: HTTP session (if None, the shared session)
+        max_workers: Maximum number of pages fetched at once
+        fetch: Function returning the text of one URL (if None, fetch_main_text)
+        **fetch_kwargs: Limits passed to fetch_main_text when ``fetch`` is None
+
+    Returns:
+        Dictionary mapping each URL to its main text (None if unavailable)
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+
+    if fetch is None:
+        fetch = lambda url: fetch_main_text(url, session=session, **fetch_kwargs)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+        texts = executor.map(fetch, urls)
+        return dict(zip(urls, texts))
@@ -1,8 +1,11 @@
 import fitz  # PyMuPDF
-import re
 import os
 import tempfile
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+# Documents shorter than this are extracted in-process; pool start-up would dominate
+MIN_PARALLEL_PAGES = 32
 
 def extract_text_from_pdf(pdf_path: str) -> str:
     """
@@ -21,6 +24,118 @@ def extract_text_from_pdf(pdf_path: str) -> str:
     except Exception as e:
         raise Exception(f"Error extracting text from PDF: {str(e)}")
 
+def _extract_page_range(task: Tuple[str, int, int]) -> List[Tuple[int, str]]:
+    """
+    Extract a range of pages in a worker process with its own document handle.
+    
+    Args:
+        task: (PDF path, first page index, end page index)
+        
+    Returns:
+        List of (1-based page number, page text) tuples
+    """
+    pdf_path, start, end = task
+    with fitz.open(pdf_path) as doc:
+        return [(page_index + 1, doc[page_index].get_text()) for page_index in range(start, end)]
+
+def iter_pdf_pages(pdf_path: str,
+                   workers: Optional[int] = None,
+                   pages_per_task: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Extract the pages of a PDF in parallel and yield them in order.
+    
+    Page ranges are spread over a process pool; each worker opens the file
+    itself, since PyMuPDF documents cannot be shared across processes. Pages are
+    yielded as soon as their range (and every range before it) is done.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        workers: Number of worker processes (if None, one per CPU core)
+        pages_per_task: Pages per work item (if None, about four items per worker)
+        
+    Returns:
+        Iterator of (1-based page number, page text) tuples
+    """
+    try:
+        with fitz.open(pdf_path) as doc:
+            page_count = len(doc)
+    except Exception as e:
+        raise Exception(f"Error extracting text from PDF: {str(e)}")
+    
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or page_count < MIN_PARALLEL_PAGES:
+        yield from _extract_page_range((pdf_path, 0, page_count))
+        return
+    
+    if pages_per_task is None:
+        pages_per_task = max(1, -(-page_count // (workers * 4)))
+    tasks = [(pdf_path, start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+    
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        for pages in executor.map(_extract_page_range, tasks):
+            yield from pages
+
+def extract_text_from_pdf_parallel(pdf_path: str, workers: Optional[int] = None) -> str:
+    """
+    Extract text from a PDF file using a process pool.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        workers: Number of worker processes (if None, one per CPU core)
+        
+    Returns:
+        Extracted text as a string, identical to extract_text_from_pdf
+    """
+    return "\n".join(text for _, text in iter_pdf_pages(pdf_path, workers=workers))
+
+def iter_chunks(pages: Iterable[Tuple[int, str]],
+                max_words: int = 100,
+                overlap: int = 20) -> Iterator[Dict[str, Any]]:
+    """
+    Split page texts into overlapping word chunks as the pages arrive.
+    
+    Only the words of the chunk being filled are held in memory, so chunks can
+    be embedded while later pages are still being extracted. The chunks are the
+    same as chunk_text would produce for the pages joined by newlines.
+    
+    Args:
+        pages: Iterable of (page number, page text) tuples, in page order
+        max_words: Maximum number of words per chunk
+        overlap: Number of words to overlap between chunks
+        
+    Returns:
+        Iterator of {"text", "page_start", "page_end"} dictionaries
+    """
+    step = max_words - overlap
+    if step <= 0:
+        raise ValueError("overlap must be smaller than max_words")
+    
+    words = []
+    word_pages = []
+    
+    def make_chunk(count: int) -> Dict[str, Any]:
+        return {
+            "text": " ".join(words[:count]),
+            "page_start": word_pages[0],
+            "page_end": word_pages[min(count, len(words)) - 1]
+        }
+    
+    for page_number, page_text in pages:
+        for word in page_text.split():
+            words.append(word)
+            word_pages.append(page_number)
+            if len(words) == max_words:
+                yield make_chunk(max_words)
+                # Keep only the overlap for the next chunk
+                del words[:step]
+                del word_pages[:step]
+    
+    # Flush the tail, including chunks that lie entirely within the overlap
+    while words:
+        yield make_chunk(max_words)
+        del words[:step]
+        del word_pages[:step]
+
 def chunk_text(text: str, max_words: int = 100, overlap: int = 20) -> List[str]:
     """
     Split text into chunks of specified maximum word count with overlap.
@@ -33,20 +148,7 @@ def chunk_text(text: str, max_words: int = 100, overlap: int = 20) -> List[str]:
     Returns:
         List of text chunks
     """
-    # Clean text - remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
-    
-    # Split into words
-    words = text.split()
-    
-    # Create chunks with overlap
-    chunks = []
-    for i in range(0, len(words), max_words - overlap):
-        chunk = " ".join(words[i:i + max_words])
-        if chunk:  # Only add non-empty chunks
-            chunks.append(chunk)
-    
-    return chunks
+    return [chunk["text"] for chunk in iter_chunks([(1, text)], max_words=max_words, overlap=overlap)]
 
 def extract_metadata(pdf_path: str) -> Dict[str, Any]:
     """
@@ -0,0 +1,73 @@
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Callable, Optional, Tuple
+
+# Shared pool for the independent branches of a query (web search, PDF retrieval)
+MAX_BRANCH_WORKERS = 8
+_executor = ThreadPoolExecutor(max_workers=MAX_BRANCH_WORKERS, thread_name_prefix="query-branch")
+
+def fan_out(branches: Dict[str, Callable[[], Any]],
+            timeouts: Optional[Dict[str, float]] = None,
+            fallbacks: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """
+    Run independent branches of a query concurrently.
+
+    All branches are submitted at once, so the total latency is that of the
+    slowest branch rather than the sum. Each branch has its own deadline,
+    measured from the moment the branches were submitted; a branch that misses
+    it or raises is replaced by its fallback value. A timed-out branch cannot be
+    interrupted and finishes in the background, where its result is discarded.
+
+    Args:
+        branches: Mapping of branch name to a callable taking no arguments
+        timeouts: Seconds each branch may take (branches without one wait indefinitely)
+        fallbacks: Value used for a branch that timed out or failed (default None)
+
+    Returns:
+        Tuple of (results by branch name, status by branch name); each status has
+        "status" ("ok", "timeout" or "error"), "seconds" and, on failure, "error"
+    """
+    timeouts = timeouts or {}
+    fallbacks = fallbacks or {}
+
+    start = time.perf_counter()
+    # Each branch runs in a copy of the caller's context, so spans keep their trace
+    futures = {
+        name: _executor.submit(contextvars.copy_context().run, _timed, branch)
+        for name, branch in branches.items()
+    }
+
+    results = {}
+    statuses = {}
+    for name, future in futures.items():
+        timeout = timeouts.get(name)
+        remaining = None if timeout is None else max(0.0, start + timeout - time.perf_counter())
+        try:
+            result, seconds, error = future.result(timeout=remaining)
+        except FutureTimeoutError:
+            future.cancel()
+            results[name] = fallbacks.get(name)
+            statuses[name] = {
+                "status": "timeout",
+                "seconds": time.perf_counter() - start,
+                "error": f"{name} did not finish within {timeout:.1f}s"
+            }
+            continue
+
+        if error is None:
+            results[name] = result
+            statuses[name] = {"status": "ok", "seconds": seconds}
+        else:
+            results[name] = fallbacks.get(name)
+            statuses[name] = {"status": "error", "seconds": seconds, "error": str(error)}
+
+    return results, statuses
+
+def _timed(branch: Callable[[], Any]) -> Tuple[Any, float, Optional[Exception]]:
+    """Run a branch and measure how long it took, capturing any exception"""
+    start = time.perf_counter()
+    try:
+        return branch(), time.perf_counter() - start, None
+    except Exception as e:
+        return None, time.perf_counter() - start, e
@@ -1,30 +1,24 @@
 import os
 import requests
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator
 import time
+from .tracing import span, current_trace_id
+from .monitoring import log_span
 
-def generate_response(query: str, 
-                     pdf_sources: List[str], 
-                     web_sources: List[Dict[str, str]],
-                     temperature: float = 0.3) -> str:
-    """
-    Generate a response using Groq API.
-    
-    Args:
-        query: User query
-        pdf_sources: List of relevant PDF text chunks
-        web_sources: List of web search results
-        temperature: Temperature for response generation
-        
-    Returns:
-        Generated response
-    """
-    # Get API key
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        return "⚠️ GROQ_API_KEY not found in environment variables. Cannot generate response."
-    
+# Groq chat completions endpoint (OpenAI-compatible) and model
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_MODEL = "llama3-70b-8192"
+
+# Streaming limits
+STREAM_CONNECT_TIMEOUT = 5.0  # Seconds to connect to the API
+STREAM_STALL_TIMEOUT = 20.0  # Seconds without any data before the stream is abandoned
+STREAM_TOTAL_TIMEOUT = 120.0  # Seconds for the whole answer
+
+def _build_messages(query: str,
+                    pdf_sources: List[str],
+                    web_sources: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Build the chat messages for a query and its sources"""
     # Format sources
     pdf_context = "\n\n".join([f"[PDF] {s}" for s in pdf_sources])
     web_context = "\n\n".join([f"[Web] {s.get('title', 'No title')}: {s.get('snippet', 'No snippet')} (URL: {s.get('link', '#')})" for s in web_sources])
@@ -33,7 +27,7 @@ def generate_response(query: str,
     context = f"{pdf_context}\n\n{web_context}"
     
     # Prepare messages
-    messages = [
+    return [
         {
             "role": "system", 
             "content": """You are a helpful research assistant. Answer the user's query based on the provided sources.
@@ -56,21 +50,45 @@ Sources:
 Please provide a comprehensive answer based on these sources. Include citations."""
         }
     ]
+
+def generate_response(query: str, 
+                     pdf_sources: List[str], 
+                     web_sources: List[Dict[str, str]],
+                     temperature: float = 0.3) -> str:
+    """
+    Generate a response using Groq API.
+    
+    Args:
+        query: User query
+        pdf_sources: List of relevant PDF text chunks
+        web_sources: List of web search results
+        temperature: Temperature for response generation
+        
+    Returns:
+        Generated response
+    """
+    # Get API key
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        return "⚠️ GROQ_API_KEY not found in environment variables. Cannot generate response."
+    
+    messages = _build_messages(query, pdf_sources, web_sources)
     
     try:
         # Make API request
-        response = requests.post(
-            url="https://api.groq.com/openai/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "llama3-70b-8192",
-                "messages": messages,
-                "temperature": temperature
-            }
-        )
+        with span("generation"):
+            response = requests.post(
+                url=GROQ_API_URL,
+                headers={
+                    "Authorization": f"Bearer {api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": GROQ_MODEL,
+                    "messages": messages,
+                    "temperature": temperature
+                }
+            )
         
         # Check for successful response
         if response.status_code == 200:
@@ -81,6 +99,94 @@ Please provide a comprehensive answer based on these sources. Include citations.
     except Exception as e:
         return f"⚠️ Error generating response: {str(e)}"
 
+def generate_response_stream(query: str,
+                             pdf_sources: List[str],
+                             web_sources: List[Dict[str, str]],
+                             temperature: float = 0.3,
+                             stall_timeout: float = STREAM_STALL_TIMEOUT,
+                             total_timeout: float = STREAM_TOTAL_TIMEOUT) -> Iterator[str]:
+    """
+    Generate a response using Groq API, yielding text as it is produced.
+    
+    Consumes the OpenAI-compatible server-sent event stream. Errors are yielded
+    as text like generate_response returns them; if the stream fails, stalls for
+    ``stall_timeout`` seconds or runs past ``total_timeout``, the text received
+    so far is kept and a note that the answer is incomplete is appended. Joining
+    the yielded pieces gives the final response.
+    
+    Args:
+        query: User query
+        pdf_sources: List of relevant PDF text chunks
+        web_sources: List of web search results
+        temperature: Temperature for response generation
+        stall_timeout: Seconds to wait for more data before giving up
+        total_timeout: Seconds allowed for the whole response
+        
+    Yields:
+        Pieces of the generated response
+    """
+    # Get API key
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        yield "⚠️ GROQ_API_KEY not found in environment variables. Cannot generate response."
+        return
+    
+    messages = _build_messages(query, pdf_sources, web_sources)
+    
+    with span("generation", streamed=True):
+        start = time.perf_counter()
+        received = False
+        try:
+            with requests.post(
+                url=GROQ_API_URL,
+                headers={
+                    "Authorization": f"Bearer {api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": GROQ_MODEL,
+                    "messages": messages,
+                    "temperature": temperature,
+                    "stream": True
+                },
+                stream=True,
+                timeout=(STREAM_CONNECT_TIMEOUT, stall_timeout)
+            ) as response:
+                # Server-sent events are always UTF-8; without a charset in the
+                # Content-Type, requests would decode text/* as ISO-8859-1
+                response.encoding = "utf-8"
+                if response.status_code != 200:
+                    yield f"⚠️ Error generating response: {response.status_code} - {response.text}"
+                    return
+
+                # chunk_size=None hands over each chunk as soon as it arrives
+                for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                    # Events are "data: {...}" lines separated by blank lines
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        return
+                    
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        if not received:
+                            received = True
+                            log_span(current_trace_id(), "generation_first_token", time.perf_counter() - start)
+                        yield delta
+                    
+                    if time.perf_counter() - start > total_timeout:
+                        raise TimeoutError(f"no complete response within {total_timeout:.0f}s")
+                
+                # The connection closed without the final event
+                raise ConnectionError("stream ended before the response was complete")
+        
+        except Exception as e:
+            if received:
+                yield f"\n\n⚠️ Response incomplete: {str(e)}"
+            else:
+                yield f"⚠️ Error generating response: {str(e)}"
+
 def format_response_with_citations(response: str) -> str:
     """
     Format response with proper citations.
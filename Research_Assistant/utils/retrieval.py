@@ -1,15 +1,30 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity as sklearn_cosine_similarity
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional, Union
 from sentence_transformers import CrossEncoder
 import chromadb
 from sentence_transformers import SentenceTransformer
+from .sparse_index import SparseIndex, build_sparse_index
+from .tracing import span
+from .vector_store import Collection
+from .embeddings import batch_cosine_similarity
 
 # Cache for cross-encoder model
 _cross_encoder = None
 
-def sparse_search(query: str, chunks: List[str], top_k: int = 3) -> List[Tuple[str, float]]:
+# LRU cache of cross-encoder scores keyed by (query hash, chunk id)
+RERANK_CACHE_SIZE = 10000
+_rerank_cache = OrderedDict()
+_rerank_cache_lock = threading.Lock()
+
+def sparse_search(query: str,
+                 chunks: List[str],
+                 top_k: int = 3,
+                 sparse_index: Optional[SparseIndex] = None,
+                 position_mask: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
     """
     Perform sparse retrieval using TF-IDF and cosine similarity.
     
@@ -17,29 +32,41 @@ def sparse_search(query: str, chunks: List[str], top_k: int = 3) -> List[Tuple[s
         query: Query string
         chunks: List of text chunks to search
         top_k: Number of results to return
+        sparse_index: Index fitted on ``chunks`` at ingestion (if None, one is built for this query)
+        position_mask: Boolean array selecting the chunks that may be returned (if None, all)
         
     Returns:
         List of (chunk, score) tuples
     """
-    # Initialize vectorizer
-    vectorizer = TfidfVectorizer()
-    
-    # Fit on chunks
-    X = vectorizer.fit_transform(chunks)
-    
-    # Transform query
-    q_vec = vectorizer.transform([query])
-    
-    # Calculate similarity
-    scores = sklearn_cosine_similarity(q_vec, X).flatten()
+    positions, scores = sparse_search_scored(query, chunks, top_k, sparse_index, position_mask)
+    return [(chunks[i], float(score)) for i, score in zip(positions, scores)]
+
+def sparse_search_scored(query: str,
+                        chunks: List[str],
+                        top_k: int = 3,
+                        sparse_index: Optional[SparseIndex] = None,
+                        position_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Perform sparse retrieval and keep the position of each result.
     
-    # Rank results
-    ranked = sorted(zip(chunks, scores), key=lambda x: x[1], reverse=True)
+    Args:
+        query: Query string
+        chunks: List of text chunks to search
+        top_k: Number of results to return
+        sparse_index: Index fitted on ``chunks`` at ingestion (if None, one is built for this query)
+        position_mask: Boolean array selecting the chunks that may be returned (if None, all)
+        
+    Returns:
+        Tuple of (chunk positions, scores), best first
+    """
+    if sparse_index is None:
+        sparse_index = build_sparse_index(chunks)
     
-    return ranked[:top_k]
+    with span("sparse_search"):
+        return sparse_index.search_indices(query, top_k=top_k, mask=position_mask)
 
 def dense_search(query: str, 
-                collection: chromadb.Collection, 
+                collection: Collection, 
                 embedding_model: SentenceTransformer,
                 top_k: int = 3) -> List[str]:
     """
@@ -47,7 +74,7 @@ def dense_search(query: str,
     
     Args:
         query: Query string
-        collection: ChromaDB collection
+        collection: ChromaDB collection or NumpyVectorIndex
         embedding_model: SentenceTransformer model
         top_k: Number of results to return
         
@@ -65,52 +92,210 @@ def dense_search(query: str,
     
     return results['documents'][0]
 
+def chunk_positions(ids: List[str], metadatas: Optional[List[Dict[str, Any]]] = None) -> np.ndarray:
+    """
+    Map stored chunk ids to their integer positions in the chunk list.
+    
+    Args:
+        ids: Chunk ids returned by the collection
+        metadatas: Chunk metadata, used when it records a "position"
+        
+    Returns:
+        Array of chunk positions
+    """
+    positions = []
+    for i, chunk_id in enumerate(ids):
+        metadata = metadatas[i] if metadatas else None
+        if metadata and "position" in metadata:
+            positions.append(metadata["position"])
+        else:
+            # Ids end in the chunk's position, e.g. "chunk_12"
+            positions.append(int(chunk_id.rsplit("_", 1)[-1]))
+    return np.asarray(positions, dtype=np.int64)
+
+def dense_search_scored(query: str,
+                       collection: Collection,
+                       embedding_model: SentenceTransformer,
+                       top_k: int = 3,
+                       where: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Perform dense retrieval and keep the similarity of each result.
+    
+    Args:
+        query: Query string
+        collection: ChromaDB collection or NumpyVectorIndex
+        embedding_model: SentenceTransformer model
+        top_k: Number of results to return
+        where: Chroma metadata filter, e.g. to search only some documents
+        
+    Returns:
+        Tuple of (chunk positions, similarity scores), best first
+    """
+    with span("query_embedding"):
+        query_embedding = embedding_model.encode(query).tolist()
+    with span("chroma_query", top_k=top_k):
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=top_k,
+            where=where,
+            include=["metadatas", "distances"]
+        )
+    
+    positions = chunk_positions(results["ids"][0], results["metadatas"][0])
+    # Squared L2 distance between unit vectors is 2 - 2 * cosine similarity
+    similarities = 1.0 - np.asarray(results["distances"][0], dtype=np.float32) / 2.0
+    return positions, similarities
+
+def _min_max(scores: np.ndarray) -> np.ndarray:
+    """Scale scores to [0, 1]; a constant list maps to all ones"""
+    if len(scores) == 0:
+        return scores
+    low, high = scores.min(), scores.max()
+    if high - low < 1e-12:
+        return np.ones_like(scores)
+    return (scores - low) / (high - low)
+
+def fuse_rankings(dense_ids: np.ndarray,
+                  dense_scores: np.ndarray,
+                  sparse_ids: np.ndarray,
+                  sparse_scores: np.ndarray,
+                  method: str = "weighted",
+                  dense_weight: float = 0.7,
+                  sparse_weight: float = 0.3,
+                  rrf_k: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fuse a dense and a sparse ranking of chunk positions.
+    
+    Args:
+        dense_ids: Chunk positions from dense retrieval, best first
+        dense_scores: Dense similarity scores
+        sparse_ids: Chunk positions from sparse retrieval, best first
+        sparse_scores: Sparse similarity scores
+        method: "weighted" for a weighted sum of min-max normalized scores,
+            "rrf" for weighted reciprocal rank fusion
+        dense_weight: Weight of the dense ranking
+        sparse_weight: Weight of the sparse ranking
+        rrf_k: Rank offset for reciprocal rank fusion
+        
+    Returns:
+        Tuple of (chunk positions, fused scores), best first
+    """
+    dense_ids = np.asarray(dense_ids, dtype=np.int64)
+    sparse_ids = np.asarray(sparse_ids, dtype=np.int64)
+    
+    if method == "weighted":
+        dense_part = dense_weight * _min_max(np.asarray(dense_scores, dtype=np.float32))
+        sparse_part = sparse_weight * _min_max(np.asarray(sparse_scores, dtype=np.float32))
+    elif method == "rrf":
+        dense_part = dense_weight / (rrf_k + np.arange(1, len(dense_ids) + 1, dtype=np.float32))
+        sparse_part = sparse_weight / (rrf_k + np.arange(1, len(sparse_ids) + 1, dtype=np.float32))
+    else:
+        raise ValueError(f"Unknown fusion method: {method}")
+    
+    # Join the two rankings on chunk position
+    fused_ids = np.union1d(dense_ids, sparse_ids)
+    fused_scores = np.zeros(len(fused_ids), dtype=np.float32)
+    np.add.at(fused_scores, np.searchsorted(fused_ids, dense_ids), dense_part)
+    np.add.at(fused_scores, np.searchsorted(fused_ids, sparse_ids), sparse_part)
+    
+    # Highest score first; ties go to the earlier chunk
+    order = np.lexsort((fused_ids, -fused_scores))
+    return fused_ids[order], fused_scores[order]
+
 def hybrid_retrieval(query: str, 
                     chunks: List[str], 
-                    collection: chromadb.Collection,
+                    collection: Collection,
                     embedding_model: SentenceTransformer,
                     top_k: int = 5,
                     dense_weight: float = 0.7,
-                    sparse_weight: float = 0.3) -> List[str]:
+                    sparse_weight: float = 0.3,
+                    sparse_index: Optional[SparseIndex] = None,
+                    fusion: str = "weighted",
+                    return_scores: bool = False,
+                    where: Optional[Dict[str, Any]] = None,
+                    position_mask: Optional[np.ndarray] = None) -> Union[List[str], List[Tuple[str, float]]]:
     """
     Perform hybrid retrieval combining dense and sparse search.
     
     Args:
         query: Query string
         chunks: List of text chunks
-        collection: ChromaDB collection
+        collection: ChromaDB collection or NumpyVectorIndex
         embedding_model: SentenceTransformer model
         top_k: Number of results to return
         dense_weight: Weight for dense retrieval scores
         sparse_weight: Weight for sparse retrieval scores
+        sparse_index: Index fitted on ``chunks`` at ingestion
+        fusion: "weighted" (normalized score fusion) or "rrf" (reciprocal rank fusion)
+        return_scores: Return (chunk, fused score) tuples instead of chunks
+        where: Chroma metadata filter for dense search
+        position_mask: Boolean array selecting the chunks sparse search may return
         
     Returns:
-        List of text chunks
+        List of text chunks, or (chunk, score) tuples if ``return_scores`` is set
     """
-    # Get dense results
-    dense_results = dense_search(query, collection, embedding_model, top_k=top_k*2)
-    
-    # Get sparse results
-    sparse_results = sparse_search(query, chunks, top_k=top_k*2)
-    sparse_chunks = [chunk for chunk, _ in sparse_results]
+    positions, scores = hybrid_retrieval_scored(
+        query, chunks, collection, embedding_model,
+        top_k=top_k,
+        dense_weight=dense_weight,
+        sparse_weight=sparse_weight,
+        sparse_index=sparse_index,
+        fusion=fusion,
+        where=where,
+        position_mask=position_mask
+    )
+    results = [(chunks[i], float(score)) for i, score in zip(positions, scores)]
+    if return_scores:
+        return results
+    return [chunk for chunk, _ in results]
+
+def hybrid_retrieval_scored(query: str,
+                           chunks: List[str],
+                           collection: Collection,
+                           embedding_model: SentenceTransformer,
+                           top_k: int = 5,
+                           dense_weight: float = 0.7,
+                           sparse_weight: float = 0.3,
+                           sparse_index: Optional[SparseIndex] = None,
+                           fusion: str = "weighted",
+                           where: Optional[Dict[str, Any]] = None,
+                           position_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Perform hybrid retrieval and keep the position of each result.
     
-    # Combine results (with fixed weights for simplicity)
-    combined_chunks = []
+    Args:
+        query: Query string
+        chunks: List of text chunks
+        collection: ChromaDB collection or NumpyVectorIndex
+        embedding_model: SentenceTransformer model
+        top_k: Number of results to return
+        dense_weight: Weight for dense retrieval scores
+        sparse_weight: Weight for sparse retrieval scores
+        sparse_index: Index fitted on ``chunks`` at ingestion
+        fusion: "weighted" (normalized score fusion) or "rrf" (reciprocal rank fusion)
+        where: Chroma metadata filter for dense search
+        position_mask: Boolean array selecting the chunks sparse search may return
+
+    Returns:
+        Tuple of (chunk positions, fused scores), best first
+    """
+    if sparse_index is None:
+        sparse_index = build_sparse_index(chunks)
     
-    # Add dense results with weight
-    for chunk in dense_results:
-        if chunk in combined_chunks:
-            continue
-        combined_chunks.append(chunk)
+    # Get candidates from both retrievers
+    dense_ids, dense_scores = dense_search_scored(query, collection, embedding_model, top_k=top_k*2, where=where)
+    with span("sparse_search"):
+        sparse_ids, sparse_scores = sparse_index.search_indices(query, top_k=top_k*2, mask=position_mask)
     
-    # Add sparse results with weight
-    for chunk in sparse_chunks:
-        if chunk in combined_chunks:
-            continue
-        combined_chunks.append(chunk)
+    fused_ids, fused_scores = fuse_rankings(
+        dense_ids, dense_scores,
+        sparse_ids, sparse_scores,
+        method=fusion,
+        dense_weight=dense_weight,
+        sparse_weight=sparse_weight
+    )
     
-    # Limit to top_k
-    return combined_chunks[:top_k]
+    return fused_ids[:top_k], fused_scores[:top_k]
 
 def get_cross_encoder(model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2") -> CrossEncoder:
     """
@@ -129,31 +314,146 @@ def get_cross_encoder(model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2")
     
     return _cross_encoder
 
-def rerank_results(query: str, chunks: List[str], top_k: int = None) -> List[str]:
+def _rerank_cache_key(query: str, chunk_id: str) -> Tuple[str, str]:
+    """Cache key for a (query, chunk) cross-encoder score"""
+    return hashlib.sha1(query.encode("utf-8")).hexdigest(), chunk_id
+
+def clear_rerank_cache() -> None:
+    """Drop all cached cross-encoder scores"""
+    with _rerank_cache_lock:
+        _rerank_cache.clear()
+
+def rerank_results(query: str,
+                  chunks: List[str],
+                  top_k: int = None,
+                  batch_size: int = 32,
+                  chunk_ids: Optional[List[str]] = None,
+                  first_stage_scores: Optional[List[float]] = None,
+                  cascade_top_n: Optional[int] = None,
+                  time_budget: Optional[float] = None,
+                  return_scores: bool = False) -> Union[List[str], List[Tuple[str, float]]]:
     """
     Rerank results using a cross-encoder model.
     
+    Scores are cached per (query, chunk), so repeated questions skip the model.
+    With ``first_stage_scores`` and ``cascade_top_n`` only the best first-stage
+    candidates are sent to the cross-encoder; the rest keep their first-stage
+    order behind them. With ``time_budget`` scoring stops after the batch that
+    exceeds it, and unscored candidates also follow in first-stage order.
+    
     Args:
         query: Query string
-        chunks: List of text chunks to rerank
+        chunks: List of text chunks to rerank, in first-stage order
         top_k: Number of results to return (if None, return all reranked)
+        batch_size: Number of pairs scored per cross-encoder call
+        chunk_ids: Stable ids of the chunks for caching (if None, a hash of the text)
+        first_stage_scores: Retrieval scores of the chunks
+        cascade_top_n: Number of candidates to rerank (if None, all of them)
+        time_budget: Seconds available for cross-encoder scoring
+        return_scores: Return (chunk, score) tuples; unscored chunks get None
         
     Returns:
-        List of reranked text chunks
+        List of reranked text chunks, or (chunk, score) tuples
     """
     if top_k is None:
         top_k = len(chunks)
+    if chunk_ids is None:
+        chunk_ids = [hashlib.sha1(chunk.encode("utf-8")).hexdigest() for chunk in chunks]
+    
+    # Candidate order for the cross-encoder: by first-stage score if given
+    order = list(range(len(chunks)))
+    if first_stage_scores is not None:
+        order.sort(key=lambda i: -first_stage_scores[i])
+    candidates = order[:cascade_top_n] if cascade_top_n else order
+    
+    with span("reranking", candidates=len(candidates)):
+        scores = {}
+        with _rerank_cache_lock:
+            for i in candidates:
+                key = _rerank_cache_key(query, chunk_ids[i])
+                if key in _rerank_cache:
+                    _rerank_cache.move_to_end(key)
+                    scores[i] = _rerank_cache[key]
+    
+        # Score the uncached candidates in batches, within the time budget
+        pending = [i for i in candidates if i not in scores]
+        if pending:
+            cross_encoder = get_cross_encoder()
+            started = time.perf_counter()
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                batch_scores = cross_encoder.predict([(query, chunks[i]) for i in batch], batch_size=batch_size)
+                with _rerank_cache_lock:
+                    for i, score in zip(batch, batch_scores):
+                        scores[i] = float(score)
+                        _rerank_cache[_rerank_cache_key(query, chunk_ids[i])] = float(score)
+                    while len(_rerank_cache) > RERANK_CACHE_SIZE:
+                        _rerank_cache.popitem(last=False)
+                if time_budget is not None and time.perf_counter() - started > time_budget:
+                    break
+    
+    # Reranked candidates first (by score only, so ties keep first-stage order),
+    # then everything that was not scored
+    rank = {i: position for position, i in enumerate(order)}
+    reranked = sorted(scores, key=lambda i: (-scores[i], rank[i]))
+    ranked = reranked + [i for i in order if i not in scores]
     
-    # Prepare input pairs
-    pairs = [(query, chunk) for chunk in chunks]
+    if return_scores:
+        return [(chunks[i], scores.get(i)) for i in ranked[:top_k]]
+    return [chunks[i] for i in ranked[:top_k]]
+
+def unit_scores(scores: List[Optional[float]], kind: str = "similarity", rrf_k: int = 60) -> List[float]:
+    """
+    Map retrieval scores onto a 0-1 relevance scale, so passages ranked by
+    different retrievers can be compared when packing the prompt.
     
-    # Get cross-encoder
-    cross_encoder = get_cross_encoder()
+    Args:
+        scores: Scores of one retriever; None (e.g. not reached by the reranker) maps to 0
+        kind: "cross_encoder" for reranker logits (through a sigmoid), "rrf" for
+            reciprocal rank fusion scores (relative to the best possible fused score,
+            with weights summing to 1), or "similarity" for cosine and weighted fusion
+            scores (clipped to [0, 1])
+        rrf_k: Rank offset used for reciprocal rank fusion
+        
+    Returns:
+        List of scores between 0 and 1
+    """
+    values = np.array([np.nan if score is None else score for score in scores], dtype=np.float64)
+    if kind == "cross_encoder":
+        values = 1.0 / (1.0 + np.exp(-values))
+    elif kind == "rrf":
+        values = values * (rrf_k + 1)
+    elif kind != "similarity":
+        raise ValueError(f"Unknown score kind: {kind}")
+    return np.nan_to_num(np.clip(values, 0.0, 1.0), nan=0.0).tolist()
+
+def relevance_scores(query: str,
+                     passages: List[str],
+                     embedding_model: Optional[SentenceTransformer] = None,
+                     use_cross_encoder: bool = False) -> List[float]:
+    """
+    Score passages that did not come from retrieval (e.g. web snippets) against a query.
     
-    # Get scores
-    scores = cross_encoder.predict(pairs)
+    The scale matches unit_scores for the PDF chunks: cross-encoder
+    probabilities when reranking, otherwise cosine similarity of embeddings.
     
-    # Sort by score
-    ranked_results = [x for _, x in sorted(zip(scores, chunks), reverse=True)]
+    Args:
+        query: Query string
+        passages: Texts to score
+        embedding_model: SentenceTransformer model (needed unless ``use_cross_encoder``)
+        use_cross_encoder: Score with the reranking cross-encoder
+        
+    Returns:
+        List of scores between 0 and 1, in passage order
+    """
+    if not passages:
+        return []
     
-    return ranked_results[:top_k] 
\ No newline at end of file
+    with span("passage_scoring", passages=len(passages), cross_encoder=use_cross_encoder):
+        if use_cross_encoder:
+            logits = get_cross_encoder().predict([(query, passage) for passage in passages])
+            return unit_scores([float(logit) for logit in logits], "cross_encoder")
+        
+        embeddings = embedding_model.encode([query] + passages)
+        return unit_scores(batch_cosine_similarity(embeddings[0], embeddings[1:]), "similarity")
+
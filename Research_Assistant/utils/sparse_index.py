@@ -0,0 +1,231 @@
+import os
+import re
+import json
+import numpy as np
+from scipy import sparse
+from typing import List, Dict, Tuple, Optional
+
+# Same default token pattern as sklearn's TfidfVectorizer
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase word tokens of two or more characters.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of tokens
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+class SparseIndex:
+    """
+    TF-IDF keyword index over text chunks, fitted once and searched many times.
+
+    Raw term counts are kept in a CSR matrix over a growing vocabulary so new
+    chunks can be added without refitting. The L2-normalized TF-IDF matrix
+    (smoothed idf, as in sklearn's TfidfVectorizer) is rebuilt lazily after an
+    add, and stored column-major so a query only touches the postings of its
+    own terms.
+    """
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self.chunks: List[str] = []
+        self._counts = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._document_frequency = np.zeros(0, dtype=np.int64)
+        self._tfidf = None
+        self._idf = None
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def add(self, chunks: List[str]) -> None:
+        """
+        Add chunks to the index.
+
+        Args:
+            chunks: Text chunks to add; their positions continue from the existing ones
+
+        Returns:
+            None
+        """
+        if not chunks:
+            return
+
+        indptr = [0]
+        indices = []
+        data = []
+        for chunk in chunks:
+            counts = {}
+            for token in tokenize(chunk):
+                term_id = self.vocabulary.setdefault(token, len(self.vocabulary))
+                counts[term_id] = counts.get(term_id, 0) + 1
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+
+        vocabulary_size = len(self.vocabulary)
+        new_counts = sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(chunks), vocabulary_size)
+        )
+
+        # Widen the existing matrix to the grown vocabulary before stacking
+        self._counts.resize((self._counts.shape[0], vocabulary_size))
+        self._counts = sparse.vstack([self._counts, new_counts], format="csr")
+
+        self._document_frequency = np.concatenate([
+            self._document_frequency,
+            np.zeros(vocabulary_size - len(self._document_frequency), dtype=np.int64)
+        ])
+        self._document_frequency += np.bincount(new_counts.indices, minlength=vocabulary_size)
+
+        self.chunks.extend(chunks)
+        self._tfidf = None
+
+    def _build(self) -> None:
+        """Compute the normalized TF-IDF matrix from the raw counts"""
+        n_documents = self._counts.shape[0]
+        self._idf = (np.log((1 + n_documents) / (1 + self._document_frequency)) + 1).astype(np.float32)
+
+        tfidf = self._counts.multiply(self._idf.reshape(1, -1)).tocsr()
+        norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        tfidf = sparse.diags(1.0 / norms) @ tfidf
+        self._tfidf = tfidf.tocsc()
+
+    def scores(self, query: str) -> np.ndarray:
+        """
+        Compute the cosine similarity between a query and every chunk.
+
+        Args:
+            query: Query string
+
+        Returns:
+            Array with one score per chunk, in insertion order
+        """
+        if not self.chunks:
+            return np.zeros(0, dtype=np.float32)
+        if self._tfidf is None:
+            self._build()
+
+        counts = {}
+        for token in tokenize(query):
+            term_id = self.vocabulary.get(token)
+            if term_id is not None:
+                counts[term_id] = counts.get(term_id, 0) + 1
+        if not counts:
+            return np.zeros(len(self.chunks), dtype=np.float32)
+
+        term_ids = np.fromiter(counts.keys(), dtype=np.int64)
+        weights = np.fromiter(counts.values(), dtype=np.float32) * self._idf[term_ids]
+        weights /= np.linalg.norm(weights)
+
+        return np.asarray(self._tfidf[:, term_ids] @ weights).ravel()
+
+    def search_indices(self, query: str, top_k: int = 3, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the positions of the best-scoring chunks.
+
+        Args:
+            query: Query string
+            top_k: Number of results to return
+            mask: Boolean array selecting the chunks that may be returned (if None, all)
+
+        Returns:
+            Tuple of (chunk positions, scores), best first
+        """
+        scores = self.scores(query)
+        allowed = np.arange(len(scores)) if mask is None else np.flatnonzero(mask[:len(scores)])
+        if len(allowed) == 0 or top_k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        top_k = min(top_k, len(allowed))
+        candidates = allowed[np.argpartition(-scores[allowed], top_k - 1)[:top_k]]
+        # Highest score first; ties keep chunk order
+        order = np.lexsort((candidates, -scores[candidates]))
+        top = candidates[order]
+        return top, scores[top]
+
+    def search(self, query: str, top_k: int = 3, mask: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """
+        Find the chunks most similar to a query.
+
+        Args:
+            query: Query string
+            top_k: Number of results to return
+            mask: Boolean array selecting the chunks that may be returned (if None, all)
+
+        Returns:
+            List of (chunk, score) tuples
+        """
+        positions, scores = self.search_indices(query, top_k, mask=mask)
+        return [(self.chunks[i], float(score)) for i, score in zip(positions, scores)]
+
+    def save(self, path: str) -> None:
+        """
+        Save the term counts and vocabulary (not the chunk texts).
+
+        Args:
+            path: Path prefix; writes ``{path}.npz`` and ``{path}.json``
+
+        Returns:
+            None
+        """
+        counts = self._counts
+        np.savez(
+            f"{path}.tmp.npz",
+            data=counts.data,
+            indices=counts.indices,
+            indptr=counts.indptr,
+            shape=np.asarray(counts.shape),
+            document_frequency=self._document_frequency
+        )
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        with open(f"{path}.tmp.json", "w") as f:
+            json.dump({"terms": terms}, f)
+        os.replace(f"{path}.tmp.npz", f"{path}.npz")
+        os.replace(f"{path}.tmp.json", f"{path}.json")
+
+    @classmethod
+    def load(cls, path: str, chunks: List[str]) -> "SparseIndex":
+        """
+        Load an index saved with ``save``.
+
+        Args:
+            path: Path prefix given to ``save``
+            chunks: The indexed chunk texts, in insertion order
+
+        Returns:
+            Loaded SparseIndex
+        """
+        index = cls()
+        with open(f"{path}.json", "r") as f:
+            terms = json.load(f)["terms"]
+        arrays = np.load(f"{path}.npz")
+        shape = tuple(int(n) for n in arrays["shape"])
+        if shape[0] != len(chunks):
+            raise ValueError(f"Index has {shape[0]} chunks but {len(chunks)} were given")
+
+        index.vocabulary = {term: i for i, term in enumerate(terms)}
+        index.chunks = list(chunks)
+        index._counts = sparse.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape)
+        index._document_frequency = arrays["document_frequency"]
+        return index
+
+def build_sparse_index(chunks: List[str]) -> SparseIndex:
+    """
+    Build a sparse index over a list of chunks.
+
+    Args:
+        chunks: Text chunks to index
+
+    Returns:
+        Fitted SparseIndex
+    """
+    index = SparseIndex()
+    index.add(chunks)
+    return index
@@ -0,0 +1,121 @@
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Optional
+from .monitoring import log_span
+
+# Trace (a query or an ingested document) that new spans belong to
+_trace_id: contextvars.ContextVar = contextvars.ContextVar("trace_id", default=None)
+# Timed iterators currently producing an item, innermost last
+_active_iterators: contextvars.ContextVar = contextvars.ContextVar("active_iterators", default=())
+
+@contextmanager
+def trace(trace_id: str) -> Iterator[str]:
+    """
+    Attribute the spans recorded inside the block to one trace.
+
+    Args:
+        trace_id: ID of the query or document being processed
+
+    Yields:
+        The trace ID
+    """
+    token = _trace_id.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        _trace_id.reset(token)
+
+def current_trace_id() -> Optional[str]:
+    """
+    Get the trace the current code runs in.
+
+    Returns:
+        Trace ID, or None outside a trace
+    """
+    return _trace_id.get()
+
+@contextmanager
+def span(stage: str, **attributes: Any) -> Iterator[None]:
+    """
+    Time a pipeline stage and record it through the monitoring module.
+
+    Args:
+        stage: Stage name, e.g. "reranking"
+        **attributes: Extra JSON-serializable details stored with the span
+
+    Yields:
+        None
+    """
+    status = "ok"
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        log_span(_trace_id.get(), stage, time.perf_counter() - start, status, attributes)
+
+class _TimedIterator:
+    """Iterator wrapper that accumulates the time spent producing items"""
+
+    def __init__(self, stage: str, iterable: Iterable, attributes: dict):
+        self.stage = stage
+        self.attributes = attributes
+        self._iterator = iter(iterable)
+        self._seconds = 0.0
+        self._items = 0
+        self._recorded = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        parents = _active_iterators.get()
+        token = _active_iterators.set(parents + (self,))
+        start = time.perf_counter()
+        status = None
+        try:
+            item = next(self._iterator)
+        except StopIteration:
+            status = "ok"
+            raise
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _active_iterators.reset(token)
+            self._seconds += elapsed
+            # Time spent here is not the enclosing iterator's own work
+            if parents:
+                parents[-1]._seconds -= elapsed
+            if status is not None:
+                self._record(status)
+        self._items += 1
+        return item
+
+    def _record(self, status: str):
+        if not self._recorded:
+            self._recorded = True
+            log_span(_trace_id.get(), self.stage, self._seconds, status, dict(self.attributes, items=self._items))
+
+def timed_iter(stage: str, iterable: Iterable, **attributes: Any) -> Iterator:
+    """
+    Record the time spent producing the items of an iterable as one span.
+
+    Meant for streaming stages such as extraction and chunking, whose work is
+    interleaved with their consumers. Time spent inside a nested timed iterator
+    (e.g. extraction feeding chunking) counts only towards the inner stage.
+    The span is recorded when the iterable is exhausted.
+
+    Args:
+        stage: Stage name, e.g. "pdf_extraction"
+        iterable: Source of items
+        **attributes: Extra JSON-serializable details stored with the span
+
+    Returns:
+        Iterator over the same items
+    """
+    return _TimedIterator(stage, iterable, attributes)
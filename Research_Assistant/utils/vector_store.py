@@ -1,22 +1,37 @@
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Union
 import os
 import time
 from sentence_transformers import SentenceTransformer
+from .tracing import span
+from .numpy_index import NumpyVectorIndex
+
+# A Chroma collection or the in-process NumPy index, which has the same query interface
+Collection = Union[chromadb.Collection, NumpyVectorIndex]
 
 def create_collection(collection_name: str, 
-                     persist_directory: Optional[str] = None) -> chromadb.Collection:
+                     persist_directory: Optional[str] = None,
+                     backend: str = "chroma") -> Collection:
     """
     Create or get a ChromaDB collection.
     
+    With backend="numpy" an in-process NumpyVectorIndex is returned instead,
+    which avoids Chroma's serialization and index build for single-session search.
+    
     Args:
         collection_name: Name of the collection
         persist_directory: Directory to persist the collection (if None, in-memory only)
+        backend: "chroma" or "numpy"
         
     Returns:
-        ChromaDB collection
+        ChromaDB collection, or NumpyVectorIndex
     """
+    if backend == "numpy":
+        return NumpyVectorIndex(collection_name, path=persist_directory)
+    if backend != "chroma":
+        raise ValueError(f"Unknown vector backend: {backend}")
+    
     # Configure client
     if persist_directory:
         client = chromadb.PersistentClient(path=persist_directory)
@@ -36,38 +51,72 @@ def create_collection(collection_name: str,
     
     return collection
 
-def store_chunks(chunks: List[str], 
-                collection: chromadb.Collection, 
+def chunk_record(chunk: Union[str, Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Split a chunk into its text and the metadata to store with it.
+    
+    Args:
+        chunk: Text chunk, or a dictionary from pdf_processor.iter_chunks
+        
+    Returns:
+        Tuple of (text, metadata)
+    """
+    if isinstance(chunk, str):
+        return chunk, {}
+    metadata = {key: chunk[key] for key in ("page_start", "page_end") if key in chunk}
+    return chunk["text"], metadata
+
+def store_chunks(chunks: Iterable[Union[str, Dict[str, Any]]], 
+                collection: Collection, 
                 embedding_model: SentenceTransformer,
-                batch_size: int = 100) -> None:
+                batch_size: int = 100) -> int:
     """
     Store text chunks in a ChromaDB collection.
     
+    Chunks are consumed lazily, so a generator such as pdf_processor.iter_chunks
+    lets each batch be embedded and inserted while extraction continues.
+    
     Args:
-        chunks: List of text chunks to store
+        chunks: Text chunks, or chunk dictionaries with page spans, to store
         collection: ChromaDB collection
         embedding_model: SentenceTransformer model for embeddings
         batch_size: Number of chunks to process at once
         
     Returns:
-        None
+        Number of chunks stored
     """
-    # Process in batches to avoid memory issues
-    for i in range(0, len(chunks), batch_size):
-        batch = chunks[i:i+batch_size]
-        batch_ids = [f"chunk_{i+j}" for j in range(len(batch))]
+    stored = 0
+    batch = []
+    
+    def flush():
+        texts = [text for text, _ in batch]
         
         # Generate embeddings
-        embeddings = embedding_model.encode(batch).tolist()
+        with span("embedding", chunks=len(texts)):
+            embeddings = embedding_model.encode(texts).tolist()
         
-        # Add to collection
+        # Add to collection; the position lets retrieval join results by index
         collection.add(
-            documents=batch,
-            ids=batch_ids,
-            embeddings=embeddings
+            documents=texts,
+            ids=[f"chunk_{stored+j}" for j in range(len(batch))],
+            embeddings=embeddings,
+            metadatas=[dict(metadata, position=stored+j) for j, (_, metadata) in enumerate(batch)]
         )
+    
+    # Process in batches to avoid memory issues
+    for chunk in chunks:
+        batch.append(chunk_record(chunk))
+        if len(batch) >= batch_size:
+            flush()
+            stored += len(batch)
+            batch = []
+    if batch:
+        flush()
+        stored += len(batch)
+    
+    return stored
 
-def query_collection(collection: chromadb.Collection,
+def query_collection(collection: Collection,
                     query: str,
                     embedding_model: SentenceTransformer,
                     n_results: int = 5) -> Dict[str, Any]:
@@ -75,7 +124,7 @@ def query_collection(collection: chromadb.Collection,
     Query a ChromaDB collection.
     
     Args:
-        collection: ChromaDB collection
+        collection: ChromaDB collection or NumpyVectorIndex
         query: Query string
         embedding_model: SentenceTransformer model for embeddings
         n_results: Number of results to return
@@ -94,18 +143,24 @@ def query_collection(collection: chromadb.Collection,
     
     return results
 
-def delete_collection(collection_name: str, persist_directory: Optional[str] = None) -> bool:
+def delete_collection(collection_name: str, persist_directory: Optional[str] = None, backend: str = "chroma") -> bool:
     """
     Delete a ChromaDB collection.
     
     Args:
         collection_name: Name of the collection to delete
         persist_directory: Directory where the collection is persisted
+        backend: "chroma" or "numpy"
         
     Returns:
         True if successful, False otherwise
     """
     try:
+        if backend == "numpy":
+            if persist_directory:
+                NumpyVectorIndex.delete_files(collection_name, persist_directory)
+            return True
+        
         if persist_directory:
             client = chromadb.PersistentClient(path=persist_directory)
         else:
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+from .monitoring import record_cache_event
+
+# Location and size of the on-disk cache
+CACHE_PATH = os.path.join("cache", "web_cache.sqlite3")
+MAX_CACHE_BYTES = 100 * 1024 * 1024
+
+# How long entries are fresh, and how long after that they may still be served
+# while a background refresh runs
+SEARCH_TTL = 6 * 3600
+PAGE_TTL = 24 * 3600
+STALE_TTL = 24 * 3600
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a search query for use as a cache key.
+
+    Args:
+        query: Search query
+
+    Returns:
+        Lowercased query with whitespace collapsed and trailing punctuation removed
+    """
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+class WebCache:
+    """
+    Persistent cache of web search responses and fetched pages.
+
+    Entries live in a SQLite file with a per-entry expiry time. Expired entries
+    are still served for ``STALE_TTL`` seconds while a background refresh
+    replaces them (stale-while-revalidate). When the stored values exceed
+    ``max_bytes``, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = MAX_CACHE_BYTES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                fetch_seconds REAL NOT NULL
+            )
+        """)
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._connection.commit()
+
+        # Refreshes of stale entries, at most one per key at a time
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="web-cache-refresh")
+        self._refreshing = set()
+
+    def get(self, key: str) -> Optional[Tuple[Any, bool, float]]:
+        """
+        Look up an entry.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Tuple of (value, fresh, seconds the original fetch took), or None if
+            the key is missing or past its stale window
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at, fetch_seconds FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at, fetch_seconds = row
+            if now > expires_at + STALE_TTL:
+                self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._connection.commit()
+                return None
+            self._connection.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+        return json.loads(value), now <= expires_at, fetch_seconds
+
+    def set(self, key: str, kind: str, value: Any, ttl: float, fetch_seconds: float = 0.0) -> None:
+        """
+        Store an entry, evicting least recently used entries if the cache is full.
+
+        Args:
+            key: Cache key
+            kind: Entry type ("search" or "page"), used in the counters
+            value: JSON-serializable value
+            ttl: Seconds the entry stays fresh
+            fetch_seconds: Seconds the fetch took, reported as saved on later hits
+
+        Returns:
+            None
+        """
+        data = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, data, len(data), now + ttl, now, fetch_seconds)
+            )
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache fits in ``max_bytes``"""
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._connection.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+
+    def clear(self) -> None:
+        """Delete every entry"""
+        with self._lock:
+            self._connection.execute("DELETE FROM entries")
+            self._connection.commit()
+
+    def get_or_fetch(self, kind: str, key: str, fetch: Callable[[], Any], ttl: float) -> Any:
+        """
+        Return a cached value, fetching and storing it on a miss.
+
+        Stale entries are returned immediately and refreshed in the background.
+        Empty results (which the fetchers also return on errors) are not stored.
+
+        Args:
+            kind: Entry type ("search" or "page")
+            key: Cache key
+            fetch: Callable producing the value
+            ttl: Seconds a stored value stays fresh
+
+        Returns:
+            Cached or fetched value
+        """
+        lookup_start = time.perf_counter()
+        entry = self.get(key)
+        if entry is not None:
+            value, fresh, fetch_seconds = entry
+            saved = max(0.0, fetch_seconds - (time.perf_counter() - lookup_start))
+            record_cache_event(kind, "hit" if fresh else "stale_hit", saved_seconds=saved)
+            if not fresh:
+                self._refresh(kind, key, fetch, ttl)
+            return value
+
+        record_cache_event(kind, "miss")
+        return self._fetch_and_store(kind, key, fetch, ttl)
+
+    def _fetch_and_store(self, kind: str, key: str, fetch: Callable[[], Any], ttl: float) -> Any:
+        start = time.perf_counter()
+        value = fetch()
+        if value:
+            self.set(key, kind, value, ttl, fetch_seconds=time.perf_counter() - start)
+        return value
+
+    def _refresh(self, kind: str, key: str, fetch: Callable[[], Any], ttl: float) -> None:
+        """Refetch a stale entry in the background unless a refresh is already running"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._fetch_and_store(kind, key, fetch, ttl)
+            except Exception as e:
+                print(f"❌ Error refreshing cached {kind} {key}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(run)
+
+def get_web_cache() -> WebCache:
+    """
+    Get or initialize the shared web cache.
+
+    Returns:
+        WebCache at ``CACHE_PATH``
+    """
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = WebCache()
+
+    return _cache
+
+def search_key(query: str, num_results: int) -> str:
+    """
+    Build the cache key of a web search.
+
+    Args:
+        query: Search query
+        num_results: Number of results requested
+
+    Returns:
+        Cache key
+    """
+    return f"search:{num_results}:{normalize_query(query)}"
+
+def page_key(url: str) -> str:
+    """
+    Build the cache key of a fetched page.
+
+    Args:
+        url: URL of the page
+
+    Returns:
+        Cache key
+    """
+    return f"page:{url}"
@@ -4,14 +4,21 @@ import json
 import time
 from typing import List, Dict, Any, Optional
 from urllib.parse import quote_plus
+from .page_fetcher import fetch_main_text, fetch_pages
+from .web_cache import get_web_cache, search_key, page_key, SEARCH_TTL, PAGE_TTL
+from .tracing import span
 
-def web_search_serper(query: str, num_results: int = 5) -> List[Dict[str, str]]:
+def web_search_serper(query: str, num_results: int = 5, timeout: float = 10.0, use_cache: bool = True) -> List[Dict[str, str]]:
     """
     Search the web using Serper API.
     
+    Responses are cached on disk by normalized query and result count (see web_cache).
+    
     Args:
         query: Search query
         num_results: Number of results to return
+        timeout: Seconds to wait for the API before giving up
+        use_cache: Whether to serve and store results through the web cache
         
     Returns:
         List of search result dictionaries
@@ -20,6 +27,18 @@ def web_search_serper(query: str, num_results: int = 5) -> List[Dict[str, str]]:
     if not api_key:
         raise ValueError("❌ SERP_API_KEY is missing or not set in environment variables.")
     
+    with span("web_search", cached=use_cache):
+        if use_cache:
+            return get_web_cache().get_or_fetch(
+                "search",
+                search_key(query, num_results),
+                lambda: _serper_request(query, num_results, api_key, timeout),
+                SEARCH_TTL
+            )
+        return _serper_request(query, num_results, api_key, timeout)
+
+def _serper_request(query: str, num_results: int, api_key: str, timeout: float) -> List[Dict[str, str]]:
+    """Call the Serper search API, returning an empty list on errors"""
     headers = {
         "X-API-KEY": api_key,
         "Content-Type": "application/json"
@@ -34,7 +53,8 @@ def web_search_serper(query: str, num_results: int = 5) -> List[Dict[str, str]]:
         response = requests.post(
             "https://google.serper.dev/search",
             headers=headers,
-            json=payload
+            json=payload,
+            timeout=timeout
         )
         
         if response.status_code == 200:
@@ -47,66 +67,49 @@ def web_search_serper(query: str, num_results: int = 5) -> List[Dict[str, str]]:
         print(f"❌ Error during web search: {str(e)}")
         return []
 
-def extract_main_content(url: str) -> Optional[str]:
+def extract_main_content(url: str, use_cache: bool = True) -> Optional[str]:
     """
     Extract main content from a webpage.
     
     Args:
         url: URL of the webpage
+        use_cache: Whether to serve and store the content through the web cache
         
     Returns:
         Extracted main content or None if extraction fails
     """
-    try:
-        # Use a simple GET request (in a production system, you might want to use
-        # a more sophisticated approach like newspaper3k or trafilatura)
-        response = requests.get(
-            url,
-            headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-        )
-        
-        if response.status_code == 200:
-            # In a real system, you'd use proper HTML parsing here
-            # This is a simplified version
-            text = response.text
-            return text[:10000]  # Return first 10K chars as a simple approach
-        else:
-            return None
-    except Exception as e:
-        print(f"❌ Error extracting content from {url}: {str(e)}")
-        return None
+    if use_cache:
+        return get_web_cache().get_or_fetch("page", page_key(url), lambda: fetch_main_text(url), PAGE_TTL)
+    return fetch_main_text(url)
 
 def enrich_search_results(results: List[Dict[str, str]]) -> List[Dict[str, str]]:
     """
     Enrich search results with additional content.
     
+    Pages are fetched concurrently over a shared connection pool (see page_fetcher);
+    pages fetched before are served from the web cache.
+    
     Args:
         results: List of search result dictionaries
         
     Returns:
         Enriched search results
     """
-    enriched_results = []
+    # Skip results without a URL
+    results = [result for result in results if result.get("link")]
     
+    # Get content
+    with span("page_enrichment", pages=len(results)):
+        contents = fetch_pages([result["link"] for result in results], fetch=extract_main_content)
+    
+    enriched_results = []
     for result in results:
-        try:
-            # Extract URL
-            url = result.get("link")
-            
-            # Skip if no URL
-            if not url:
-                continue
-            
-            # Get content
-            content = extract_main_content(url)
-            
-            # Add content to result if available
-            if content:
-                result["full_content"] = content
-            
-            enriched_results.append(result)
-        except Exception as e:
-            print(f"❌ Error enriching result: {str(e)}")
+        # Add content to result if available
+        content = contents.get(result["link"])
+        if content:
+            result["full_content"] = content
+        
+        enriched_results.append(result)
     
     return enriched_results
 